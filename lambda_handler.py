@@ -7,6 +7,8 @@ import tempfile
 import time
 import json
 from dotenv import load_dotenv
+from report.profile_store import PROFILE_STORE, PROFILE_MANIFEST_NAME, load_manifest, stored_profile, file_fingerprint
+from report.append_profile import PROFILE_STATE_PREFIX, stored_state_hashes, fetch_profile_states, store_profile_states
 
 logging.info("Importing modules completed in lambda_handler.py")
 
@@ -35,13 +37,17 @@ def lambda_handler(event, context):
                 The name of the S3 bucket containing the files to process.
             prefix: str
                 The prefix of the files to process within the given bucket.
+            fanout_range: dict, optional
+                Sent by the fan-out mode of a coordinator invocation instead: one
+                range of a large file to profile, see `report.fanout.profile_s3_range`.
     context : object
         Lambda context object.
     
     Returns
     -------
     dict
-        A dictionary with a single key "status" which maps to "done".
+        A dictionary with a single key "status" which maps to "done", or for a
+        "fanout_range" event, where the range's profile was stored.
     """
 
     try:
@@ -50,6 +56,10 @@ def lambda_handler(event, context):
         start_time = time.time()
         request_id = context.aws_request_id if context else 'local-run'
         logger.info(f"Lambda invocation started - RequestID: {request_id}")
+        if 'fanout_range' in event:
+            # A worker invocation of the fan-out mode: profile one range of a large file
+            from report.fanout import profile_s3_range
+            return profile_s3_range(event['fanout_range'])
         try:
             # Log the incoming event
             logger.info(f"Received event: {json.dumps(event)}")
@@ -130,12 +140,38 @@ def lambda_handler(event, context):
                     }
                 
                 
-                with tempfile.TemporaryDirectory() as temp_dir:
+                with tempfile.TemporaryDirectory() as temp_dir, tempfile.TemporaryDirectory() as manifest_dir:
+                    # Fetch the profiles stored by the last run, so unchanged files are not downloaded again.
+                    # Kept out of temp_dir, where the metrics would count it as a data file.
+                    load_dotenv()
+                    reports_bucket_name = os.getenv('S3_REPORTS_BUCKET_NAME')
+                    manifest = {}
+                    store_settings = {"streaming_profiler": os.getenv("STREAMING_PROFILER", "false").lower() == "true"}
+                    state_prefix = f"{os.path.basename(fk)}/{PROFILE_STATE_PREFIX}"
+                    if PROFILE_STORE and reports_bucket_name:
+                        try:
+                            s3_client.download_file(reports_bucket_name, f"{os.path.basename(fk)}/{PROFILE_MANIFEST_NAME}", os.path.join(manifest_dir, PROFILE_MANIFEST_NAME))
+                            manifest = load_manifest(manifest_dir, store_settings)
+                        except Exception as e:
+                            logger.info(f"No stored profiles for {fk}: {e}")
+                        try:
+                            # /tmp is empty after a cold start, so the metric states come from the reports bucket
+                            fetch_profile_states(s3_client, reports_bucket_name, state_prefix, stored_state_hashes(manifest))
+                        except Exception as e:
+                            logger.warning(f"Could not fetch the stored metric states of {fk}: {e}")
                     # Download files from S3
+                    file_etags = {}
+                    file_sources = {}
                     for obj in s3_client.list_objects_v2(Bucket=bucket_name, Prefix=fk).get('Contents', []):
                         if obj['Key'].endswith('/'):
                             continue
                         local_path = os.path.join(temp_dir, os.path.basename(obj['Key']))
+                        if not local_path.endswith('.zip'):
+                            file_etags[os.path.basename(obj['Key'])] = obj['ETag']
+                            file_sources[os.path.basename(obj['Key'])] = {"bucket": bucket_name, "key": obj['Key']}
+                            if stored_profile(manifest, os.path.basename(obj['Key']), file_fingerprint(None, obj['ETag'])) is not None:
+                                logger.info(f"Skipping download of unchanged file: {obj['Key']}")
+                                continue
                         s3_client.download_file(bucket_name, obj['Key'], local_path)
                         # Unzip if required
                         if local_path.endswith('.zip'):
@@ -143,14 +179,14 @@ def lambda_handler(event, context):
                                 zf.extractall(temp_dir)
                     # Run your framework
                     # for structured datasets
-                    if any(f.endswith(('.parquet', '.csv', '.json')) for f in os.listdir(temp_dir)):
+                    if any(f.endswith(('.parquet', '.csv', '.json')) for f in [*os.listdir(temp_dir), *file_etags]):
                         try:
                             from structured_main import main
                             logging.info("main imported successfully")
                         except Exception as e:
                             logging.error(f"Error importing main: {e}", exc_info=True)
 
-                        main(temp_dir, fk)
+                        main(temp_dir, fk, file_etags, manifest_dir, file_sources)
                     # for unstructured datasets
                     elif any(f.endswith(('.xlsx', '.xls', '.pdf', '.mp3', '.jpg', '.jpeg', '.png', '.tiff', '.tif', '.txt', '.md', '.dcm')) for f in os.listdir(temp_dir)):
                         try:
@@ -180,6 +216,12 @@ def lambda_handler(event, context):
                                 logger.info(f"Report key: {report_key}")
                                 s3_client.upload_file(os.path.join(root, f), reports_bucket_name, report_key)   
                                 logger.info(f"Uploaded report to S3: {report_key}")
+                    # Keep the metric states the new manifest references next to it, for the next run
+                    if PROFILE_STORE and reports_bucket_name and os.path.exists(os.path.join(temp_dir, PROFILE_MANIFEST_NAME)):
+                        try:
+                            store_profile_states(s3_client, reports_bucket_name, state_prefix, stored_state_hashes(load_manifest(temp_dir, store_settings)))
+                        except Exception as e:
+                            logger.warning(f"Could not store the metric states of {fk}: {e}")
             end_time = time.time()
             logger.info(f"Lambda invocation completed - RequestID: {request_id}")
             logger.info(f"Total execution time: {end_time - start_time:.2f} seconds")
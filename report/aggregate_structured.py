@@ -5,6 +5,11 @@ from structured_metrics.standardization import *
 from structured_metrics.model_ingestible import *
 from structured_metrics.regular_refresh import *
 from structured_metrics.documentation import *
+from structured_metrics.null_profile import NullProfile
+from structured_metrics.column_blocks import use_column_blocks, evaluate_column_blocks
+from report.sampling import describe_sampling
+from report.metric_registry import run_metrics
+from report.scoring_structured import REPORT_KEYS
 import json 
 import logging 
 
@@ -13,35 +18,93 @@ def log_and_call(func, *args, **kwargs):
     return func(*args, **kwargs)
 
 
-def generate_raw_report(df, data_file_path, imputed_columns=None):
+def generate_raw_report(df, data_file_path, imputed_columns=None, parquet_footer=None, sampling=None, needed_keys=REPORT_KEYS):
     """
     Generate a raw data quality report from a given dataframe, descriptor path, and data directory.
 
+    The metrics are the functions registered for the "structured" pipeline with
+    `report.metric_registry.register_metric`, run concurrently by `run_metrics`.
+
     Parameters
     ----------
     df : pandas.DataFrame
         The dataframe to generate the report from.
-    descriptor_path : str
-        The path to the descriptor file.
-    data_directory : str
+    data_file_path : str
         The path to the data directory.
+    imputed_columns : dict, optional
+        The column roles inferred for the dataframe.
+    parquet_footer : dict, optional
+        Row and null counts read from a Parquet footer by `read_parquet_footer`.
+        When given, column-wise missing is taken from the footer for the whole
+        file instead of being counted on the (possibly sampled) dataframe.
+    sampling : dict, optional
+        How the dataframe was sampled, as returned by `report.sampling.sample_file`.
+    needed_keys : set of str, optional
+        The raw report keys to compute. Defaults to those the scoring reads,
+        `report.scoring_structured.REPORT_KEYS`; None runs every metric.
 
     Returns
     -------
     dict
         A dictionary containing the raw data quality metrics.
+
+    Notes
+    -----
+    Tables with at least `COLUMN_BLOCK_MIN_COLUMNS` columns are evaluated in
+    blocks of columns by `evaluate_column_blocks` when `COLUMN_BLOCK_WORKERS`
+    is above 1; the null counts, numeric moments and categorical dominance
+    then come from the merged blocks.
+    """
+    # Very wide tables: column-wise metrics in a process pool, one block of columns per task
+    column_blocks = evaluate_column_blocks(df, imputed_columns) if use_column_blocks(df) else None
+    inputs = {
+        "df": df,
+        "directory": data_file_path,
+        "imputed_columns": imputed_columns,
+        "parquet_footer": parquet_footer,
+        "sampling": sampling,
+        # Scan the dataframe for nulls once, if any metric reads the counts
+        "null_profile": (lambda: column_blocks.null_profile) if column_blocks is not None else (lambda: NullProfile(df)),
+        "column_blocks": column_blocks,
+    }
+    report, _ = run_metrics("structured", inputs, needed_keys)
+    return report
+
+def generate_raw_report_from_profile(profile, data_file_path, parquet_footer=None, sampling=None):
+    """
+    Generate the raw data quality report from a streamed `StructuredProfile`.
+
+    Parameters
+    ----------
+    profile : report.streaming_profiler.StructuredProfile
+        The accumulated metric state of a file that was read in chunks.
+    data_file_path : str
+        The path to the data directory.
+    parquet_footer : dict, optional
+        Row and null counts read from a Parquet footer, see `generate_raw_report`.
+    sampling : dict, optional
+        How the profiled rows were sampled, as returned by `report.sampling.sample_file`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the same keys as `generate_raw_report`.
     """
     report = {}
-    report.update(log_and_call(check_column_missing, df))
-    report.update(log_and_call(check_row_missing, df))
-    report.update(log_and_call(check_row_duplicates, df))
-    report.update(log_and_call(check_coverage_region, df, imputed_columns))
-    report.update(log_and_call(check_numeric_variance, df))
-    report.update(log_and_call(check_categorical_variation, df, imputed_columns))
+    if parquet_footer is not None:
+        report.update(log_and_call(check_column_missing_from_footer, parquet_footer))
+    else:
+        report.update(log_and_call(profile.column_missing))
+    report.update(log_and_call(profile.row_missing))
+    report.update(log_and_call(profile.row_duplicates))
+    report.update(log_and_call(profile.coverage_region))
+    report.update(log_and_call(profile.numeric_variance))
+    report.update(log_and_call(profile.categorical_variation))
     report.update(log_and_call(check_file_format, data_file_path))
-    report.update(log_and_call(check_date_and_timestamp_format, df, imputed_columns))
-    report.update(log_and_call(check_date_or_timestamp_fields, df, imputed_columns))
+    report.update(log_and_call(profile.date_and_timestamp_format))
+    report.update(log_and_call(profile.date_or_timestamp_fields))
     report.update(log_and_call(check_documentation_presence, data_file_path))
+    report.update(describe_sampling(sampling))
     return report
 
 def generate_final_report(readiness_metrics_json_path):
@@ -102,7 +165,8 @@ def generate_final_report(readiness_metrics_json_path):
             "exact_row_duplicates": 
             f"100% of rows are unique with no duplicates detected." if readiness_metrics_raw["detailed_scores"]["exact_row_duplicates"] == max_scores["exact_row_duplicates"] 
             else 
-            f"{round(100 - readiness_metrics_raw['exact_row_duplicates_percentage'], 1)}% of rows are unique, with {readiness_metrics_raw['exact_row_duplicates_count']} duplicate rows identified.",
+            f"{round(100 - readiness_metrics_raw['exact_row_duplicates_percentage'], 1)}% of rows are unique, with {readiness_metrics_raw['exact_row_duplicates_count']} duplicate rows identified."
+            + (f" {readiness_metrics_raw['cross_file_duplicates_count']} of them repeat rows of other files." if readiness_metrics_raw.get("cross_file_duplicates_count") else ""),
             
             "coverage_check": (
                 "No region columns found." if readiness_metrics_raw["region_coverage"] == 'None'
@@ -6,6 +6,8 @@ from unstructured_metrics.file_openability import *
 from unstructured_metrics.model_ingestible import *
 from unstructured_metrics.coverage import *
 from unstructured_metrics.timestamps_presence import *
+from report.metric_registry import run_metrics
+from report.scoring_unstructured import REPORT_KEYS
 
 import json 
 import logging 
@@ -15,33 +17,29 @@ def log_and_call(func, *args, **kwargs):
     return func(*args, **kwargs)
 
 
-def generate_raw_report(data_file_path, imputed_roles=None):
+def generate_raw_report(data_file_path, imputed_roles=None, needed_keys=REPORT_KEYS):
     """
     Generate a raw data quality report from a given dataframe, descriptor path, and data directory.
 
+    The metrics are the functions registered for the "unstructured" pipeline
+    with `report.metric_registry.register_metric`, run concurrently by `run_metrics`.
+
     Parameters
     ----------
-    df : pandas.DataFrame
-        The dataframe to generate the report from.
-    descriptor_path : str
-        The path to the descriptor file.
-    data_directory : str
-        The path to the data directory.
+    data_file_path : str
+        The path to the dataset folder.
+    imputed_roles : dict, optional
+        The metadata roles inferred by `infer_metadata_roles_openai`.
+    needed_keys : set of str, optional
+        The raw report keys to compute. Defaults to those the scoring reads,
+        `report.scoring_unstructured.REPORT_KEYS`; None runs every metric.
 
     Returns
     -------
     dict
         A dictionary containing the raw data quality metrics.
     """
-    report = {}
-    report.update(log_and_call(check_file_duplicates, data_file_path))
-    report.update(log_and_call(check_type_uniformity, data_file_path))
-    report.update(log_and_call(check_file_openability, data_file_path))
-    report.update(log_and_call(check_label_presence, data_file_path))
-    report.update(log_and_call(check_timestamp_presence, imputed_roles))
-    report.update(log_and_call(region_coverage, imputed_roles))
-    report.update(log_and_call(check_file_format, data_file_path))
-    report.update(log_and_call(check_documentation_presence, data_file_path))
+    report, _ = run_metrics("unstructured", {"directory": data_file_path, "imputed_roles": imputed_roles}, needed_keys)
     return report
 
 def generate_final_report(readiness_metrics_json_path):
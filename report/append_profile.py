@@ -0,0 +1,376 @@
+import os
+import time
+import pickle
+import shutil
+import hashlib
+import tempfile
+import logging
+from report.input_handler import iter_csv_tail_chunks, STREAMING_CHUNK_ROWS
+from report.parse_cache import HASH_BLOCK_BYTES
+from report.streaming_profiler import cast_empty_numeric_columns
+
+# Profile only the rows appended to a CSV file since its last run, from its stored accumulators
+APPEND_PROFILING = os.getenv("APPEND_PROFILING", "true").lower() == "true"
+# Lambda only lets us write to /tmp, which survives between warm invocations
+PROFILE_STATE_DIR = os.getenv("PROFILE_STATE_DIR") or ("/tmp/profile_state" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else ".profile_state")
+# States not used for this long are deleted, e.g. those of files that were removed
+PROFILE_STATE_TTL_SECONDS = float(os.getenv("PROFILE_STATE_TTL_DAYS", 30)) * 86400
+# Size the stored states may grow to; the least recently used are deleted beyond it
+PROFILE_STATE_MAX_BYTES = int(os.getenv("PROFILE_STATE_MAX_BYTES", 10**9))
+# Key prefix of the states kept in the reports bucket, under the folder of the reports
+PROFILE_STATE_PREFIX = "profile_states"
+# Bump when `StructuredProfile` changes, so older states are not loaded
+PROFILE_STATE_VERSION = 4
+
+
+def prefix_hash(file_path, nbytes):
+    """
+    Hash the first `nbytes` bytes of a file.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
+    nbytes : int
+        The length of the prefix.
+
+    Returns
+    -------
+    str
+        The hex digest of the prefix.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    remaining = nbytes
+    with open(file_path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _state_path(content_hash, state_dir):
+    return os.path.join(state_dir, f"{content_hash}.pkl")
+
+
+def _hashes_path(state_path):
+    # The spilled row hash partitions of a stored state, kept next to it
+    return f"{state_path[:-len('.pkl')]}.hashes"
+
+
+def _disk_usage(path):
+    if not os.path.isdir(path):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def evict_states(state_dir=None, ttl=PROFILE_STATE_TTL_SECONDS, max_bytes=None):
+    """
+    Delete the stored states not used for `ttl` seconds, then the least recently used until they fit `max_bytes`.
+
+    Parameters
+    ----------
+    state_dir : str, optional
+        The state directory. Defaults to `PROFILE_STATE_DIR`.
+    ttl : float, optional
+        Seconds a state is kept without being used. Defaults to `PROFILE_STATE_TTL_SECONDS`.
+    max_bytes : int, optional
+        The budget in bytes. Defaults to `PROFILE_STATE_MAX_BYTES`.
+
+    Returns
+    -------
+    int
+        The number of states deleted.
+    """
+    state_dir = state_dir or PROFILE_STATE_DIR
+    max_bytes = PROFILE_STATE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(state_dir):
+        return 0
+    entries = []
+    for name in os.listdir(state_dir):
+        if name.endswith('.pkl'):
+            path = os.path.join(state_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size + _disk_usage(_hashes_path(path)), path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    removed = 0
+    for mtime, size, path in entries:
+        if total <= max_bytes and now - mtime <= ttl:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(_hashes_path(path), ignore_errors=True)
+        total -= size
+        removed += 1
+    if removed:
+        logging.info(f"Evicted {removed} profile states from {state_dir}")
+    return removed
+
+
+def save_profile_state(file_path, profile, state_dir=None):
+    """
+    Store the accumulators of a data file, keyed by a hash of the bytes they cover.
+
+    Row hashes that spilled to disk are copied next to the state rather than
+    read into memory, see `structured_metrics.duplicates.RowHashSet.copy_to`.
+
+    Parameters
+    ----------
+    file_path : str
+        The data file the profile was built from.
+    profile : report.streaming_profiler.StructuredProfile
+        The profile of the whole file.
+    state_dir : str, optional
+        The state directory. Defaults to `PROFILE_STATE_DIR`.
+
+    Returns
+    -------
+    dict or None
+        {"size": bytes covered, "content_hash": their hash}, to keep with the
+        file's stored profile, or None if the state could not be stored.
+    """
+    state_dir = state_dir or PROFILE_STATE_DIR
+    size = os.path.getsize(file_path)
+    content_hash = prefix_hash(file_path, size)
+    path = _state_path(content_hash, state_dir)
+    partial = f"{path}.{os.getpid()}.tmp"
+    row_hashes = profile.row_hashes
+    try:
+        os.makedirs(state_dir, exist_ok=True)
+        if row_hashes.spilled:
+            # Pickle a copy whose partitions are stored with the state, the profile may still grow
+            profile.row_hashes = row_hashes.copy_to(_hashes_path(path))
+        with open(partial, 'wb') as f:
+            pickle.dump({"version": PROFILE_STATE_VERSION, "profile": profile}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, path)
+    except (OSError, pickle.PicklingError) as e:
+        logging.warning(f"Could not store the profile state of {file_path}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        shutil.rmtree(_hashes_path(path), ignore_errors=True)
+        return None
+    finally:
+        if profile.row_hashes is not row_hashes:
+            profile.row_hashes.detach()
+            profile.row_hashes = row_hashes
+    evict_states(state_dir)
+    return {"size": size, "content_hash": content_hash}
+
+
+def load_profile_state(profile_state, state_dir=None):
+    """
+    Load the accumulators stored by `save_profile_state`.
+
+    Parameters
+    ----------
+    profile_state : dict
+        As returned by `save_profile_state`.
+    state_dir : str, optional
+        The state directory. Defaults to `PROFILE_STATE_DIR`.
+
+    Returns
+    -------
+    report.streaming_profiler.StructuredProfile or None
+        The profile, or None if it is missing, unreadable or of another version.
+    """
+    path = _state_path(profile_state["content_hash"], state_dir or PROFILE_STATE_DIR)
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        logging.warning(f"Discarding unreadable profile state {path}: {e}")
+        return None
+    if state.get("version") != PROFILE_STATE_VERSION:
+        return None
+    try:
+        os.utime(path)  # mark as recently used
+    except OSError:
+        pass
+    profile = state["profile"]
+    row_hashes = profile.row_hashes
+    if row_hashes.spilled:
+        # Work on a copy of the stored partitions, so merging or appending rows leaves them as stored.
+        # They are read from next to the state, wherever the state directory was when it was saved.
+        row_hashes.relocate(_hashes_path(path))
+        try:
+            profile.row_hashes = row_hashes.copy_to(tempfile.mkdtemp(prefix="row_hashes_", dir=row_hashes.spill_dir))
+        except OSError as e:
+            logging.warning(f"Discarding profile state {path}, could not copy its row hashes: {e}")
+            return None
+        finally:
+            row_hashes.detach()
+    return profile
+
+
+def stored_state_hashes(manifest):
+    """Return the content hashes of the states referenced by a profile manifest, see `report.profile_store.load_manifest`."""
+    hashes = set()
+    for entry in manifest.values():
+        profile_state = (entry.get("profile") or {}).get("profile_state")
+        if profile_state:
+            hashes.add(profile_state["content_hash"])
+    return hashes
+
+
+def _state_files(content_hash, state_dir):
+    # The stored state and its spilled row hash partitions, as paths relative to `state_dir`
+    path = _state_path(content_hash, state_dir)
+    if not os.path.exists(path):
+        return []
+    hashes_dir = _hashes_path(path)
+    partitions = sorted(os.listdir(hashes_dir)) if os.path.isdir(hashes_dir) else []
+    return [os.path.basename(path)] + [os.path.join(os.path.basename(hashes_dir), name) for name in partitions]
+
+
+def fetch_profile_states(s3_client, bucket, prefix, content_hashes, state_dir=None):
+    """
+    Download stored states from S3 that are not in the state directory.
+
+    Under Lambda the state directory is in /tmp, which is empty after a cold
+    start, so the states are kept in the reports bucket next to the manifest.
+
+    Parameters
+    ----------
+    s3_client : botocore.client.S3
+        The S3 client.
+    bucket : str
+        The bucket the states are kept in.
+    prefix : str
+        The key prefix of the states, e.g. "<folder>/profile_states".
+    content_hashes : iterable of str
+        The states to fetch, see `stored_state_hashes`.
+    state_dir : str, optional
+        The state directory. Defaults to `PROFILE_STATE_DIR`.
+
+    Returns
+    -------
+    int
+        The number of states downloaded.
+    """
+    state_dir = state_dir or PROFILE_STATE_DIR
+    missing = {content_hash for content_hash in content_hashes if not os.path.exists(_state_path(content_hash, state_dir))}
+    if not missing:
+        return 0
+    fetched = set()
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f"{prefix}/"):
+        for obj in page.get('Contents', []):
+            name = obj['Key'][len(prefix) + 1:]
+            content_hash = name.split('.', 1)[0]
+            if content_hash in missing:
+                local_path = os.path.join(state_dir, name)
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                s3_client.download_file(bucket, obj['Key'], local_path)
+                fetched.add(content_hash)
+    logging.info(f"Fetched {len(fetched)} of {len(missing)} missing profile states from s3://{bucket}/{prefix}")
+    return len(fetched)
+
+
+def store_profile_states(s3_client, bucket, prefix, content_hashes, state_dir=None):
+    """
+    Upload the states not yet in S3, and delete those no longer referenced.
+
+    Parameters
+    ----------
+    s3_client : botocore.client.S3
+        The S3 client.
+    bucket : str
+        The bucket the states are kept in.
+    prefix : str
+        The key prefix of the states, see `fetch_profile_states`.
+    content_hashes : iterable of str
+        Every state the manifest of the folder references, see `stored_state_hashes`.
+    state_dir : str, optional
+        The state directory. Defaults to `PROFILE_STATE_DIR`.
+
+    Returns
+    -------
+    int
+        The number of states uploaded.
+    """
+    state_dir = state_dir or PROFILE_STATE_DIR
+    content_hashes = set(content_hashes)
+    existing = [obj['Key'] for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f"{prefix}/")
+                for obj in page.get('Contents', [])]
+    stored = {key[len(prefix) + 1:][:-len('.pkl')] for key in existing if key.endswith('.pkl')}
+    uploaded = 0
+    for content_hash in content_hashes - stored:
+        names = _state_files(content_hash, state_dir)
+        for name in names[1:] + names[:1]:  # the state last, so a listed state is complete
+            s3_client.upload_file(os.path.join(state_dir, name), bucket, f"{prefix}/{name}")
+        uploaded += bool(names)
+    stale = [key for key in existing if key[len(prefix) + 1:].split('.', 1)[0] not in content_hashes]
+    for start in range(0, len(stale), 1000):
+        s3_client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in stale[start:start + 1000]]})
+    logging.info(f"Uploaded {uploaded} profile states to s3://{bucket}/{prefix}, deleted {len(stale)} stale objects")
+    return uploaded
+
+
+def is_append(file_path, profile_state):
+    """
+    Whether a CSV file only grew by whole rows since its state was stored.
+
+    The file must be longer than before, the stored bytes must end with a
+    newline, so the new bytes start a new row, and they must hash the same.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    profile_state : dict
+        As returned by `save_profile_state`.
+
+    Returns
+    -------
+    bool
+        True if only rows were appended.
+    """
+    size = profile_state["size"]
+    if not file_path.endswith('.csv') or size <= 0 or os.path.getsize(file_path) <= size:
+        return False
+    with open(file_path, 'rb') as f:
+        f.seek(size - 1)
+        if f.read(1) != b'\n':
+            return False
+    return prefix_hash(file_path, size) == profile_state["content_hash"]
+
+
+def profile_appended_rows(file_path, profile, offset, chunksize=STREAMING_CHUNK_ROWS):
+    """
+    Fold the rows appended to a CSV file after `offset` into its stored profile.
+
+    A column the profile counts as numeric that is empty in a chunk of the new
+    rows is read as float, see `cast_empty_numeric_columns`.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    profile : report.streaming_profiler.StructuredProfile
+        The profile of the first `offset` bytes, updated in place.
+    offset : int
+        The byte offset of the first appended row.
+    chunksize : int, optional
+        The number of rows read at a time. Defaults to `STREAMING_CHUNK_ROWS`.
+
+    Returns
+    -------
+    report.streaming_profiler.StructuredProfile
+        The updated profile.
+    """
+    rows_before = profile.number_of_rows
+    numeric = set(profile.numeric_moments.columns)
+    for chunk in iter_csv_tail_chunks(file_path, offset, profile.columns, chunksize):
+        profile.update(cast_empty_numeric_columns(chunk, numeric))
+    logging.info(f"Profiled {profile.number_of_rows - rows_before} appended rows of {file_path} on top of {rows_before} stored rows")
+    return profile
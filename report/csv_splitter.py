@@ -0,0 +1,191 @@
+import os
+import mmap
+import logging
+
+# Bytes read past a split offset to find the first record that starts after it
+SPLIT_WINDOW_BYTES = 64 * 1024
+# Bytes of the file counted at a time when checking the quotes of a range
+QUOTE_COUNT_BLOCK_BYTES = 16 * 1024 * 1024
+
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+
+
+def _scan(buffer, inside, quote, delimiter):
+    # Walk the bytes from a guessed quote state. Returns the offset after the first
+    # newline outside quotes, and False if the guess is refuted: a closing quote
+    # must be followed by another quote, a delimiter or the end of the line.
+    first = None
+    i, n = 0, len(buffer)
+    while i < n:
+        c = buffer[i]
+        if inside:
+            if c == quote:
+                following = buffer[i + 1] if i + 1 < n else None
+                if following == quote:
+                    i += 2
+                    continue
+                if following not in (delimiter, NEWLINE, CARRIAGE_RETURN, None):
+                    return first, False
+                inside = False
+        elif c == quote:
+            inside = True
+        elif c == NEWLINE and first is None:
+            first = i + 1
+        i += 1
+    return first, True
+
+
+def find_record_start(mm, offset, quotechar='"', delimiter=',', window=SPLIT_WINDOW_BYTES, inside=None):
+    """
+    Speculate where the first record that starts at or after `offset` begins.
+
+    The bytes after `offset` are scanned twice, once as if `offset` were
+    outside quotes and once as if it were inside a quoted field. A guess is
+    dropped when a quote it takes for closing is not followed by a delimiter,
+    a newline or another quote. The boundary is taken from the guess that
+    survives, or from outside quotes when both do, which is the usual case.
+    The guess is checked afterwards, see `verify_ranges`.
+
+    Parameters
+    ----------
+    mm : mmap.mmap or bytes
+        The file contents.
+    offset : int
+        The byte offset to split at.
+    quotechar : str, optional
+        The quote character. Defaults to '"'.
+    delimiter : str, optional
+        The field delimiter. Defaults to ','.
+    window : int, optional
+        Bytes scanned at first; doubled until a record start is found.
+    inside : bool, optional
+        Whether `offset` is known to be inside quotes, e.g. False at the start
+        of the file. Guessed if not given.
+
+    Returns
+    -------
+    int or None
+        The offset of the first record start, or None if no record starts before the end of the file.
+    """
+    quote, delimiter = ord(quotechar), ord(delimiter)
+    size = len(mm)
+    while True:
+        buffer = mm[offset:offset + window]
+        if inside is None:
+            outside_start, outside_ok = _scan(buffer, False, quote, delimiter)
+            inside_start, inside_ok = _scan(buffer, True, quote, delimiter)
+            start = inside_start if inside_ok and not outside_ok else outside_start
+        else:
+            start, _ = _scan(buffer, inside, quote, delimiter)
+        if start is not None:
+            return offset + start
+        if offset + window >= size:
+            return None
+        window *= 2
+
+
+def split_csv_ranges(file_path, range_bytes, dialect):
+    """
+    Split a CSV file into byte ranges of about `range_bytes` that start and end on records.
+
+    The file is memory-mapped and only a small window after every split point
+    is read, see `find_record_start`. Newlines inside quoted fields, in the
+    header too, are not taken for record ends. A file whose dialect escapes
+    quotes with an escape character is not split.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    range_bytes : int
+        The target size of a range.
+    dialect : dict
+        The dialect from `report.input_handler.sniff_csv_dialect`.
+
+    Returns
+    -------
+    list of dict
+        {"start": int, "end": int} byte offsets of the records after the header.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+    quotechar, delimiter = dialect.get("quotechar") or '"', dialect.get("delimiter") or ','
+    ranges = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        if dialect.get("has_header", True):
+            start = find_record_start(mm, 0, quotechar, delimiter, inside=False) or size
+        if dialect.get("escapechar"):
+            # Escaped quotes are not doubled, so the quotes cannot tell where records start
+            logging.info(f"{file_path} escapes its quotes with {dialect['escapechar']!r}, reading it as a single range")
+            return [{"start": start, "end": size}] if start < size else []
+        while start < size:
+            end = find_record_start(mm, start + range_bytes, quotechar, delimiter) if start + range_bytes < size else None
+            end = size if end is None else end
+            ranges.append({"start": start, "end": end})
+            start = end
+    return ranges
+
+
+def count_quotes(file_path, start, end, quotechar='"'):
+    """
+    Count the quote characters of a byte range of a file.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
+    start, end : int
+        The byte range.
+    quotechar : str, optional
+        The quote character. Defaults to '"'.
+
+    Returns
+    -------
+    int
+        The number of quote characters.
+    """
+    if end <= start:
+        return 0
+    quote = quotechar.encode()
+    count = 0
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for position in range(start, end, QUOTE_COUNT_BLOCK_BYTES):
+            count += mm[position:min(position + QUOTE_COUNT_BLOCK_BYTES, end)].count(quote)
+    return count
+
+
+def verify_ranges(quote_counts):
+    """
+    Find the split points that fell inside a quoted field.
+
+    Escaped quotes are doubled, so a split point is outside quotes exactly when
+    an even number of quotes comes before it. Ranges are grouped so that every
+    group starts and ends on such a point; a group of more than one range was
+    split wrongly and must be parsed again as a whole.
+
+    Parameters
+    ----------
+    quote_counts : list of int
+        The quote count of every range, in file order, see `count_quotes`.
+
+    Returns
+    -------
+    list of list of int
+        The indices of the ranges of every group, in order.
+    """
+    groups, current, parity = [], [], 0
+    for i, count in enumerate(quote_counts):
+        current.append(i)
+        parity = (parity + count) % 2
+        if parity == 0:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    wrong = sum(len(group) - 1 for group in groups)
+    if wrong:
+        logging.info(f"{wrong} of {len(quote_counts) - 1} split points fell inside quoted fields, merging their ranges")
+    return groups
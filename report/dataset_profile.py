@@ -0,0 +1,107 @@
+import logging
+from report.aggregate_structured import generate_raw_report_from_profile
+from report.scoring_structured import compute_aggregate_score
+
+
+def fold_profile(dataset, profile):
+    """
+    Merge the profile of one more file into the running profile of a dataset.
+
+    Lets the profiles be folded in as the files finish, so only the running
+    profile is held rather than the profile of every file.
+
+    Parameters
+    ----------
+    dataset : report.streaming_profiler.StructuredProfile or None
+        The profile of the files merged so far, None for the first file.
+    profile : report.streaming_profiler.StructuredProfile
+        The profile of the next file. It shares state with the dataset profile
+        afterwards and its spilled row hashes are deleted.
+
+    Returns
+    -------
+    report.streaming_profiler.StructuredProfile
+        The dataset profile, updated in place or `profile` itself for the first file.
+    """
+    if dataset is None:
+        return profile
+    dataset.merge(profile)
+    profile.row_hashes.close()
+    return dataset
+
+
+def merge_profiles(profiles):
+    """
+    Reduce the profiles of the files of a dataset into one profile of all their rows.
+
+    Null counts and row counts are added, numeric moments combined with the
+    pairwise update, heavy-hitter sketches merged and row hash sets joined, so
+    duplicates across files are found and every row weighs the same whichever
+    file it is in.
+
+    Parameters
+    ----------
+    profiles : list of report.streaming_profiler.StructuredProfile
+        The profiles of the files, folded in order with `fold_profile`.
+
+    Returns
+    -------
+    report.streaming_profiler.StructuredProfile or None
+        The dataset profile, or None without profiles.
+    """
+    dataset = None
+    for profile in profiles:
+        dataset = fold_profile(dataset, profile)
+    return dataset
+
+
+def score_dataset_profile(dataset, data_file_path):
+    """
+    Score a dataset from the merged profile of its files.
+
+    Parameters
+    ----------
+    dataset : report.streaming_profiler.StructuredProfile
+        The dataset profile, see `merge_profiles` and `fold_profile`.
+    data_file_path : str
+        The path to the data directory.
+
+    Returns
+    -------
+    tuple
+        The dataset report, with the keys of a per-file raw report and its
+        scores, and its total percentage. The duplicate rows are also split
+        into "within_file_duplicates_count", repeating a row of their own file,
+        and "cross_file_duplicates_count", only repeating a row of another file.
+    """
+    init_report = generate_raw_report_from_profile(dataset, data_file_path)
+    init_report["within_file_duplicates_count"] = dataset.row_hashes.within_duplicate_count
+    init_report["cross_file_duplicates_count"] = dataset.row_hashes.cross_duplicate_count
+    logging.info(f"Found {init_report['within_file_duplicates_count']} duplicate rows within files and {init_report['cross_file_duplicates_count']} across files")
+    final_score = compute_aggregate_score(init_report)
+    report = {**final_score, **init_report}
+    return report, report.get("total_percentage")
+
+
+def generate_dataset_report(profiles, data_file_path):
+    """
+    Score a dataset from the merged profiles of its files.
+
+    Replaces averaging the per-file reports with `calculate_average_readiness`:
+    the metrics are computed once over the merged state, in memory.
+
+    Parameters
+    ----------
+    profiles : list of report.streaming_profiler.StructuredProfile
+        The profiles of the files, see `merge_profiles`.
+    data_file_path : str
+        The path to the data directory.
+
+    Returns
+    -------
+    tuple
+        The dataset report and its total percentage, see `score_dataset_profile`.
+    """
+    dataset = merge_profiles(profiles)
+    logging.info(f"Merged the profiles of {len(profiles)} files into {dataset.number_of_rows} rows and {len(dataset.columns)} columns")
+    return score_dataset_profile(dataset, data_file_path)
@@ -0,0 +1,362 @@
+import os
+import json
+import uuid
+import pickle
+import shutil
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pyarrow.parquet import ParquetFile
+from report.input_handler import iter_csv_tail_chunks, sniff_csv_dialect, read_file_head, STREAMING_CHUNK_ROWS
+from report.streaming_profiler import StructuredProfile, cast_empty_numeric_columns
+from report.dataset_profile import merge_profiles
+from report.parallel import process_pool
+from report.csv_splitter import split_csv_ranges, count_quotes, verify_ranges
+
+# Lambda function invoked to profile one range each; ranges are profiled locally if unset
+FANOUT_FUNCTION_NAME = os.getenv("FANOUT_FUNCTION_NAME") or None
+# Profile files too large for one pass in ranges, in parallel, and merge the range profiles.
+# Off by default without FANOUT_FUNCTION_NAME: local ranges need the whole file on disk, /tmp under Lambda
+FANOUT_PROFILING = os.getenv("FANOUT_PROFILING", "true" if FANOUT_FUNCTION_NAME else "false").lower() == "true"
+# CSV and Parquet files of at least this size are split into ranges
+FANOUT_MIN_BYTES = int(os.getenv("FANOUT_MIN_BYTES", 2 * 10**9))
+# Bytes per range: CSV rows or Parquet row groups up to about this size
+FANOUT_RANGE_BYTES = int(os.getenv("FANOUT_RANGE_BYTES", 256 * 1024 * 1024))
+# Ranges profiled at once: local processes, or Lambda invocations with FANOUT_FUNCTION_NAME
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", os.cpu_count() or 1))
+# Bucket the Lambda workers hand their range profiles back through; defaults to S3_REPORTS_BUCKET_NAME
+FANOUT_STATE_BUCKET = os.getenv("FANOUT_STATE_BUCKET") or None
+FANOUT_STATE_PREFIX = "fanout_states"
+
+
+def use_fanout(file_path, min_bytes=None):
+    """
+    Whether a file is profiled in ranges.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+    min_bytes : int, optional
+        The smallest file split into ranges. Defaults to `FANOUT_MIN_BYTES`.
+
+    Returns
+    -------
+    bool
+        True for CSV and Parquet files of at least `min_bytes` when `FANOUT_PROFILING` is on.
+    """
+    min_bytes = FANOUT_MIN_BYTES if min_bytes is None else min_bytes
+    return FANOUT_PROFILING and file_path.endswith(('.csv', '.parquet')) and os.path.getsize(file_path) >= min_bytes
+
+
+def read_range_schema(file_path):
+    """
+    Read what every range of a file needs to be parsed like the whole file.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV or Parquet file.
+
+    Returns
+    -------
+    dict
+        "column_names" and "numeric_columns" from the first `STREAMING_CHUNK_ROWS`
+        rows, which type the columns of a file streamed whole, and for CSV
+        files the sniffed "dialect".
+    """
+    head = read_file_head(file_path, STREAMING_CHUNK_ROWS)
+    schema = {"column_names": [str(col) for col in head.columns],
+              "numeric_columns": [str(col) for col in head.select_dtypes(include=['number']).columns]}
+    if file_path.endswith('.csv'):
+        schema["dialect"] = sniff_csv_dialect(file_path)
+    return schema
+
+
+def plan_ranges(file_path, range_bytes=None, dialect=None):
+    """
+    Split a file into ranges that can be profiled independently.
+
+    CSV files are cut into byte ranges of about `range_bytes` that start on a
+    record after the header, see `report.csv_splitter.split_csv_ranges`.
+    Parquet files are cut between row groups.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV or Parquet file.
+    range_bytes : int, optional
+        The target size of a range. Defaults to `FANOUT_RANGE_BYTES`.
+    dialect : dict, optional
+        The dialect of the CSV file. Sniffed if not given.
+
+    Returns
+    -------
+    list of dict
+        {"start": int, "end": int} byte offsets for CSV files, {"row_groups": list of int} for Parquet files.
+    """
+    range_bytes = range_bytes or FANOUT_RANGE_BYTES
+    if file_path.endswith('.parquet'):
+        metadata = ParquetFile(file_path).metadata
+        ranges, current, current_bytes = [], [], 0
+        for i in range(metadata.num_row_groups):
+            current.append(i)
+            current_bytes += metadata.row_group(i).total_byte_size
+            if current_bytes >= range_bytes:
+                ranges.append({"row_groups": current})
+                current, current_bytes = [], 0
+        if current:
+            ranges.append({"row_groups": current})
+        return ranges
+    return split_csv_ranges(file_path, range_bytes, dialect or sniff_csv_dialect(file_path))
+
+
+def profile_range(source, task, chunksize=STREAMING_CHUNK_ROWS):
+    """
+    Profile one range of a file.
+
+    Parameters
+    ----------
+    source : str or file-like
+        The path to the file, or an open Parquet file.
+    task : dict
+        A range from `plan_ranges` with the schema from `read_range_schema`
+        and the file's "imputed_columns".
+    chunksize : int, optional
+        The number of rows read at a time. Defaults to `STREAMING_CHUNK_ROWS`.
+
+    Returns
+    -------
+    report.streaming_profiler.StructuredProfile
+        The profile of the rows of the range.
+    """
+    profile = StructuredProfile(task.get("imputed_columns"))
+    numeric = set(task["numeric_columns"])
+    if "row_groups" in task:
+        chunks = (batch.to_pandas().infer_objects() for batch in ParquetFile(source).iter_batches(batch_size=chunksize, row_groups=task["row_groups"]))
+    else:
+        chunks = iter_csv_tail_chunks(source, task["start"], task["column_names"], chunksize, end=task["end"], dialect=task["dialect"])
+    for chunk in chunks:
+        profile.update(cast_empty_numeric_columns(chunk, numeric))
+    return profile
+
+
+def profile_counted_range(source, task):
+    """
+    Profile one range of a file and count its quotes, for `verify_ranges`.
+
+    A CSV range whose split points were guessed wrong may not parse; it then
+    has no profile, and is parsed again merged with its neighbours.
+
+    Parameters
+    ----------
+    source : str or file-like
+        The path to the file, or an open Parquet file.
+    task : dict
+        The range, see `profile_range`.
+
+    Returns
+    -------
+    tuple
+        The number of quote characters in the range, 0 for Parquet, and its
+        profile, or None if a CSV range could not be parsed.
+    """
+    if "row_groups" in task:
+        return 0, profile_range(source, task)
+    quotes = count_quotes(source, task["start"], task["end"], task["dialect"].get("quotechar") or '"')
+    try:
+        return quotes, profile_range(source, task)
+    except Exception as e:
+        logging.warning(f"Could not parse bytes {task['start']} to {task['end']} of {source}: {e}")
+        return quotes, None
+
+
+def profile_ranges_locally(file_path, tasks, workers=None):
+    """
+    Profile the ranges of a local file in a process pool.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
+    tasks : list of dict
+        The ranges, see `profile_range`.
+    workers : int, optional
+        The processes. Defaults to `FANOUT_WORKERS`.
+
+    Returns
+    -------
+    list of tuple
+        The result of `profile_counted_range` for every range, in order.
+    """
+    workers = FANOUT_WORKERS if workers is None else workers
+    if workers <= 1 or len(tasks) <= 1:
+        return [profile_counted_range(file_path, task) for task in tasks]
+    try:
+        with process_pool(min(workers, len(tasks))) as executor:
+            return list(executor.map(profile_counted_range, [file_path] * len(tasks), tasks))
+    except (BrokenProcessPool, OSError) as e:
+        # e.g. no /dev/shm semaphores on Lambda: profile the ranges here instead
+        logging.warning(f"Range processes failed, profiling the ranges of {file_path} in this process: {e}")
+        return [profile_counted_range(file_path, task) for task in tasks]
+
+
+def profile_s3_range(request):
+    """
+    Profile one range of an S3 object, in a worker invocation of the fan-out mode.
+
+    CSV ranges are fetched with a ranged GET; Parquet row groups are read
+    through Arrow's S3 filesystem, which fetches the footer and the requested
+    row groups only. The profile is pickled to `FANOUT_STATE_BUCKET`, as it can
+    be larger than a Lambda response.
+
+    Parameters
+    ----------
+    request : dict
+        "bucket" and "key" of the object, "task" as for `profile_range`,
+        and "run_id" and "index" naming the state.
+
+    Returns
+    -------
+    dict
+        "state_bucket" and "state_key" of the pickled profile and its
+        "number_of_rows", all None if the range could not be parsed, and the
+        "quote_count" of the range, see `profile_counted_range`.
+    """
+    import boto3
+    s3_client = boto3.client('s3')
+    task = request["task"]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if "row_groups" in task:
+            from pyarrow import fs
+            s3 = fs.S3FileSystem(region=os.getenv("AWS_REGION"))
+            with s3.open_input_file(f"{request['bucket']}/{request['key']}") as source:
+                quotes, profile = profile_counted_range(source, task)
+        else:
+            path = os.path.join(temp_dir, "range.csv")
+            body = s3_client.get_object(Bucket=request["bucket"], Key=request["key"], Range=f"bytes={task['start']}-{task['end'] - 1}")["Body"]
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(body, f)
+            quotes, profile = profile_counted_range(path, {**task, "start": 0, "end": task["end"] - task["start"]})
+    if profile is None:
+        return {"quote_count": quotes, "state_bucket": None, "state_key": None, "number_of_rows": None}
+    state_bucket = FANOUT_STATE_BUCKET or os.getenv("S3_REPORTS_BUCKET_NAME")
+    state_key = f"{FANOUT_STATE_PREFIX}/{request['run_id']}/{request['index']}.pkl"
+    # The coordinator runs on another machine, so spilled row hashes travel in the pickle
+    profile.row_hashes.unspill()
+    s3_client.put_object(Bucket=state_bucket, Key=state_key, Body=pickle.dumps(profile, protocol=pickle.HIGHEST_PROTOCOL))
+    logging.info(f"Profiled {profile.number_of_rows} rows of range {request['index']} of s3://{request['bucket']}/{request['key']}")
+    return {"quote_count": quotes, "state_bucket": state_bucket, "state_key": state_key, "number_of_rows": profile.number_of_rows}
+
+
+def profile_ranges_remotely(source, tasks, function_name=None, workers=None):
+    """
+    Profile the ranges of an S3 object, one Lambda invocation per range.
+
+    Parameters
+    ----------
+    source : dict
+        "bucket" and "key" of the object.
+    tasks : list of dict
+        The ranges, see `profile_range`.
+    function_name : str, optional
+        The Lambda function, whose handler passes "fanout_range" events to
+        `profile_s3_range`. Defaults to `FANOUT_FUNCTION_NAME`.
+    workers : int, optional
+        The invocations in flight. Defaults to `FANOUT_WORKERS`.
+
+    Returns
+    -------
+    list of tuple
+        The result of `profile_counted_range` for every range, in order.
+    """
+    import boto3
+    from botocore.config import Config
+    function_name = function_name or FANOUT_FUNCTION_NAME
+    workers = FANOUT_WORKERS if workers is None else workers
+    # A worker may run up to the 15 minute Lambda limit; retrying would profile its range twice
+    lambda_client = boto3.client('lambda', config=Config(read_timeout=900, retries={"max_attempts": 0}))
+    s3_client = boto3.client('s3')
+    run_id = uuid.uuid4().hex
+
+    def invoke(index):
+        request = {"bucket": source["bucket"], "key": source["key"], "task": tasks[index], "run_id": run_id, "index": index}
+        response = lambda_client.invoke(FunctionName=function_name, InvocationType='RequestResponse', Payload=json.dumps({"fanout_range": request}))
+        result = json.loads(response["Payload"].read())
+        if response.get("FunctionError") or "quote_count" not in result:
+            raise RuntimeError(f"Range {index} of s3://{source['bucket']}/{source['key']} failed: {result}")
+        if result["state_key"] is None:
+            return result["quote_count"], None
+        state = s3_client.get_object(Bucket=result["state_bucket"], Key=result["state_key"])["Body"].read()
+        s3_client.delete_object(Bucket=result["state_bucket"], Key=result["state_key"])
+        return result["quote_count"], pickle.loads(state)
+
+    logging.info(f"Invoking {function_name} for {len(tasks)} ranges of s3://{source['bucket']}/{source['key']}, {workers} at a time")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as executor:
+        return list(executor.map(invoke, range(len(tasks))))
+
+
+def profile_in_ranges(file_path, imputed_columns=None, source=None, range_bytes=None, workers=None):
+    """
+    Profile a large file as a map-reduce over its ranges.
+
+    The header, column types and dialect are read once and shared by every
+    range. The file is split by `plan_ranges`, every range is profiled into
+    its own `StructuredProfile`, by Lambda invocations when
+    `FANOUT_FUNCTION_NAME` is set and the file's S3 object is known, else in
+    local processes, and the range profiles are merged in file order, as for
+    the files of a dataset. CSV split points that the quote counts show to be
+    inside a quoted field are dropped and the ranges around them profiled
+    again as one.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV or Parquet file.
+    imputed_columns : dict, optional
+        The column roles of the file.
+    source : dict, optional
+        "bucket" and "key" of the S3 object the file was downloaded from.
+    range_bytes : int, optional
+        The target size of a range. Defaults to `FANOUT_RANGE_BYTES`.
+    workers : int, optional
+        The ranges profiled at once. Defaults to `FANOUT_WORKERS`.
+
+    Returns
+    -------
+    report.streaming_profiler.StructuredProfile
+        The profile of the whole file.
+
+    Raises
+    ------
+    ValueError
+        If a CSV range that starts and ends on records cannot be parsed.
+    """
+    schema = read_range_schema(file_path)
+    tasks = [{**r, **schema, "imputed_columns": imputed_columns} for r in plan_ranges(file_path, range_bytes, schema.get("dialect"))]
+    remote = FANOUT_FUNCTION_NAME is not None and source is not None
+    logging.info(f"Profiling {file_path} in {len(tasks)} ranges {'with Lambda workers' if remote else 'in local processes'}")
+    run = (lambda batch: profile_ranges_remotely(source, batch, workers=workers)) if remote else (lambda batch: profile_ranges_locally(file_path, batch, workers))
+    results = run(tasks)
+
+    # Verify the split points and parse the ranges of the wrong ones again, merged
+    groups = verify_ranges([quotes for quotes, _ in results])
+    redo = [group for group in groups if len(group) > 1 or results[group[0]][1] is None]
+    if redo:
+        merged = [{**tasks[group[0]], "end": tasks[group[-1]]["end"]} for group in redo]
+        for group, result in zip(redo, run(merged)):
+            results[group[0]] = result
+            for i in group[1:]:
+                results[i] = None
+    profiles = []
+    for result in results:
+        if result is None:
+            continue
+        if result[1] is None:
+            raise ValueError(f"Could not parse {file_path} in ranges")
+        profiles.append(result[1])
+
+    profile = merge_profiles(profiles) or StructuredProfile(imputed_columns)
+    logging.info(f"Merged {len(profiles)} ranges of {file_path} into {profile.number_of_rows} rows")
+    return profile
@@ -1,21 +1,40 @@
 print("Starting input_handler.py")
 import csv
+import io
 import os
 import pandas as pd
 import chardet
 import logging
 import pyarrow as pa
+import pyarrow.csv as pa_csv
 from pyarrow.parquet import ParquetFile
-import csv
 import sys
+import time
+from report import parse_cache
+from report.json_reader import iter_json_chunks, read_json_file
 print("Importing modules completed in input_handler.py")
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+METADATA_NAMES = ["dataset_metadata", "README", "data_description", "data_description_file", "data_attributes", "column_descriptor", "column_descriptions"]
+STREAMING_CHUNK_ROWS = int(os.getenv("STREAMING_CHUNK_ROWS", 100000))
+SAMPLE_THRESHOLD_BYTES = 4*10**8  # 400MB
+CSV_SNIFF_BYTES = 64 * 1024
+# Arrow fails on a field that does not fit in one block, so keep blocks large
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+# pandas' default NA strings, so both CSV engines agree on what is missing
+CSV_NULL_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
 
-def load_data_from_directory(directory):
-    # Assuming the directory contains only CSV, Parquet and JSON files
+
+def _is_data_file(file, extensions=('.csv', '.parquet', '.json')):
+    return file.endswith(extensions) and not any(name in file for name in METADATA_NAMES) and 'metadata' not in file.lower()
+
+
+def list_data_files(directory):
     """
-    Load and return data from CSV, Parquet, and JSON files in a specified directory.
+    List the data files in a directory and its immediate subdirectories.
+
+    The same files are picked up as in `load_data_from_directory`, in the same order,
+    but nothing is read.
 
     Parameters
     ----------
@@ -24,159 +43,663 @@ def load_data_from_directory(directory):
 
     Returns
     -------
-    list of tuples
-        A list of tuples, each containing a pandas DataFrame and the file path 
-        for each loaded file. Only files with extensions '.csv', '.parquet', 
-        and '.json' (excluding those containing 'metadata' in their name) are processed.
+    list of str
+        The paths of the CSV, Parquet and JSON files found.
+    """
+    files = [os.path.join(directory, file) for file in os.listdir(directory) if _is_data_file(file)]
+    for subdirectory in os.listdir(directory):
+        subdirectory_path = os.path.join(directory, subdirectory)
+        if not os.path.isdir(subdirectory_path):
+            continue
+        for extension in ('.csv', '.parquet', '.json'):
+            files += [os.path.join(subdirectory_path, file) for file in os.listdir(subdirectory_path) if _is_data_file(file, extension)]
+    return files
+
+
+def _raise_csv_field_size_limit():
+    # raise csv field size limit to the largest possible value
+    max_int = sys.maxsize
+    # Some platforms raise OverflowError when you pass sys.maxsize directly; degrade gracefully
+    while True:
+        try:
+            csv.field_size_limit(max_int)
+            break
+        except OverflowError:
+            max_int = int(max_int / 10)
+
+
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def sniff_csv_dialect(file_path, encoding='utf-8', sample_bytes=CSV_SNIFF_BYTES):
+    """
+    Detect the delimiter, quoting and header of a CSV file from its first bytes.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    encoding : str, optional
+        The text encoding of the file. Defaults to 'utf-8'.
+    sample_bytes : int, optional
+        How many bytes of the file to inspect. Defaults to `CSV_SNIFF_BYTES`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the keys "delimiter", "quotechar", "doublequote",
+        "escapechar" and "has_header". Anything that cannot be sniffed keeps the
+        pandas default (comma separated, double quoted, with a header row).
+    """
+    dialect = {"delimiter": ",", "quotechar": '"', "doublequote": True, "escapechar": None, "has_header": True}
+    with open(file_path, 'rb') as f:
+        prefix = f.read(sample_bytes)
+    text = prefix.decode(encoding, errors='ignore')
+    if len(prefix) == sample_bytes and '\n' in text:
+        text = text[:text.rindex('\n')]  # drop the partial last line
+    if not text.strip():
+        return dialect
+
+    sniffer = csv.Sniffer()
+    try:
+        sniffed = sniffer.sniff(text, delimiters=',;\t|')
+        dialect.update(delimiter=sniffed.delimiter, quotechar=sniffed.quotechar or '"', doublequote=sniffed.doublequote or not sniffed.escapechar, escapechar=sniffed.escapechar)
+    except csv.Error:
+        pass
+    # The sniffer's header test votes "no header" on most all-text tables, so only
+    # treat the first row as data when it also contains a number.
+    try:
+        first_row = next(csv.reader([text.splitlines()[0]], delimiter=dialect["delimiter"], quotechar=dialect["quotechar"]))
+        dialect["has_header"] = sniffer.has_header(text) or not any(_is_number(field) for field in first_row)
+    except (csv.Error, StopIteration):
+        pass
+    return dialect
+
+
+def _arrow_csv_options(dialect, encoding):
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE, encoding=encoding, autogenerate_column_names=not dialect["has_header"])
+    parse_options = pa_csv.ParseOptions(
+        delimiter=dialect["delimiter"],
+        quote_char=dialect["quotechar"],
+        double_quote=dialect["doublequote"],
+        escape_char=dialect["escapechar"] or False,
+        newlines_in_values=True,
+    )
+    convert_options = pa_csv.ConvertOptions(null_values=CSV_NULL_VALUES, strings_can_be_null=True)
+    return read_options, parse_options, convert_options
+
+
+def _keep_temporal_as_text(file_path, read_options, parse_options, convert_options, offset=0, end=None):
+    # Arrow infers ISO dates and times whatever its timestamp parsers, and casting them back
+    # to text rewrites them ("T" dropped, offsets moved to UTC). The first block fixes the
+    # column types, so read its schema and have its temporal columns read as strings instead,
+    # as with the python engine, so the datetime metrics see the raw values.
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        with pa_csv.open_csv(f if end is None else _ByteRange(f, end), read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+            temporal = {field.name: pa.string() for field in reader.schema if pa.types.is_temporal(field.type)}
+    if temporal:
+        convert_options.column_types = temporal
+
+
+def _arrow_to_pandas(table, has_header):
+    df = table.to_pandas()
+    if not has_header:
+        df.columns = [f"column_{i + 1}" for i in range(df.shape[1])]
+    return df
+
+
+def _read_csv_python(file_path, dialect, encoding, nrows=None, chunksize=None):
+    _raise_csv_field_size_limit()
+    reader = pd.read_csv(
+        file_path,
+        engine='python',
+        encoding=encoding,
+        sep=dialect["delimiter"],
+        quotechar=dialect["quotechar"],
+        doublequote=dialect["doublequote"],
+        escapechar=dialect["escapechar"],
+        header=0 if dialect["has_header"] else None,
+        nrows=nrows,
+        chunksize=chunksize,
+    )
+    if dialect["has_header"] or chunksize is not None:
+        return reader
+    reader.columns = [f"column_{i + 1}" for i in range(reader.shape[1])]
+    return reader
+
+
+def _log_read_rate(file_path, engine, rows, started, nbytes=None):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    rate = f", {nbytes / 1e6 / elapsed:.1f} MB/s" if nbytes else ""
+    logging.info(f"Read {rows} rows from {file_path} with the {engine} CSV engine in {elapsed:.2f}s{rate}")
+
+
+def read_csv_file(file_path, encoding='utf-8', nrows=None):
+    """
+    Read a CSV file with the multithreaded Arrow reader, falling back to pandas' python engine.
+
+    The dialect is sniffed once from the start of the file and handed to both
+    readers. Only files Arrow rejects (ragged rows, fields larger than a block,
+    invalid encodings) are re-read with the python engine.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    encoding : str, optional
+        The text encoding of the file. Defaults to 'utf-8'.
+    nrows : int, optional
+        Only read this many rows. Defaults to reading the whole file.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The contents of the file.
+    """
+    dialect = sniff_csv_dialect(file_path, encoding)
+    started = time.perf_counter()
+    try:
+        read_options, parse_options, convert_options = _arrow_csv_options(dialect, encoding)
+        _keep_temporal_as_text(file_path, read_options, parse_options, convert_options)
+        if nrows is None:
+            table = pa_csv.read_csv(file_path, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+        else:
+            batches, rows = [], 0
+            with pa_csv.open_csv(file_path, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+                for batch in reader:
+                    batches.append(batch)
+                    rows += batch.num_rows
+                    if rows >= nrows:
+                        break
+                table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, nrows)
+        df = _arrow_to_pandas(table, dialect["has_header"])
+        engine = 'pyarrow'
+    except (pa.ArrowException, UnicodeDecodeError) as e:
+        logging.warning(f"Arrow CSV reader could not parse {file_path}, falling back to the python engine: {e}")
+        started = time.perf_counter()
+        df = _read_csv_python(file_path, dialect, encoding, nrows=nrows)
+        engine = 'python'
+    _log_read_rate(file_path, engine, len(df), started, os.path.getsize(file_path) if nrows is None else None)
+    return df
+
+
+def iter_csv_chunks(file_path, chunksize=STREAMING_CHUNK_ROWS, encoding='utf-8'):
+    """
+    Read a CSV file as DataFrames of `chunksize` rows with the Arrow streaming reader.
+
+    Arrow fixes the column types from the first block, so a later block that does
+    not fit them raises. The file is then re-read with the python engine and the
+    rows that were already yielded are skipped.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    chunksize : int, optional
+        The number of rows per chunk. Defaults to `STREAMING_CHUNK_ROWS`.
+    encoding : str, optional
+        The text encoding of the file. Defaults to 'utf-8'.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The next chunk of the file.
+    """
+    dialect = sniff_csv_dialect(file_path, encoding)
+    started = time.perf_counter()
+    yielded = 0
+    engine = 'pyarrow'
+    try:
+        read_options, parse_options, convert_options = _arrow_csv_options(dialect, encoding)
+        _keep_temporal_as_text(file_path, read_options, parse_options, convert_options)
+        with pa_csv.open_csv(file_path, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+            pending, pending_rows = [], 0
+            for batch in reader:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                while pending_rows >= chunksize:
+                    table = pa.Table.from_batches(pending, schema=reader.schema)
+                    yield _arrow_to_pandas(table.slice(0, chunksize), dialect["has_header"]).infer_objects()
+                    yielded += chunksize
+                    pending = table.slice(chunksize).to_batches()
+                    pending_rows -= chunksize
+            if pending_rows:
+                yield _arrow_to_pandas(pa.Table.from_batches(pending, schema=reader.schema), dialect["has_header"]).infer_objects()
+                yielded += pending_rows
+    except (pa.ArrowException, UnicodeDecodeError) as e:
+        logging.warning(f"Arrow CSV reader could not parse {file_path} after {yielded} rows, falling back to the python engine: {e}")
+        engine = 'python'
+        skip = yielded
+        with _read_csv_python(file_path, dialect, encoding, chunksize=chunksize) as reader:
+            for chunk in reader:
+                if skip >= len(chunk):
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk.iloc[skip:]
+                skip = 0
+                if not dialect["has_header"]:
+                    chunk.columns = [f"column_{i + 1}" for i in range(chunk.shape[1])]
+                yield chunk.infer_objects()
+                yielded += len(chunk)
+    _log_read_rate(file_path, engine, yielded, started, os.path.getsize(file_path))
+
+
+class _ByteRange(io.RawIOBase):
+    # A binary file read from its current position up to the byte offset `end`
+    def __init__(self, f, end):
+        self._f = f
+        self._remaining = end - f.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._remaining <= 0:
+            return 0
+        n = self._f.readinto(memoryview(b)[:min(len(b), self._remaining)])
+        self._remaining -= n
+        return n
+
+
+def iter_csv_tail_chunks(file_path, offset, column_names, chunksize=STREAMING_CHUNK_ROWS, encoding='utf-8', end=None, dialect=None):
+    """
+    Read the rows of a CSV file from a byte offset on, as DataFrames of `chunksize` rows.
+
+    Used to profile only the rows appended to a file since it was last read,
+    or one byte range of a file split into ranges. The offset must fall on the
+    start of a row, and `end` on the start of a row or the end of the file.
+    The rows get the given column names, as the header is not read again.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    offset : int
+        The byte offset of the first row to read.
+    column_names : list of str
+        The names of the columns.
+    chunksize : int, optional
+        The number of rows per chunk. Defaults to `STREAMING_CHUNK_ROWS`.
+    encoding : str, optional
+        The text encoding of the file. Defaults to 'utf-8'.
+    end : int, optional
+        The byte offset to stop at. Defaults to the end of the file.
+    dialect : dict, optional
+        The dialect from `sniff_csv_dialect`, when the file is only a range of
+        another one whose header was sniffed. Sniffed from the file if not given.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The next chunk of the rows.
+    """
+    dialect = dialect or sniff_csv_dialect(file_path, encoding)
+    started = time.perf_counter()
+    yielded = 0
+    engine = 'pyarrow'
+    try:
+        read_options, parse_options, convert_options = _arrow_csv_options(dialect, encoding)
+        read_options.autogenerate_column_names = False
+        read_options.column_names = list(column_names)
+        _keep_temporal_as_text(file_path, read_options, parse_options, convert_options, offset, end)
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            with pa_csv.open_csv(f if end is None else _ByteRange(f, end), read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+                pending, pending_rows = [], 0
+                for batch in reader:
+                    pending.append(batch)
+                    pending_rows += batch.num_rows
+                    while pending_rows >= chunksize:
+                        table = pa.Table.from_batches(pending, schema=reader.schema)
+                        yield _arrow_to_pandas(table.slice(0, chunksize), True).infer_objects()
+                        yielded += chunksize
+                        pending = table.slice(chunksize).to_batches()
+                        pending_rows -= chunksize
+                if pending_rows:
+                    yield _arrow_to_pandas(pa.Table.from_batches(pending, schema=reader.schema), True).infer_objects()
+                    yielded += pending_rows
+    except (pa.ArrowException, UnicodeDecodeError) as e:
+        logging.warning(f"Arrow CSV reader could not parse {file_path} from byte {offset} after {yielded} rows, falling back to the python engine: {e}")
+        engine = 'python'
+        _raise_csv_field_size_limit()
+        skip = yielded
+        with open(file_path, 'rb') as raw:
+            raw.seek(offset)
+            f = io.TextIOWrapper(raw if end is None else io.BufferedReader(_ByteRange(raw, end)), encoding=encoding, newline='')
+            reader = pd.read_csv(f, engine='python', sep=dialect["delimiter"], quotechar=dialect["quotechar"], doublequote=dialect["doublequote"],
+                                 escapechar=dialect["escapechar"], header=None, names=list(column_names), chunksize=chunksize)
+            with reader:
+                for chunk in reader:
+                    if skip >= len(chunk):
+                        skip -= len(chunk)
+                        continue
+                    chunk = chunk.iloc[skip:]
+                    skip = 0
+                    yield chunk.infer_objects()
+                    yielded += len(chunk)
+    _log_read_rate(file_path, engine, yielded, started, (end if end is not None else os.path.getsize(file_path)) - offset)
+
+
+def read_parquet_footer(file_path):
+    """
+    Read row and null counts of a Parquet file from its footer, without decoding the data.
+
+    Flat columns take their null count from the row-group statistics. Columns the
+    statistics do not cover (nested columns, or files written without statistics)
+    are the only ones decoded, and are counted with Arrow rather than pandas.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the Parquet file.
+
+    Returns
+    -------
+    dict
+        A dictionary with the keys "number_of_rows", "number_of_columns" and
+        "column_null_counts", the latter mapping each top-level column to its
+        number of null values.
+    """
+    pf = ParquetFile(file_path)
+    null_counts = _footer_null_counts(pf)
+    undecided = [name for name, count in null_counts.items() if count is None]
+    if undecided:
+        logging.info(f"No null count statistics for {len(undecided)} columns of {file_path}, decoding them")
+        table = pf.read(columns=undecided)
+        for name in undecided:
+            null_counts[name] = table.column(name).null_count
+    return {"number_of_rows": pf.metadata.num_rows, "number_of_columns": len(null_counts), "column_null_counts": null_counts}
+
+
+def _footer_null_counts(pf):
+    # Null count of every top-level column from the row-group statistics, None where they do not tell
+    metadata = pf.metadata
+    null_counts = {name: 0 for name in pf.schema_arrow.names}
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            name = column.path_in_schema
+            stats = column.statistics
+            if name not in null_counts:
+                # Leaf of a nested column; its nulls are not the column's nulls
+                null_counts[name.split('.')[0]] = None
+            elif stats is None or not stats.has_null_count:
+                null_counts[name] = None
+            elif null_counts[name] is not None:
+                null_counts[name] += stats.null_count
+    return null_counts
+
+
+def read_parquet_file(file_path):
+    """
+    Load a Parquet file into a DataFrame together with its footer counts.
+
+    The file is opened once. Columns the footer shows to be entirely null are
+    not decoded, they are added back as null columns of their type, so every
+    metric sees the same DataFrame as from a full read. The other columns are
+    decoded straight into Arrow-backed pandas dtypes.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the Parquet file.
+
+    Returns
+    -------
+    tuple
+        The DataFrame, and the footer counts as returned by `read_parquet_footer`.
+    """
+    pf = ParquetFile(file_path)
+    schema = pf.schema_arrow
+    num_rows = pf.metadata.num_rows
+    null_counts = _footer_null_counts(pf)
+    decoded = [name for name, count in null_counts.items() if count is None or count < num_rows]
+    if len(decoded) < len(null_counts):
+        logging.info(f"{len(null_counts) - len(decoded)} columns of {file_path} are entirely null, not decoding them")
+    table = pf.read(columns=decoded)
+    for name in decoded:
+        if null_counts[name] is None:
+            null_counts[name] = table.column(name).null_count
+    columns = [table.column(field.name) if field.name in decoded else pa.nulls(num_rows, field.type) for field in schema]
+    table = pa.Table.from_arrays(columns, schema=schema)
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    footer = {"number_of_rows": num_rows, "number_of_columns": len(null_counts), "column_null_counts": null_counts}
+    return df, footer
+
+
+def iter_file_chunks(file_path, chunksize=STREAMING_CHUNK_ROWS):
+    """
+    Read a data file as a sequence of DataFrames of at most `chunksize` rows.
+
+    CSV files are read with a chunked reader, Parquet files batch by batch and
+    JSON files record by record, so only one chunk is held in memory at a time.
+    Nested JSON records are flattened into dotted column names.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV, Parquet or JSON file.
+    chunksize : int, optional
+        The maximum number of rows per chunk. Defaults to `STREAMING_CHUNK_ROWS`.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The next chunk of the file.
+    """
+    if file_path.endswith('.csv'):
+        yield from iter_csv_chunks(file_path, chunksize)
+    elif file_path.endswith('.parquet'):
+        pf = ParquetFile(file_path)
+        for batch in pf.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas().infer_objects()
+    elif file_path.endswith('.json'):
+        yield from iter_json_chunks(file_path, chunksize)
+
+
+def read_file_head(file_path, nrows):
+    """
+    Read the first rows of a data file, without reading the rest.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV, Parquet or JSON file.
+    nrows : int
+        The number of rows to read.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The first `nrows` rows, or an empty DataFrame for an empty file.
+    """
+    return next(iter_file_chunks(file_path, nrows), pd.DataFrame())
+
+
+class DataFileHandle:
+    """
+    A data file in a dataset folder that is only read when asked to.
+
+    The size and format are known up front from the directory listing, so a
+    driver can plan a run (order, parallelism, sampling) before any file is
+    opened.
+
+    Parameters
+    ----------
+    path : str
+        The path to the CSV, Parquet or JSON file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.format = os.path.splitext(path)[1].lstrip('.').lower()
+
+    @property
+    def sampled(self):
+        """Whether `load` will return a sample rather than the whole file."""
+        return self.size > SAMPLE_THRESHOLD_BYTES
+
+    def load(self):
+        """Read the file, see `load_data_file`."""
+        return load_data_file(self.path)
+
+    def iter_chunks(self, chunksize=STREAMING_CHUNK_ROWS):
+        """Read the file in chunks, see `iter_file_chunks`."""
+        return iter_file_chunks(self.path, chunksize)
+
+    def head(self, nrows):
+        """Read the first rows of the file, see `read_file_head`."""
+        return read_file_head(self.path, nrows)
+
+    def __repr__(self):
+        return f"DataFileHandle({self.path!r}, format={self.format!r}, size={self.size})"
+
+
+def list_data_file_handles(directory):
+    """
+    List the data files of a directory as unopened `DataFileHandle` objects.
+
+    Parameters
+    ----------
+    directory : str
+        The path to the directory containing the data files.
+
+    Returns
+    -------
+    list of DataFileHandle
+        One handle per file returned by `list_data_files`, in the same order.
+    """
+    return [DataFileHandle(file_path) for file_path in list_data_files(directory)]
+
+
+def iter_data_from_directory(directory):
+    """
+    Load the data files of a directory one at a time.
+
+    Each file is read only when the previous one has been handed over, so as
+    long as the caller drops each DataFrame before asking for the next, peak
+    memory is that of the largest file rather than of the whole folder.
+
+    Parameters
+    ----------
+    directory : str
+        The path to the directory containing the data files.
+
+    Yields
+    ------
+    tuple
+        A pandas DataFrame, its file path and its sampling information, as in
+        `load_data_from_directory`. Files that fail to load are logged and skipped.
     """
-    metadata_names = ["dataset_metadata", "README", "data_description", "data_description_file", "data_attributes", "column_descriptor", "column_descriptions"]
-    data = []
-    files = [file for file in os.listdir(directory) if file.endswith(('.csv', '.parquet', '.json')) and not any(name in file for name in metadata_names) and 'metadata' not in file.lower()]
+    files = [file for file in os.listdir(directory) if _is_data_file(file)]
     subdirectories = [name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))]
     logging.info(f"Found {len(files)} files and {len(subdirectories)} subdirectories in {directory}")
     if not files and not subdirectories:
         logging.error(f"No data files found in the specified directory: {directory}")
-        return []
+        return
     logging.info(f"Files found: {files}")
     logging.info(f"Subdirectories found: {subdirectories}")
-    for file in files:
-        file_path = os.path.join(directory, file)
-        file_size = os.path.getsize(file_path)
-        sample = False
-        if file_size > 4*10**8:  # 400MB
-            sample = True
-            if sample:
-                logging.info(f"Sampling file: {file_path}")
+    for handle in list_data_file_handles(directory):
         try:
-            if file.endswith('.csv'):
-                max_int = sys.maxsize
-                # Some platforms raise OverflowError when you pass sys.maxsize directly; degrade gracefully
-                while True:
-                    try:
-                        csv.field_size_limit(max_int)
-                        break
-                    except OverflowError:
-                        max_int = int(max_int / 10)
-                encoding = 'utf-8'  # Default encoding
-                # encodings = ['utf-8', 'latin1', 'iso-8859-1', 'mac-roman', 'cp1252']
-                # chunksize = 10**6
-                # for encoding in encodings:
-                #     try:
-                #         dfs = []
-                #         for chunk in pd.read_csv(file_path, engine='python', encoding=encoding, chunksize=chunksize):
-                #             dfs.append(chunk)
-                #         df = pd.concat(dfs, ignore_index=True)
-                #         df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                #         break
-                #     except UnicodeDecodeError as e:
-                #         if encoding == encodings[-1]:
-                #             raise e
-                #         else:
-                #             logging.warning(f"Error with encoding {encoding}, trying next encoding")
-                if sample:
-                    df = pd.read_csv(file_path, engine='python', encoding=encoding, nrows=1000000)
-                    df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                else:
-                    df = pd.read_csv(file_path, engine='python', encoding=encoding)
-                    df = df.infer_objects()  # Convert dtypes to pandas dtypes
-            elif file.endswith('.parquet'):
-                if sample:
-                    pf = ParquetFile(file_path)
-                    schema = pf.schema_arrow
-                    first_batch = next(pf.iter_batches(batch_size=1000000))
-                    df = pa.Table.from_batches([first_batch], schema=schema).to_pandas()
-                    df = df.convert_dtypes(dtype_backend='pyarrow')  # Convert dtypes to pandas dtypes
-                    df = df.infer_objects()
-                else:
-                    table = pa.parquet.read_table(file_path, columns=None)
-                    df = table.to_pandas(types_mapper=pd.ArrowDtype)
-                    df = df.convert_dtypes(dtype_backend='pyarrow')  # Convert dtypes to pandas dtypes
-                    df = df.infer_objects()
-            elif file.endswith('.json'):
-                if sample:
-                    df = pd.read_json(file_path, chunksize=1000000)
-                    df = pd.concat([chunk for chunk in df])
-                    df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                else:
-                    df = pd.read_json(file_path)
-                    df = df.infer_objects()  # Convert dtypes to pandas dtypes
-            data.append((df, file_path, sample))
-            logging.info(f"Loaded file: {file_path}")
+            df, sample = handle.load()
         except Exception as e:
-            logging.error(f"Error loading file {file_path}: {e}")
+            logging.error(f"Error loading file {handle.path}: {e}")
+            continue
+        logging.info(f"Loaded file: {handle.path}")
+        yield df, handle.path, sample
+        del df
+
+
+def load_data_from_directory(directory):
+    # Assuming the directory contains only CSV, Parquet and JSON files
+    """
+    Load and return data from CSV, Parquet, and JSON files in a specified directory.
+
+    Every DataFrame is kept in memory at once; use `iter_data_from_directory`
+    to hold only one at a time.
+
+    Parameters
+    ----------
+    directory : str
+        The path to the directory containing the data files.
+
+    Returns
+    -------
+    list of tuples
+        A list of tuples, each containing a pandas DataFrame and the file path 
+        for each loaded file. Only files with extensions '.csv', '.parquet', 
+        and '.json' (excluding those containing 'metadata' in their name) are processed.
+        The third element is False for files read in full, and for files over
+        `SAMPLE_THRESHOLD_BYTES` the dictionary describing the sample returned by
+        `report.sampling.sample_file`.
+    """
+    return list(iter_data_from_directory(directory))
+
+
+def load_data_file(file_path):
+    """
+    Load a data file, sampling it if it is larger than `SAMPLE_THRESHOLD_BYTES`.
+
+    CSV and JSON files go through the on-disk parse cache when `PARSE_CACHE` is enabled.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV, Parquet or JSON file.
+
+    Returns
+    -------
+    tuple
+        The DataFrame, and False if the whole file was read or the dictionary
+        describing the sample returned by `report.sampling.sample_file`.
+    """
+    if os.path.getsize(file_path) > SAMPLE_THRESHOLD_BYTES:
+        logging.info(f"Sampling file: {file_path}")
+        # imported here, report.sampling builds on this module
+        from report.sampling import sample_file, SAMPLE_MAX_ROWS, SAMPLE_MAX_BYTES, SAMPLE_CSV_METHOD, SAMPLE_JSON_METHOD, SAMPLE_SEED
+        loader = lambda: sample_file(file_path)
+        options = {"sample_max_rows": SAMPLE_MAX_ROWS, "sample_max_bytes": SAMPLE_MAX_BYTES, "sample_csv_method": SAMPLE_CSV_METHOD, "sample_json_method": SAMPLE_JSON_METHOD, "sample_seed": SAMPLE_SEED}
+    else:
+        loader = lambda: (load_file(file_path), False)
+        options = {}
+    # Parquet is already columnar and cheap to read, so only text formats are cached
+    if parse_cache.PARSE_CACHE and not file_path.endswith('.parquet'):
+        return parse_cache.cached_load(file_path, loader, options)
+    return loader()
 
-    for subdirectory in subdirectories:
-        subdirectory_path = os.path.join(directory, subdirectory)
-        csv_files = [file for file in os.listdir(subdirectory_path) if file.endswith('.csv') and not any(name in file for name in metadata_names) and 'metadata' not in file.lower()]
-        parquet_files = [file for file in os.listdir(subdirectory_path) if file.endswith('.parquet') and not any(name in file for name in metadata_names) and 'metadata' not in file.lower()]
-        json_files = [file for file in os.listdir(subdirectory_path) if file.endswith('.json') and not any(name in file for name in metadata_names) and 'metadata' not in file.lower()]
-        
-        for file in csv_files + parquet_files + json_files:
-            file_path = os.path.join(subdirectory_path, file)
-            file_size = os.path.getsize(file_path)
-            sample = False
-            if file_size > 4*10**8:  # 400MB
-                sample = True
-            try:
-                if file.endswith('.csv'):
-                    # raise csv field size limit to the largest possible value
-                    max_int = sys.maxsize
-                    # Some platforms raise OverflowError when you pass sys.maxsize directly; degrade gracefully
-                    while True:
-                        try:
-                            csv.field_size_limit(max_int)
-                            break
-                        except OverflowError:
-                            max_int = int(max_int / 10)
-                    encoding = 'utf-8'
-                    # Uncomment the following lines if you want to try multiple encodings
-                    # encodings = ['utf-8', 'latin1', 'iso-8859-1', 'mac-roman', 'cp1252']
-                    # chunksize = 10**6
-                    # for encoding in encodings:
-                    #     try:
-                    #         dfs = []
-                    #         for chunk in pd.read_csv(file_path, engine='python', encoding=encoding, chunksize=chunksize):
-                    #             dfs.append(chunk)
-                    #         df = pd.concat(dfs, ignore_index=True)
-                    #         df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                    #         break
-                    #     except UnicodeDecodeError as e:
-                    #         if encoding == encodings[-1]:
-                    #             raise e
-                    #         else:
-                    #             logging.warning(f"Error with encoding {encoding}, trying next encoding")
-                    if sample:
-                        df = pd.read_csv(file_path, engine='python', encoding=encoding, nrows=1000000)
-                        df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                    else:
-                        df = pd.read_csv(file_path, engine='python', encoding=encoding)
-                        df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                elif file.endswith('.parquet'):
-                    if sample:
-                        pf = ParquetFile(file_path)
-                        schema = pf.schema_arrow
-                        first_batch = next(pf.iter_batches(batch_size=1000000))
-                        df = pa.Table.from_batches([first_batch], schema=schema).to_pandas()
-                        df = df.convert_dtypes(dtype_backend='pyarrow')  # Convert dtypes to pandas dtypes
-                        df = df.infer_objects()
-                    else:
-                        table = pa.parquet.read_table(file_path, columns=None)
-                        df = table.to_pandas(types_mapper=pd.ArrowDtype)
-                        df = df.convert_dtypes(dtype_backend='pyarrow')  # Convert dtypes to pandas dtypes
-                        df = df.infer_objects()
-                elif file.endswith('.json'):
-                    if sample:
-                        df = pd.read_json(file_path, chunksize=1000000)
-                        df = pd.concat([chunk for chunk in df])
-                        df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                    else:
-                        df = pd.read_json(file_path)
-                        df = df.infer_objects()  # Convert dtypes to pandas dtypes
-                data.append((df, file_path, sample))
-                logging.info(f"Loaded file: {file_path}")
-            except Exception as e:
-                logging.error(f"Error loading file {file_path}: {e}")
-    return data
 
+def load_file(file_path):
+    """
+    Load a single CSV, Parquet or JSON file into a DataFrame.
 
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
 
+    Returns
+    -------
+    pandas.DataFrame
+        The contents of the file.
+    """
+    if file_path.endswith('.csv'):
+        encoding = 'utf-8'  # Default encoding
+        df = read_csv_file(file_path, encoding=encoding)
+        df = df.infer_objects()  # Convert dtypes to pandas dtypes
+    elif file_path.endswith('.parquet'):
+        # Arrow-backed dtypes already are the pandas dtypes, no conversion needed
+        df, _ = read_parquet_file(file_path)
+    elif file_path.endswith('.json'):
+        df = read_json_file(file_path, chunksize=STREAMING_CHUNK_ROWS)
+        df = df.infer_objects()  # Convert dtypes to pandas dtypes
+    else:
+        raise ValueError(f"Unsupported file format: {file_path}")
+    return df
@@ -0,0 +1,313 @@
+import json
+import codecs
+import logging
+import pandas as pd
+
+JSON_READ_BYTES = 1 << 20
+# The first line is only parsed on its own to tell JSON Lines apart when it is no longer than this
+JSON_LINE_PROBE_BYTES = 8 * 1024 * 1024
+# How deep to look inside wrapper objects for the array of records
+JSON_MAX_WRAPPER_DEPTH = 3
+_WHITESPACE = ' \t\n\r'
+
+
+def _decoding(encoding):
+    # Drop a UTF-8 byte order mark instead of reading it as the first character
+    return 'utf-8-sig' if encoding.lower().replace('_', '-') in ('utf-8', 'utf8') else encoding
+
+
+class _JsonStream:
+    """
+    Incremental decoder over a JSON text that reads the file a block at a time.
+
+    Only the text of the value being decoded is kept in memory, so a document
+    holding millions of records is read with memory bounded by its largest record.
+    """
+
+    def __init__(self, f, encoding='utf-8'):
+        self.f = f
+        self.decoder = codecs.getincrementaldecoder(_decoding(encoding))(errors='replace')
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def _fill(self):
+        block = self.f.read(JSON_READ_BYTES)
+        self.bytes_read += len(block)
+        if not block:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self.decoder.decode(b'', final=True)
+        else:
+            self.buffer = self.buffer[self.pos:] + self.decoder.decode(block)
+        self.pos = 0
+        return not self.eof
+
+    def bytes_consumed(self):
+        # Approximate: the unread part of the buffer is counted as one byte per character
+        return max(self.bytes_read - (len(self.buffer) - self.pos), 0)
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at character {self.pos}, found {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next block
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Yield the values of the array that starts at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' in array, found {separator!r}")
+
+
+def _probe_json_lines(file_path, encoding):
+    """Return True if the first line holds a complete object and another object follows."""
+    with open(file_path, 'r', encoding=_decoding(encoding), errors='replace') as f:
+        line = f.readline(JSON_LINE_PROBE_BYTES)
+        while line and not line.strip():
+            line = f.readline(JSON_LINE_PROBE_BYTES)
+        if not line.endswith('\n'):
+            return False
+        try:
+            first = json.loads(line)
+        except ValueError:
+            return False
+        if not isinstance(first, dict):
+            return False
+        rest = f.read(JSON_READ_BYTES).lstrip()
+        return rest.startswith('{')
+
+
+def detect_json_layout(file_path, encoding='utf-8'):
+    """
+    Tell how the records of a JSON file are laid out.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the JSON file.
+    encoding : str, optional
+        The encoding of the file. Defaults to 'utf-8'.
+
+    Returns
+    -------
+    str
+        "array" for a top-level array of records, "lines" for JSON Lines, "object"
+        for an object wrapping the records (such as `{"data": [...]}`), or "empty".
+    """
+    with open(file_path, 'rb') as f:
+        first = _JsonStream(f, encoding).peek()
+    if first == '[':
+        return "array"
+    if first == '':
+        return "empty"
+    if first == '{' and _probe_json_lines(file_path, encoding):
+        return "lines"
+    return "object"
+
+
+def _records_in_object(stream, depth=0):
+    """
+    Find the array of records inside a wrapper object and yield its items.
+
+    Keys are read in order. The first array whose first item is an object is
+    taken as the records, looking inside nested objects up to
+    `JSON_MAX_WRAPPER_DEPTH`. Other values are decoded and dropped. If no such
+    array is found, an object whose values are all objects with the same keys,
+    as written by pandas' default `DataFrame.to_json`, is read column by column
+    like `pd.read_json` does; any other object is the only record.
+    """
+    stream.expect('{')
+    skipped = {}
+    if stream.peek() == '}':
+        stream.pos += 1
+        return skipped
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        start = stream.peek()
+        if start == '[':
+            items = stream.items()
+            first = next(items, None)
+            if isinstance(first, dict):
+                logging.info(f"Reading JSON records from the {key!r} array")
+                yield first
+                yield from items
+                return None
+            skipped[key] = [first] + list(items) if first is not None else []
+        elif start == '{' and depth < JSON_MAX_WRAPPER_DEPTH:
+            nested = yield from _records_in_object(stream, depth + 1)
+            if nested is None:
+                return None
+            skipped[key] = nested
+        else:
+            skipped[key] = stream.value()
+        separator = stream.peek()
+        stream.pos += 1
+        if separator == '}':
+            break
+        if separator != ',':
+            raise ValueError(f"Expected ',' or '}}' in object, found {separator!r}")
+    if depth == 0:
+        if _is_column_oriented(skipped):
+            logging.info(f"Reading a column-oriented JSON object of {len(skipped)} columns")
+            columns = list(skipped.values())
+            for row in columns[0]:
+                yield dict(zip(skipped, (column[row] for column in columns)))
+        else:
+            yield skipped
+    return skipped
+
+
+def _is_column_oriented(obj):
+    # {"a": {"0": 1, "1": 2}, "b": {"0": 3, "1": 4}}: every value an object with the same row keys
+    if not obj or not all(isinstance(value, dict) and value for value in obj.values()):
+        return False
+    rows = next(iter(obj.values())).keys()
+    return all(value.keys() == rows for value in obj.values())
+
+
+class JsonRecordReader:
+    """
+    The records of a JSON array, JSON Lines or wrapped JSON file, read one at a time.
+
+    Iterating the reader yields each record, usually a dictionary, while
+    `bytes_consumed` tells how far into the file it got.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the JSON file.
+    encoding : str, optional
+        The encoding of the file. Defaults to 'utf-8'.
+    """
+
+    def __init__(self, file_path, encoding='utf-8'):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.layout = detect_json_layout(file_path, encoding)
+        self.stream = None
+
+    @property
+    def bytes_consumed(self):
+        return self.stream.bytes_consumed() if self.stream else 0
+
+    def __iter__(self):
+        if self.layout == "empty":
+            return
+        with open(self.file_path, 'rb') as f:
+            self.stream = _JsonStream(f, self.encoding)
+            if self.layout == "array":
+                yield from self.stream.items()
+            elif self.layout == "lines":
+                while self.stream.peek():
+                    yield self.stream.value()
+            else:
+                yield from _records_in_object(self.stream)
+
+
+def _flatten(records):
+    records = [record if isinstance(record, dict) else {"value": record} for record in records]
+    return pd.json_normalize(records)
+
+
+def iter_json_chunks(file_path, chunksize, encoding='utf-8', max_rows=None, reader=None):
+    """
+    Read a JSON file as a sequence of flattened DataFrames of at most `chunksize` rows.
+
+    Nested objects are flattened into dotted column names batch by batch. A
+    column first seen in a later batch is added to the columns of every
+    following chunk, so chunks never lose columns seen before.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the JSON file.
+    chunksize : int
+        The maximum number of rows per chunk.
+    encoding : str, optional
+        The encoding of the file. Defaults to 'utf-8'.
+    max_rows : int, optional
+        Stop reading once this many records have been read.
+    reader : JsonRecordReader, optional
+        The reader to take the records from, for callers that track its progress.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The next chunk of the file.
+    """
+    columns = []
+    batch = []
+    rows = 0
+    for record in reader or JsonRecordReader(file_path, encoding):
+        batch.append(record)
+        rows += 1
+        if len(batch) >= chunksize or (max_rows is not None and rows >= max_rows):
+            chunk = _flatten(batch)
+            columns += [col for col in chunk.columns if col not in columns]
+            yield chunk.reindex(columns=columns).infer_objects()
+            batch = []
+        if max_rows is not None and rows >= max_rows:
+            return
+    if batch:
+        chunk = _flatten(batch)
+        columns += [col for col in chunk.columns if col not in columns]
+        yield chunk.reindex(columns=columns).infer_objects()
+
+
+def read_json_file(file_path, encoding='utf-8', chunksize=100000):
+    """
+    Read a whole JSON file into a flattened DataFrame.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the JSON file.
+    encoding : str, optional
+        The encoding of the file. Defaults to 'utf-8'.
+    chunksize : int, optional
+        The number of records flattened at a time. Defaults to 100000.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The records of the file.
+    """
+    chunks = list(iter_json_chunks(file_path, chunksize, encoding))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True).infer_objects()
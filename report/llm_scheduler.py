@@ -0,0 +1,251 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import openai
+
+# OpenAI requests in flight at once
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
+# Requests started per minute, refilled continuously; 0 disables the limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+# Functions submitted to the stage that run at once, e.g. reading a file head before asking
+LLM_SUBMIT_WORKERS = 8
+# Retries of a request failing with a rate limit, connection or server error
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+# The n-th retry waits a random time up to LLM_BACKOFF_SECONDS * 2**n, capped at LLM_BACKOFF_MAX_SECONDS
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", 1))
+LLM_BACKOFF_MAX_SECONDS = 30
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def backoff_delay(attempt, base=LLM_BACKOFF_SECONDS, cap=LLM_BACKOFF_MAX_SECONDS):
+    """
+    Return the wait before a retry, with full jitter so clients do not retry in step.
+
+    Parameters
+    ----------
+    attempt : int
+        The number of attempts that failed so far, minus one.
+    base : float, optional
+        The wait in seconds of the first retry. Defaults to `LLM_BACKOFF_SECONDS`.
+    cap : float, optional
+        The longest wait in seconds. Defaults to `LLM_BACKOFF_MAX_SECONDS`.
+
+    Returns
+    -------
+    float
+        A random wait between 0 and min(cap, base * 2**attempt) seconds.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for coroutines of one event loop.
+
+    The bucket holds at most `capacity` tokens and gains `rate` tokens per
+    second. Each request takes one token, waiting for it if the bucket is empty,
+    so bursts of up to `capacity` requests go out at once and the long-run rate
+    never exceeds `rate`.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second; 0 or less disables the limit.
+    capacity : float, optional
+        The largest burst. Defaults to one second's worth of tokens, at least 1.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for a token and take it."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class InferenceStage:
+    """
+    Background event loop running LLM inference concurrently with the rest of the pipeline.
+
+    Work is handed over with `submit`, which returns at once with a
+    `concurrent.futures.Future`, so a driver can start inference for every
+    file up front and collect the answers when it needs them. Submitted
+    functions run in a thread pool of their own. The OpenAI requests they make
+    go through `call`, which admits at most `concurrency` of them at a time and
+    at most `requests_per_minute` per minute, and retries the transient
+    failures with jittered exponential backoff. Submitted work that makes no request,
+    such as a cache hit, is not held back by the limits.
+
+    Parameters
+    ----------
+    concurrency : int, optional
+        Requests in flight at once. Defaults to `LLM_CONCURRENCY`.
+    requests_per_minute : float, optional
+        Requests started per minute. Defaults to `LLM_REQUESTS_PER_MINUTE`.
+    max_retries : int, optional
+        Retries of a failing request. Defaults to `LLM_MAX_RETRIES`.
+    backoff : float, optional
+        The wait in seconds before the first retry. Defaults to `LLM_BACKOFF_SECONDS`.
+    """
+
+    def __init__(self, concurrency=LLM_CONCURRENCY, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF_SECONDS):
+        self.pid = os.getpid()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        # Separate pools, so submitted functions waiting on `call` never starve the requests themselves
+        self.workers = ThreadPoolExecutor(max_workers=LLM_SUBMIT_WORKERS, thread_name_prefix="llm-submit")
+        self.requests = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="llm-request")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="llm-inference", daemon=True)
+        self.thread.start()
+
+        async def setup():
+            return asyncio.Semaphore(max(concurrency, 1)), TokenBucket(requests_per_minute / 60, capacity=max(concurrency, 1))
+        self.semaphore, self.bucket = asyncio.run_coroutine_threadsafe(setup(), self.loop).result()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` in the background.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            The future of the result.
+        """
+        return self.workers.submit(func, *args, **kwargs)
+
+    async def _request(self, func, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                await self.bucket.acquire()
+                self.stats["requests"] += 1
+                try:
+                    return await self.loop.run_in_executor(self.requests, functools.partial(func, *args, **kwargs))
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        self.stats["failures"] += 1
+                        raise
+                    delay = backoff_delay(attempt, self.backoff)
+                    self.stats["retries"] += 1
+                    logging.warning(f"{func.__name__} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Make one OpenAI request through the limits, blocking the calling thread until it is answered.
+
+        Parameters
+        ----------
+        func : callable
+            The function making the request, e.g. `infer_column_roles_openai`.
+        *args, **kwargs
+            Passed on to `func`.
+
+        Returns
+        -------
+        object
+            The result of `func`.
+
+        Raises
+        ------
+        Exception
+            What `func` raised on the last attempt, or at once for errors that are not retried.
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("InferenceStage.call cannot be made from the inference loop itself")
+        return asyncio.run_coroutine_threadsafe(self._request(func, args, kwargs), self.loop).result()
+
+    def call_many(self, func, arg_lists):
+        """
+        Make several OpenAI requests at once through the limits, blocking until all are answered.
+
+        Parameters
+        ----------
+        func : callable
+            The function making each request.
+        arg_lists : list of tuple
+            The positional arguments of each request.
+
+        Returns
+        -------
+        list
+            The result of each request, in order.
+
+        Raises
+        ------
+        Exception
+            The first error of a request that failed, see `call`.
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("InferenceStage.call_many cannot be made from the inference loop itself")
+
+        async def gather():
+            return await asyncio.gather(*(self._request(func, args, {}) for args in arg_lists))
+        return asyncio.run_coroutine_threadsafe(gather(), self.loop).result()
+
+    def close(self):
+        """Wait for the submitted work, then stop the event loop."""
+        self.workers.shutdown()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.requests.shutdown()
+
+
+_STAGE = None
+_STAGE_LOCK = threading.Lock()
+
+
+def get_stage():
+    """
+    Return the inference stage of this process, starting it on first use.
+
+    A worker process forked from a driver gets a stage of its own, as the
+    driver's event loop thread does not survive the fork.
+
+    Returns
+    -------
+    InferenceStage
+        The shared stage.
+    """
+    global _STAGE
+    with _STAGE_LOCK:
+        if _STAGE is None or _STAGE.pid != os.getpid():
+            _STAGE = InferenceStage()
+        return _STAGE
+
+
+def call_llm(func, *args, **kwargs):
+    """Make one OpenAI request through the shared stage, see `InferenceStage.call`."""
+    return get_stage().call(func, *args, **kwargs)
+
+
+def call_llm_many(func, arg_lists):
+    """Make several OpenAI requests at once through the shared stage, see `InferenceStage.call_many`."""
+    return get_stage().call_many(func, arg_lists)
+
+
+def submit_inference(func, *args, **kwargs):
+    """Start `func(*args, **kwargs)` on the shared stage, see `InferenceStage.submit`."""
+    return get_stage().submit(func, *args, **kwargs)
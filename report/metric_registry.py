@@ -0,0 +1,157 @@
+import os
+import time
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Metrics of one file evaluated at once; 1 runs them one after the other
+METRIC_WORKERS = int(os.getenv("METRIC_WORKERS", 4))
+
+# Pipeline name -> registered metrics
+_REGISTRY = {}
+
+
+class Metric:
+    """
+    A raw report metric and what it needs and produces.
+
+    Parameters
+    ----------
+    func : callable
+        The metric. Called with keyword arguments only and returns a dict.
+    inputs : dict
+        Parameter names of `func` mapped to the names of the inputs passed to them.
+    outputs : tuple of str
+        The raw report keys the metric returns.
+    when : callable, optional
+        Called with the inputs; the metric only runs if it returns True.
+    order : int, optional
+        Where the metric's keys go in the report, lowest first. Defaults to 1000.
+    """
+
+    def __init__(self, func, inputs, outputs, when=None, order=1000):
+        self.func = func
+        self.name = func.__name__
+        self.inputs = inputs
+        self.outputs = tuple(outputs)
+        self.when = when
+        self.order = order
+
+    def applies(self, context, needed_keys=None):
+        """Whether the metric runs for these inputs and produces any of `needed_keys`."""
+        if needed_keys is not None and not any(key in needed_keys for key in self.outputs):
+            return False
+        return self.when is None or self.when(context)
+
+    def __call__(self, context):
+        return self.func(**{param: context[source] for param, source in self.inputs.items()})
+
+    def __repr__(self):
+        return f"Metric({self.name!r}, inputs={list(self.inputs.values())}, outputs={list(self.outputs)})"
+
+
+def register_metric(pipeline, outputs, inputs=None, when=None, order=1000):
+    """
+    Register a function as a metric of a pipeline, as a decorator.
+
+    Parameters
+    ----------
+    pipeline : str
+        The pipeline running the metric, "structured" or "unstructured".
+    outputs : list of str
+        The raw report keys the metric returns.
+    inputs : list or dict, optional
+        The inputs the metric reads, e.g. "df", "null_profile", "directory" or
+        "imputed_columns". A list names parameters of the function that take
+        the input of the same name; a dict maps parameter names to inputs.
+        Defaults to the parameters of the function without a default value.
+    when : callable, optional
+        Called with the inputs; the metric only runs if it returns True.
+    order : int, optional
+        Where the metric's keys go in the report, lowest first, so the report
+        does not depend on the order the metric modules were imported in.
+        Defaults to 1000, after the built-in metrics.
+
+    Returns
+    -------
+    callable
+        The decorator, which returns the function unchanged.
+    """
+    def decorator(func):
+        if inputs is None:
+            params = [name for name, param in inspect.signature(func).parameters.items() if param.default is inspect.Parameter.empty]
+            mapping = {name: name for name in params}
+        elif isinstance(inputs, dict):
+            mapping = dict(inputs)
+        else:
+            mapping = {name: name for name in inputs}
+        metrics = _REGISTRY.setdefault(pipeline, [])
+        # Re-importing a module replaces its metrics rather than adding them twice
+        metrics[:] = [metric for metric in metrics if metric.func.__qualname__ != func.__qualname__ or metric.func.__module__ != func.__module__]
+        metrics.append(Metric(func, mapping, outputs, when, order))
+        return func
+    return decorator
+
+
+def registered_metrics(pipeline):
+    """Return the metrics registered for a pipeline, by `order` and then registration order."""
+    return sorted(_REGISTRY.get(pipeline, []), key=lambda metric: metric.order)
+
+
+def run_metrics(pipeline, context, needed_keys=None, workers=METRIC_WORKERS):
+    """
+    Run the metrics of a pipeline and merge their results into one raw report.
+
+    Metrics only read their inputs, so they run concurrently in a thread
+    pool. The report keeps the keys in metric order whatever order the
+    metrics finish in. Inputs can be given as callables taking no
+    arguments; these are evaluated once, and only if a metric that runs needs them.
+
+    Parameters
+    ----------
+    pipeline : str
+        The pipeline whose metrics to run.
+    context : dict
+        The inputs, e.g. {"df": df, "directory": path, "imputed_columns": roles}.
+    needed_keys : set of str, optional
+        The raw report keys the scoring reads. Metrics producing none of them
+        are skipped. Defaults to running every metric.
+    workers : int, optional
+        The number of metrics run at once. Defaults to `METRIC_WORKERS`.
+
+    Returns
+    -------
+    tuple
+        The raw report, and the seconds each metric that ran took, by metric name.
+    """
+    context = dict(context)
+    metrics = [metric for metric in registered_metrics(pipeline) if metric.applies(context, needed_keys)]
+    skipped = [metric.name for metric in registered_metrics(pipeline) if metric not in metrics]
+    if skipped:
+        logging.info(f"Skipping metrics that do not apply or are not needed for the report: {skipped}")
+
+    # Resolve the lazy inputs the metrics that run need, once, before they start
+    needed_inputs = {source for metric in metrics for source in metric.inputs.values()}
+    for name in needed_inputs:
+        if callable(context.get(name)):
+            context[name] = context[name]()
+
+    def timed(metric):
+        logging.info(f"Calling function: {metric.name}")
+        started = time.perf_counter()
+        result = metric(context)
+        return result, time.perf_counter() - started
+
+    if workers <= 1 or len(metrics) <= 1:
+        results = [timed(metric) for metric in metrics]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metric") as executor:
+            results = list(executor.map(timed, metrics))
+
+    report = {}
+    timings = {}
+    for metric, (result, seconds) in zip(metrics, results):
+        report.update(result)
+        timings[metric.name] = round(seconds, 4)
+    logging.info(f"Metric timings (s): {timings}")
+    return report, timings
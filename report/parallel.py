@@ -0,0 +1,173 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from report.input_handler import SAMPLE_THRESHOLD_BYTES
+
+# Number of files profiled at once; 1 keeps the sequential behaviour
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", 1))
+# Memory the in-flight files may use together; defaults to 80% of the free memory
+PROFILE_MEMORY_BUDGET_BYTES = int(os.getenv("PROFILE_MEMORY_BUDGET_BYTES")) if os.getenv("PROFILE_MEMORY_BUDGET_BYTES") else None
+# How worker processes are started. Not fork: the parent already runs threads, e.g. the
+# column role inference, and a child forked while one of them holds a lock can deadlock
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+# Rough size of a loaded DataFrame relative to the file it was read from
+MEMORY_EXPANSION = {'.csv': 5, '.json': 8, '.parquet': 10}
+
+
+def available_memory_bytes():
+    """
+    Return the free physical memory in bytes, or None where it cannot be read.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_file_memory(file_path):
+    """
+    Estimate the memory needed to profile a file.
+
+    Files over the sampling threshold are never loaded whole, so they are
+    counted at the threshold.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+
+    Returns
+    -------
+    int
+        The estimated peak memory in bytes.
+    """
+    size = min(os.path.getsize(file_path), SAMPLE_THRESHOLD_BYTES)
+    return size * MEMORY_EXPANSION.get(os.path.splitext(file_path)[1].lower(), 5)
+
+
+def process_pool(max_workers):
+    """
+    Create a process pool whose workers are started with `PROCESS_START_METHOD`.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of worker processes.
+
+    Returns
+    -------
+    concurrent.futures.ProcessPoolExecutor
+        The pool. Its functions and arguments must be picklable.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+
+
+def _resolve(future, file_path):
+    if not isinstance(future, Future):
+        return future
+    try:
+        return future.result()
+    except Exception as e:
+        logging.error(f"Could not get the input for {file_path}: {e}")
+        return None
+
+
+def map_files(func, file_paths, workers=PROFILE_WORKERS, memory_budget=PROFILE_MEMORY_BUDGET_BYTES, inputs=None, on_result=None):
+    """
+    Apply `func` to every file, in a pool of worker processes when `workers` > 1.
+
+    Files are admitted to the pool only while the estimated memory of the files
+    in flight stays within `memory_budget`, so two huge files are not loaded at
+    the same time; a file that does not fit waits while smaller ones go ahead.
+    One file is always admitted when nothing else is running. Results are
+    returned in the order of `file_paths` whatever order they finish in.
+
+    Parameters
+    ----------
+    func : callable
+        A module-level function taking a file path. Its result must be picklable.
+    file_paths : list of str
+        The files to process.
+    workers : int, optional
+        The number of worker processes. Defaults to `PROFILE_WORKERS`.
+    memory_budget : int, optional
+        The memory in bytes that files in flight may use together. Defaults to
+        `PROFILE_MEMORY_BUDGET_BYTES`, or 80% of the free memory if unset.
+    inputs : list, optional
+        One input per file, passed to `func` as a second argument. An input can
+        be a `concurrent.futures.Future`, e.g. the file's column roles being
+        inferred in the background; the file is then started once the future
+        is done and gets its result, or None if the future failed.
+    on_result : callable, optional
+        Called in this process with the index of every file and its result as
+        soon as the result arrives, e.g. to fold it into a running total while
+        other files are still processed. It may change the result in place.
+
+    Returns
+    -------
+    list
+        The result of `func` for each file, or None for a file that failed or whose worker died.
+    """
+    if inputs is None:
+        args = lambda i: (file_paths[i],)
+    else:
+        args = lambda i: (file_paths[i], _resolve(inputs[i], file_paths[i]))
+    if on_result is None:
+        on_result = lambda i, result: None
+
+    def run_sequentially():
+        results = []
+        for i in range(len(file_paths)):
+            results.append(func(*args(i)))
+            on_result(i, results[i])
+        return results
+
+    if workers <= 1 or len(file_paths) <= 1:
+        return run_sequentially()
+    if memory_budget is None:
+        memory_budget = int((available_memory_bytes() or 0) * 0.8) or None
+
+    try:
+        executor = process_pool(workers)
+    except (OSError, NotImplementedError) as e:
+        # AWS Lambda has no /dev/shm, which the pool's queues need
+        logging.warning(f"Could not start a process pool, processing files sequentially: {e}")
+        return run_sequentially()
+
+    estimates = [estimate_file_memory(file_path) for file_path in file_paths]
+    results = [None] * len(file_paths)
+    pending = list(range(len(file_paths)))
+    running = {}
+    in_use = 0
+    logging.info(f"Processing {len(file_paths)} files with {workers} workers and a memory budget of {memory_budget} bytes")
+    with executor:
+        while pending or running:
+            for i in list(pending):
+                if len(running) >= workers:
+                    break
+                if running and memory_budget is not None and in_use + estimates[i] > memory_budget:
+                    continue
+                try:
+                    running[executor.submit(func, *args(i))] = i
+                except BrokenProcessPool:
+                    logging.error(f"Worker pool is broken, skipping {len(pending)} remaining files")
+                    pending = []
+                    break
+                pending.remove(i)
+                in_use += estimates[i]
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                in_use -= estimates[i]
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool as e:
+                    logging.error(f"Worker processing {file_paths[i]} died: {e}")
+                except Exception as e:
+                    logging.error(f"Error processing {file_paths[i]}: {e}")
+                on_result(i, results[i])
+    return results
@@ -0,0 +1,253 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import pyarrow as pa
+
+# Cache parsed CSV and JSON tables on disk so that re-scoring a folder skips the parse
+PARSE_CACHE = os.getenv("PARSE_CACHE", "false").lower() == "true"
+# Lambda only lets us write to /tmp, which also holds the downloaded input files
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR") or ("/tmp/parse_cache" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else ".parse_cache")
+# Size the cache may grow to; defaults to 5 GB, or half of the free space of /tmp under Lambda
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES")) if os.getenv("PARSE_CACHE_MAX_BYTES") else None
+# Bump when the readers change in a way that changes the parsed tables
+PARSE_CACHE_VERSION = 2
+HASH_BLOCK_BYTES = 1 << 20
+SAMPLE_METADATA_KEY = b'tgdex_sample'
+
+
+def file_content_hash(file_path):
+    """
+    Hash the contents of a file.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
+
+    Returns
+    -------
+    str
+        The hex digest of the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(file_path, options=None):
+    """
+    Build the cache key of a file: its content hash plus the reader options.
+
+    The file name is not part of the key, so a renamed or copied file still hits.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+    options : dict, optional
+        Reader settings that change the parsed table, such as the sampling budget.
+
+    Returns
+    -------
+    str
+        The cache key.
+    """
+    settings = json.dumps({"version": PARSE_CACHE_VERSION, "extension": os.path.splitext(file_path)[1].lower(), **(options or {})}, sort_keys=True, default=str)
+    return hashlib.blake2b(f"{file_content_hash(file_path)}:{settings}".encode(), digest_size=20).hexdigest()
+
+
+def _entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.arrow'):
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def cache_budget_bytes(cache_dir=PARSE_CACHE_DIR):
+    """
+    Return the size in bytes the cache may grow to.
+
+    Under Lambda the budget is half of what is left of /tmp, counting the space
+    the cache already holds, so downloads and reports still fit.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        The cache directory. Defaults to `PARSE_CACHE_DIR`.
+
+    Returns
+    -------
+    int
+        The cache budget in bytes.
+    """
+    if PARSE_CACHE_MAX_BYTES is not None:
+        return PARSE_CACHE_MAX_BYTES
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        used = sum(size for _, size, _ in _entries(cache_dir))
+        free = shutil.disk_usage(cache_dir if os.path.isdir(cache_dir) else "/tmp").free
+        return int((free + used) * 0.5)
+    return 5 * 10**9
+
+
+def evict(cache_dir=PARSE_CACHE_DIR, max_bytes=None):
+    """
+    Delete the least recently used entries until the cache fits its budget.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        The cache directory. Defaults to `PARSE_CACHE_DIR`.
+    max_bytes : int, optional
+        The budget in bytes. Defaults to `cache_budget_bytes()`.
+
+    Returns
+    -------
+    int
+        The number of entries deleted.
+    """
+    if max_bytes is None:
+        max_bytes = cache_budget_bytes(cache_dir)
+    entries = sorted(_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    if removed:
+        logging.info(f"Evicted {removed} parse cache entries from {cache_dir}")
+    return removed
+
+
+def read_cached(key, cache_dir=PARSE_CACHE_DIR):
+    """
+    Reopen a cached table, memory-mapping the Arrow IPC file.
+
+    Parameters
+    ----------
+    key : str
+        The cache key returned by `cache_key`.
+    cache_dir : str, optional
+        The cache directory. Defaults to `PARSE_CACHE_DIR`.
+
+    Returns
+    -------
+    tuple or None
+        The DataFrame and the sample information stored with it, or None on a miss.
+    """
+    path = os.path.join(cache_dir, f"{key}.arrow")
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+            sample = json.loads((table.schema.metadata or {}).get(SAMPLE_METADATA_KEY, b'false'))
+            df = table.to_pandas()
+        os.utime(path)  # mark as recently used
+    except (pa.ArrowException, OSError, ValueError) as e:
+        logging.warning(f"Discarding unreadable parse cache entry {path}: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return df, sample
+
+
+def write_cached(key, df, sample=False, cache_dir=PARSE_CACHE_DIR):
+    """
+    Store a parsed table in the cache as an Arrow IPC file.
+
+    Tables Arrow cannot represent, such as object columns of mixed types, are
+    not cached.
+
+    Parameters
+    ----------
+    key : str
+        The cache key returned by `cache_key`.
+    df : pandas.DataFrame
+        The parsed table.
+    sample : dict or bool, optional
+        The sample information to store with the table. Defaults to False.
+    cache_dir : str, optional
+        The cache directory. Defaults to `PARSE_CACHE_DIR`.
+
+    Returns
+    -------
+    bool
+        True if the table was cached.
+    """
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        logging.info(f"Not caching table with columns Arrow cannot store: {e}")
+        return False
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SAMPLE_METADATA_KEY: json.dumps(sample).encode()})
+    budget = cache_budget_bytes(cache_dir)
+    if table.nbytes > budget:
+        logging.info(f"Not caching table of {table.nbytes} bytes, over the parse cache budget of {budget} bytes")
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.arrow")
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(partial, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(partial, path)  # readers never see a half written entry
+    except (pa.ArrowException, OSError) as e:
+        logging.warning(f"Could not write parse cache entry {path}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    evict(cache_dir, budget)
+    return True
+
+
+def cached_load(file_path, loader, options=None, cache_dir=PARSE_CACHE_DIR):
+    """
+    Load a file through the parse cache.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+    loader : callable
+        Called without arguments on a miss; returns the DataFrame and the sample information.
+    options : dict, optional
+        Reader settings that are part of the cache key.
+    cache_dir : str, optional
+        The cache directory. Defaults to `PARSE_CACHE_DIR`.
+
+    Returns
+    -------
+    tuple
+        The DataFrame and the sample information, as returned by `loader`.
+    """
+    key = cache_key(file_path, options)
+    cached = read_cached(key, cache_dir)
+    if cached is not None:
+        logging.info(f"Parse cache hit for {file_path}")
+        return cached
+    logging.info(f"Parse cache miss for {file_path}")
+    df, sample = loader()
+    write_cached(key, df, sample, cache_dir)
+    return df, sample
@@ -28,6 +28,9 @@ class PDFReport(FPDF):
             Total score of the dataset
         logo_path : str, optional
             Path to the logo to be displayed on the top left of the report, by default None
+        sample : bool or dict, optional
+            Whether the dataset was sampled, or the sampling description from
+            `report.sampling.sample_file` to show its method and fraction, by default False
         """
         super().__init__()
         self.sample = sample
@@ -37,6 +40,8 @@ class PDFReport(FPDF):
         self.true_name = self.sanitize_text(true_name)
         if self.average_report:
             self.dataset_name = f"{self.true_name} - Average Report"
+        elif isinstance(self.sample, dict):
+            self.dataset_name = f"{self.true_name} (Sampled - {self.sample_size} rows, {self.sample['sampling_fraction'] * 100:.1f}% of file, {self.sample['sampling_method'].replace('_', ' ')})"
         elif self.sample:
             self.dataset_name = f"{self.true_name} (Sampled - {self.sample_size} rows)"
         else:
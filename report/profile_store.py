@@ -0,0 +1,160 @@
+import os
+import json
+import logging
+from report.parse_cache import file_content_hash
+
+# Keep each file's profile next to the reports and reuse it while the file is unchanged
+PROFILE_STORE = os.getenv("PROFILE_STORE", "true").lower() == "true"
+# Written to the output directory and uploaded with the reports, so the next run finds it
+PROFILE_MANIFEST_NAME = "profile_manifest.json"
+# Bump when the metrics or the scoring change, so stored profiles are recomputed
+PROFILE_STORE_VERSION = 2
+
+
+def file_fingerprint(file_path, etag=None):
+    """
+    Fingerprint the contents of a data file.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
+    etag : str, optional
+        The S3 ETag of the object the file was downloaded from. Used instead of
+        hashing the file, so an unchanged object need not be downloaded to be recognised.
+
+    Returns
+    -------
+    str
+        "etag:<etag>" or "blake2b:<content hash>".
+    """
+    if etag:
+        return "etag:" + etag.strip('"')
+    return f"blake2b:{file_content_hash(file_path)}"
+
+
+def load_manifest(output_dir, settings=None):
+    """
+    Read the profiles stored by the last run.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory of the reports.
+    settings : dict, optional
+        Settings that change the profiles, e.g. streaming or not. Profiles
+        stored under other settings or another `PROFILE_STORE_VERSION` are dropped.
+
+    Returns
+    -------
+    dict
+        File name -> {"fingerprint": str, "profile": dict}, empty when there is no usable manifest.
+    """
+    path = os.path.join(output_dir, PROFILE_MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable profile manifest {path}: {e}")
+        return {}
+    if manifest.get("version") != PROFILE_STORE_VERSION or manifest.get("settings") != (settings or {}):
+        logging.info(f"Stored profiles in {path} were made by another version or other settings, profiling every file")
+        return {}
+    return manifest.get("files", {})
+
+
+def write_manifest(output_dir, files, settings=None):
+    """
+    Store the profiles of this run, replacing the last ones.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory of the reports.
+    files : dict
+        File name -> {"fingerprint": str, "profile": dict}, for every file of the folder.
+    settings : dict, optional
+        The settings the profiles were made with, see `load_manifest`.
+
+    Returns
+    -------
+    bool
+        True if the manifest was written.
+    """
+    path = os.path.join(output_dir, PROFILE_MANIFEST_NAME)
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({"version": PROFILE_STORE_VERSION, "settings": settings or {}, "files": files}, f)
+        os.replace(partial, path)
+    except (OSError, TypeError, ValueError) as e:
+        logging.warning(f"Could not write the profile manifest {path}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    return True
+
+
+def stored_profile(manifest, name, fingerprint):
+    """
+    Return the stored profile of a file if it is unchanged, else None.
+
+    Parameters
+    ----------
+    manifest : dict
+        As returned by `load_manifest`.
+    name : str
+        The file name.
+    fingerprint : str
+        The current fingerprint of the file, from `file_fingerprint`.
+
+    Returns
+    -------
+    dict or None
+        The profile stored for the file.
+    """
+    entry = manifest.get(name)
+    if entry is None or entry.get("fingerprint") != fingerprint:
+        return None
+    return entry.get("profile")
+
+
+def split_unchanged(file_paths, directory, manifest, file_etags=None):
+    """
+    Fingerprint the files of a folder and find those whose stored profile can be reused.
+
+    Parameters
+    ----------
+    file_paths : list of str
+        The data files on disk.
+    directory : str
+        The folder, to which the manifest's file names are relative.
+    manifest : dict
+        As returned by `load_manifest`.
+    file_etags : dict, optional
+        File name -> S3 ETag. May name files that are not on disk because the
+        caller did not download them; they count as unchanged if their ETag matches.
+
+    Returns
+    -------
+    tuple
+        The fingerprint of every file, by path, and the stored profiles of the unchanged files, by path.
+    """
+    file_etags = file_etags or {}
+    fingerprints = {}
+    for file_path in file_paths:
+        name = os.path.relpath(file_path, directory)
+        fingerprints[file_path] = file_fingerprint(file_path, file_etags.get(name))
+    local_names = {os.path.relpath(file_path, directory) for file_path in file_paths}
+    for name, etag in file_etags.items():
+        if name not in local_names:
+            fingerprints[os.path.join(directory, name)] = file_fingerprint(None, etag)
+    reused = {}
+    for file_path, fingerprint in fingerprints.items():
+        profiled = stored_profile(manifest, os.path.relpath(file_path, directory), fingerprint)
+        if profiled is not None:
+            reused[file_path] = profiled
+    return fingerprints, reused
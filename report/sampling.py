@@ -0,0 +1,348 @@
+import io
+import os
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow.parquet import ParquetFile
+from report.input_handler import iter_csv_chunks, sniff_csv_dialect, STREAMING_CHUNK_ROWS
+from report.json_reader import JsonRecordReader, iter_json_chunks
+from report.metric_registry import register_metric
+
+# Sampling budget for files above the sampling threshold. The row budget always
+# applies; a byte budget, when set, lowers it using the file's bytes per row.
+SAMPLE_MAX_ROWS = int(os.getenv("SAMPLE_MAX_ROWS", 1000000))
+SAMPLE_MAX_BYTES = int(os.getenv("SAMPLE_MAX_BYTES")) if os.getenv("SAMPLE_MAX_BYTES") else None
+# "reservoir" reads the whole CSV once; "seek" reads blocks at random byte offsets
+SAMPLE_CSV_METHOD = os.getenv("SAMPLE_CSV_METHOD", "reservoir")
+# "reservoir" streams the whole JSON file; "head" stops reading once the budget is met
+SAMPLE_JSON_METHOD = os.getenv("SAMPLE_JSON_METHOD", "reservoir")
+SAMPLE_SEED = int(os.getenv("SAMPLE_SEED", 0))
+SEEK_BLOCKS = 200
+
+
+@register_metric("structured", outputs=["sampling_method", "sampling_fraction"], inputs=["sampling"], order=110)
+def describe_sampling(sampling=None):
+    """
+    Describe how a file was sampled, for the raw report.
+
+    Parameters
+    ----------
+    sampling : dict or None
+        The sampling information returned by `sample_file`, or None if the
+        whole file was read.
+
+    Returns
+    -------
+    dict
+        A dictionary with the keys "sampling_method" and "sampling_fraction".
+    """
+    if not sampling:
+        return {"sampling_method": "none", "sampling_fraction": 1.0}
+    return {"sampling_method": sampling["sampling_method"], "sampling_fraction": sampling["sampling_fraction"]}
+
+
+def _row_budget(bytes_per_row, max_rows, max_bytes):
+    if max_bytes is None or not bytes_per_row:
+        return max_rows
+    return max(1, min(max_rows, int(max_bytes / bytes_per_row)))
+
+
+class BottomKSample:
+    """
+    Uniform sample of `k` rows from a stream of chunks.
+
+    Every row gets a random key and the `k` rows with the smallest keys are kept,
+    which is reservoir sampling in a form that works on whole chunks at once.
+    Rows are returned in file order.
+    """
+
+    def __init__(self, k, seed=SAMPLE_SEED):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.rows_seen = 0
+        self.sample = None
+
+    def update(self, chunk):
+        chunk = chunk.reset_index(drop=True)
+        chunk.index = pd.RangeIndex(self.rows_seen, self.rows_seen + len(chunk))
+        self.rows_seen += len(chunk)
+        keys = pd.Series(self.rng.random(len(chunk)), index=chunk.index)
+        if self.sample is not None and len(self.sample[1]) == self.k:
+            # Once the reservoir is full only rows below its k-th key can enter it
+            below = (keys < self.sample[1].max()).to_numpy()
+            chunk, keys = chunk[below], keys[below]
+        if self.sample is not None:
+            chunk = pd.concat([self.sample[0], chunk])
+            keys = pd.concat([self.sample[1], keys])
+        if len(chunk) > self.k:
+            keep = keys.nsmallest(self.k).index
+            chunk, keys = chunk.loc[keep], keys.loc[keep]
+        self.sample = (chunk, keys)
+
+    def result(self):
+        if self.sample is None:
+            return pd.DataFrame()
+        return self.sample[0].sort_index().reset_index(drop=True)
+
+
+def sample_csv_reservoir(file_path, max_rows=SAMPLE_MAX_ROWS, max_bytes=SAMPLE_MAX_BYTES, seed=SAMPLE_SEED):
+    """
+    Draw a uniform sample of rows from the whole of a CSV file.
+
+    The file is streamed once in chunks, so memory is bounded by the budget plus
+    one chunk.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    max_rows : int, optional
+        The most rows to keep. Defaults to `SAMPLE_MAX_ROWS`.
+    max_bytes : int, optional
+        The most bytes of source data to keep. Defaults to `SAMPLE_MAX_BYTES`.
+    seed : int, optional
+        Seed of the random number generator. Defaults to `SAMPLE_SEED`.
+
+    Returns
+    -------
+    tuple
+        The sampled DataFrame and a dictionary describing the sample.
+    """
+    bytes_per_row = None
+    chunks = iter_csv_chunks(file_path, STREAMING_CHUNK_ROWS)
+    first = next(chunks, None)
+    if first is None:
+        return pd.DataFrame(), {"sampling_method": "csv_reservoir", "sampling_fraction": 1.0, "sampled_rows": 0, "total_rows": 0}
+    if len(first):
+        # Estimate the source bytes per row from the start of the file
+        with open(file_path, 'rb') as f:
+            prefix = f.read(1 << 20)
+        bytes_per_row = len(prefix) / max(prefix.count(b'\n'), 1)
+    reservoir = BottomKSample(_row_budget(bytes_per_row, max_rows, max_bytes), seed)
+    reservoir.update(first)
+    for chunk in chunks:
+        reservoir.update(chunk)
+    df = reservoir.result()
+    total = reservoir.rows_seen
+    return df, {"sampling_method": "csv_reservoir", "sampling_fraction": round(len(df) / total, 4) if total else 1.0, "sampled_rows": len(df), "total_rows": total}
+
+
+def sample_csv_seek(file_path, max_rows=SAMPLE_MAX_ROWS, max_bytes=SAMPLE_MAX_BYTES, seed=SAMPLE_SEED, blocks=SEEK_BLOCKS):
+    """
+    Sample a CSV file by reading runs of lines at random byte offsets.
+
+    The file is split into `blocks` equal byte ranges and a run of lines is read
+    from a random offset in each, so only about the budget is read from disk.
+    Offsets are moved to the next line start. A line break inside a quoted
+    field can still cut a record in half; lines with more fields than the header
+    are skipped, so prefer the reservoir method for files with multi-line fields.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    max_rows : int, optional
+        The most rows to keep. Defaults to `SAMPLE_MAX_ROWS`.
+    max_bytes : int, optional
+        The most bytes of source data to keep. Defaults to `SAMPLE_MAX_BYTES`.
+    seed : int, optional
+        Seed of the random number generator. Defaults to `SAMPLE_SEED`.
+    blocks : int, optional
+        The number of byte ranges to read from. Defaults to `SEEK_BLOCKS`.
+
+    Returns
+    -------
+    tuple
+        The sampled DataFrame and a dictionary describing the sample.
+    """
+    dialect = sniff_csv_dialect(file_path)
+    file_size = os.path.getsize(file_path)
+    rng = np.random.default_rng(seed)
+    with open(file_path, 'rb') as f:
+        header = f.readline() if dialect["has_header"] else b''
+        data_start = f.tell()
+        prefix = f.read(1 << 20)
+        bytes_per_row = len(prefix) / max(prefix.count(b'\n'), 1)
+        budget = _row_budget(bytes_per_row, max_rows, max_bytes)
+        lines_per_block = max(1, budget // blocks)
+        span = (file_size - data_start) / blocks
+        seen_offsets = set()
+        lines = []
+        for block in range(blocks):
+            offset = int(data_start + block * span + rng.random() * span)
+            f.seek(max(offset - 1, data_start))
+            if offset > data_start:
+                f.readline()  # move to the start of the next line
+            for _ in range(lines_per_block):
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if position in seen_offsets:
+                    continue
+                seen_offsets.add(position)
+                lines.append((position, line if line.endswith(b'\n') else line + b'\n'))
+    lines.sort()
+    text = header + b''.join(line for _, line in lines)
+    df = pd.read_csv(
+        io.BytesIO(text),
+        engine='python',
+        sep=dialect["delimiter"],
+        quotechar=dialect["quotechar"],
+        doublequote=dialect["doublequote"],
+        escapechar=dialect["escapechar"],
+        header=0 if dialect["has_header"] else None,
+        on_bad_lines='skip',
+    ).infer_objects()
+    if not dialect["has_header"]:
+        df.columns = [f"column_{i + 1}" for i in range(df.shape[1])]
+    estimated_total = int((file_size - data_start) / bytes_per_row) if bytes_per_row else len(df)
+    return df, {"sampling_method": "csv_byte_seek", "sampling_fraction": round(min(len(df) / estimated_total, 1.0), 4) if estimated_total else 1.0, "sampled_rows": len(df), "total_rows": estimated_total}
+
+
+def sample_parquet_row_groups(file_path, max_rows=SAMPLE_MAX_ROWS, max_bytes=SAMPLE_MAX_BYTES, seed=SAMPLE_SEED):
+    """
+    Sample a Parquet file from randomly chosen row groups.
+
+    Row groups are drawn in random order until they cover the budget and are
+    then read batch by batch. If the chosen groups hold more rows than the
+    budget, a uniform sample of their rows is kept.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the Parquet file.
+    max_rows : int, optional
+        The most rows to keep. Defaults to `SAMPLE_MAX_ROWS`.
+    max_bytes : int, optional
+        The most uncompressed bytes to keep. Defaults to `SAMPLE_MAX_BYTES`.
+    seed : int, optional
+        Seed of the random number generator. Defaults to `SAMPLE_SEED`.
+
+    Returns
+    -------
+    tuple
+        The sampled DataFrame and a dictionary describing the sample.
+    """
+    pf = ParquetFile(file_path)
+    metadata = pf.metadata
+    total = metadata.num_rows
+    uncompressed = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+    budget = _row_budget(uncompressed / total if total else None, max_rows, max_bytes)
+
+    rng = np.random.default_rng(seed)
+    selected, rows = [], 0
+    for rg in rng.permutation(metadata.num_row_groups):
+        if rows >= budget:
+            break
+        selected.append(int(rg))
+        rows += metadata.row_group(int(rg)).num_rows
+    selected.sort()
+
+    reservoir = BottomKSample(budget, seed)
+    for batch in pf.iter_batches(batch_size=STREAMING_CHUNK_ROWS, row_groups=selected):
+        reservoir.update(pa.Table.from_batches([batch], schema=pf.schema_arrow).to_pandas(types_mapper=pd.ArrowDtype))
+    df = reservoir.result()
+    df = df.convert_dtypes(dtype_backend='pyarrow')  # Convert dtypes to pandas dtypes
+    df = df.infer_objects()
+    return df, {"sampling_method": "parquet_row_groups", "sampling_fraction": round(len(df) / total, 4) if total else 1.0, "sampled_rows": len(df), "total_rows": total}
+
+
+def sample_json(file_path, max_rows=SAMPLE_MAX_ROWS, max_bytes=SAMPLE_MAX_BYTES, seed=SAMPLE_SEED, method=SAMPLE_JSON_METHOD):
+    """
+    Sample the records of a JSON array, JSON Lines or wrapped JSON file.
+
+    Records are parsed one at a time and flattened in batches, so memory is
+    bounded by the budget plus one batch. JSON cannot be entered at a random
+    offset, so the "reservoir" method reads the whole file to draw a uniform
+    sample, while "head" keeps the first records and stops reading at the
+    budget; its total row count is then estimated from the bytes read.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the JSON file.
+    max_rows : int, optional
+        The most rows to keep. Defaults to `SAMPLE_MAX_ROWS`.
+    max_bytes : int, optional
+        The most bytes of source data to keep. Defaults to `SAMPLE_MAX_BYTES`.
+    seed : int, optional
+        Seed of the random number generator. Defaults to `SAMPLE_SEED`.
+    method : str, optional
+        "reservoir" or "head". Defaults to `SAMPLE_JSON_METHOD`.
+
+    Returns
+    -------
+    tuple
+        The sampled DataFrame and a dictionary describing the sample.
+    """
+    reader = JsonRecordReader(file_path)
+    chunksize = min(STREAMING_CHUNK_ROWS, max_rows)
+    chunks = iter_json_chunks(file_path, chunksize, reader=reader)
+    first = next(chunks, None)
+    if first is None:
+        return pd.DataFrame(), {"sampling_method": f"json_{method}", "sampling_fraction": 1.0, "sampled_rows": 0, "total_rows": 0}
+    budget = _row_budget(reader.bytes_consumed / len(first) if len(first) else None, max_rows, max_bytes)
+
+    if method == "head":
+        kept, rows, parsed, chunk = [], 0, 0, first
+        while chunk is not None:
+            parsed += len(chunk)
+            kept.append(chunk.iloc[:budget - rows])
+            rows += len(kept[-1])
+            if rows >= budget:
+                break
+            chunk = next(chunks, None)
+        exhausted = chunk is None
+        chunks.close()
+        df = pd.concat(kept, ignore_index=True).infer_objects()
+        consumed = reader.bytes_consumed
+        # Without reading on, the total is estimated from the bytes per record parsed so far
+        total = parsed if exhausted or not consumed else max(int(parsed * os.path.getsize(file_path) / consumed), parsed)
+        return df, {"sampling_method": "json_head", "sampling_fraction": round(len(df) / total, 4) if total else 1.0, "sampled_rows": len(df), "total_rows": total}
+
+    reservoir = BottomKSample(budget, seed)
+    reservoir.update(first)
+    for chunk in chunks:
+        reservoir.update(chunk)
+    df = reservoir.result().infer_objects()
+    total = reservoir.rows_seen
+    return df, {"sampling_method": "json_reservoir", "sampling_fraction": round(len(df) / total, 4) if total else 1.0, "sampled_rows": len(df), "total_rows": total}
+
+
+def sample_file(file_path, max_rows=SAMPLE_MAX_ROWS, max_bytes=SAMPLE_MAX_BYTES, csv_method=SAMPLE_CSV_METHOD):
+    """
+    Read a representative sample of a data file that is too large to load whole.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV, Parquet or JSON file.
+    max_rows : int, optional
+        The most rows to keep. Defaults to `SAMPLE_MAX_ROWS`.
+    max_bytes : int, optional
+        The most bytes to keep. Defaults to `SAMPLE_MAX_BYTES`.
+    csv_method : str, optional
+        "reservoir" or "seek", see `sample_csv_reservoir` and `sample_csv_seek`.
+        Defaults to `SAMPLE_CSV_METHOD`. JSON files use `SAMPLE_JSON_METHOD`, see `sample_json`.
+
+    Returns
+    -------
+    tuple
+        The sampled DataFrame and a dictionary with the keys "sampling_method",
+        "sampling_fraction", "sampled_rows" and "total_rows".
+    """
+    if file_path.endswith('.csv'):
+        if csv_method == "seek":
+            df, sampling = sample_csv_seek(file_path, max_rows, max_bytes)
+        else:
+            df, sampling = sample_csv_reservoir(file_path, max_rows, max_bytes)
+    elif file_path.endswith('.parquet'):
+        df, sampling = sample_parquet_row_groups(file_path, max_rows, max_bytes)
+    elif file_path.endswith('.json'):
+        df, sampling = sample_json(file_path, max_rows, max_bytes)
+    else:
+        raise ValueError(f"Unsupported file format: {file_path}")
+    logging.info(f"Sampled {sampling['sampled_rows']} of {sampling['total_rows']} rows from {file_path} ({sampling['sampling_method']})")
+    return df, sampling
@@ -1,4 +1,20 @@
-def compute_aggregate_score(report_dict, df):
+# Raw report keys read by the scoring, the final report notes and the average
+# report; metrics that produce none of them are not run
+REPORT_KEYS = {
+    "column_missing", "column_missing_count", "column_missing_percentage", "number_of_columns",
+    "row_missing_count", "row_missing_percentage", "number_of_rows",
+    "exact_row_duplicates_count", "exact_row_duplicates_percentage",
+    "region_coverage", "region_column",
+    "low_variance_numeric_columns", "percentage_low_variance_numeric_columns", "number_of_numeric_columns",
+    "dominant_categorical_columns", "percentage_dominant_categorical_columns", "number_of_categorical_columns",
+    "file_format",
+    "date_column", "timestamp_column", "number_of_date_columns", "number_of_timestamp_columns", "datetime_issues_percentage",
+    "date_or_timestamp_fields_found", "date_or_timestamp_issues_percentage",
+    "documentation_found",
+    "sampling_method", "sampling_fraction",
+}
+
+def compute_aggregate_score(report_dict, df=None):
     """
     Computes the aggregate score from a dictionary of individual metrics.
 
@@ -6,8 +22,9 @@ def compute_aggregate_score(report_dict, df):
     ----------
     report_dict : dict
         A dictionary of individual metrics, each with a score out of 100
-    df : pandas.DataFrame
-        The DataFrame containing the dataset
+    df : pandas.DataFrame, optional
+        The DataFrame containing the dataset. When the file was profiled in
+        chunks there is no DataFrame and the row count is taken from the report.
 
     Returns
     -------
@@ -16,6 +33,7 @@ def compute_aggregate_score(report_dict, df):
     """
     total_score = 0
     detailed_scores = {}
+    num_rows = len(df) if df is not None else report_dict.get("number_of_rows", 0)
 
     # Define metric weights (out of 100)
     weights = {
@@ -47,7 +65,7 @@ def compute_aggregate_score(report_dict, df):
     # 2. Row-wise Missing (proportion of rows with >50% missing)
     if "row_missing_count" in report_dict:
         affected_rows = report_dict["row_missing_count"]
-        prop = affected_rows / len(df) if len(df) > 0 else 1
+        prop = affected_rows / num_rows if num_rows > 0 else 1
         score = max(0, weights["row_missing"] * (1 - prop))
         detailed_scores["row_missing"] = round(score, 2)
         total_score += score
@@ -55,7 +73,7 @@ def compute_aggregate_score(report_dict, df):
     # 3. Exact Row Duplicates
     if "exact_row_duplicates_count" in report_dict:
         dupes = report_dict["exact_row_duplicates_count"]
-        prop = dupes / len(df) if len(df) > 0 else 1
+        prop = dupes / num_rows if num_rows > 0 else 1
         score = max(0, weights["exact_row_duplicates"] * (1 - prop))
         detailed_scores["exact_row_duplicates"] = round(score, 2)
         total_score += score
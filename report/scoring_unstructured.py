@@ -1,3 +1,12 @@
+# Raw report keys read by the scoring and the final report notes; metrics that
+# produce none of them are not run
+REPORT_KEYS = {
+    "consistency", "duplicate_percentage", "region_coverage",
+    "file_openable_percentage", "file_not_openable_percentage",
+    "valid_format_percentage", "invalid_format_percentage",
+    "annotation_presence", "timestamps_presence", "documentation_found",
+}
+
 def compute_aggregate_score(report_dict):
     """
     Computes the aggregate score from a dictionary of individual metrics.
@@ -0,0 +1,324 @@
+import logging
+from report.input_handler import iter_file_chunks, STREAMING_CHUNK_ROWS
+from structured_metrics.quality import check_column_missing_from_counts
+from structured_metrics.duplicates import RowHashSet
+from structured_metrics.moments import ColumnMoments
+from structured_metrics.heavy_hitters import TopKSketch
+from structured_metrics.datetime_validation import count_invalid_datetimes
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        return [value]
+    return list(value) if value else []
+
+
+def cast_empty_numeric_columns(chunk, numeric_columns):
+    """
+    Read the columns known to be numeric that are empty in a chunk as float.
+
+    A column that holds no value in a chunk read on its own is typed as text,
+    which would make the profile count it as non-numeric. When the chunk is
+    part of a file read in pieces, the columns the start of the file showed to
+    be numeric are cast back, as they would be when reading the whole file.
+
+    Parameters
+    ----------
+    chunk : pandas.DataFrame
+        The chunk, modified in place.
+    numeric_columns : set of str
+        The columns numeric elsewhere in the file.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The chunk.
+    """
+    for col in chunk.columns:
+        if col in numeric_columns and chunk[col].isnull().all():
+            chunk[col] = chunk[col].astype('float64')
+    return chunk
+
+
+class StructuredProfile:
+    """
+    Running accumulators for every structured metric of a single file.
+
+    The profile is fed one chunk at a time through `update` and never keeps a
+    chunk after it has been counted, so memory is bounded by the chunk size,
+    the number of distinct categories and the duplicate hash budget (row hashes
+    spill to disk past it) rather than by the file size.
+    Each metric method returns the same keys as its DataFrame based counterpart
+    in `structured_metrics`.
+
+    Parameters
+    ----------
+    imputed_columns : dict, optional
+        The column roles inferred for the file (region, date, timestamp, categorical).
+    column_threshold : float, optional
+        Proportion of missing values above which a column is reported. Defaults to 0.3.
+    row_threshold : float, optional
+        Proportion of missing values at which a row is reported. Defaults to 0.5.
+    cv_threshold : float, optional
+        Coefficient of variation below which a numeric column has low variance. Defaults to 0.1.
+    dominance_threshold : float, optional
+        Share of the top category above which a categorical column is dominated. Defaults to 0.99.
+    """
+
+    def __init__(self, imputed_columns=None, column_threshold=0.3, row_threshold=0.5, cv_threshold=0.1, dominance_threshold=0.99):
+        self.imputed_columns = imputed_columns
+        self.column_threshold = column_threshold
+        self.row_threshold = row_threshold
+        self.cv_threshold = cv_threshold
+        self.dominance_threshold = dominance_threshold
+
+        self.columns = []
+        self.number_of_rows = 0
+        self.column_null_counts = {}
+        self.row_missing_count = 0
+        self.row_hashes = RowHashSet()
+        self.numeric_moments = ColumnMoments()
+        self.non_numeric_columns = set()
+        self.category_sketches = {}
+        # col -> [invalid, total] for the date and timestamp format check
+        self.datetime_counts = {}
+
+        imputed = imputed_columns or {}
+        date_info = imputed.get("date") or {}
+        timestamp_info = imputed.get("timestamp") or {}
+        self.date_columns = _as_list(date_info.get("column"))
+        self.timestamp_columns = _as_list(timestamp_info.get("column"))
+        self.date_format = date_info.get("format", [])
+        self.timestamp_format = timestamp_info.get("format", [])
+        self.categorical_columns = imputed.get("categorical") or []
+        self.region_columns = imputed.get("region", []) if imputed_columns else None
+
+    def update(self, chunk):
+        """
+        Fold one chunk of the file into the accumulators.
+
+        Parameters
+        ----------
+        chunk : pandas.DataFrame
+            The next rows of the file. A chunk may add columns, which count as
+            missing in earlier rows, or lack columns seen before, which count as
+            missing in its rows.
+        """
+        first = not self.columns
+        for col in chunk.columns:
+            if col not in self.column_null_counts:
+                self.columns.append(col)
+                self.column_null_counts[col] = self.number_of_rows
+        if first and self.region_columns is None:
+            self.region_columns = [col for col in self.columns if any(keyword in col.lower() for keyword in ['district', 'state', 'city', 'region', 'subdistrict'])]
+
+        nulls = chunk.isnull()
+        self.number_of_rows += len(chunk)
+        for col, count in nulls.sum().items():
+            self.column_null_counts[col] += int(count)
+        absent = [col for col in self.columns if col not in chunk.columns]
+        for col in absent:
+            self.column_null_counts[col] += len(chunk)
+        if chunk.shape[1]:
+            self.row_missing_count += int((nulls.mean(axis=1) >= self.row_threshold).sum())
+        self.row_hashes.update(chunk)
+
+        # A column absent from the chunk has no values to type, so it keeps its type
+        numeric = set(chunk.select_dtypes(include=['number']).columns)
+        for col in chunk.columns:
+            if col not in numeric and col not in self.non_numeric_columns:
+                self.non_numeric_columns.add(col)
+                self.numeric_moments.drop(col)
+        numeric_cols = [col for col in self.columns if col in numeric and col not in self.non_numeric_columns]
+        if numeric_cols:
+            self.numeric_moments.update(chunk[numeric_cols])
+
+        for col in self.categorical_columns:
+            if col in chunk.columns:
+                self.category_sketches.setdefault(col, TopKSketch()).update(chunk[col])
+
+        for columns, expected_format in ((self.date_columns, self.date_format), (self.timestamp_columns, self.timestamp_format)):
+            if not expected_format:
+                continue
+            for col in columns:
+                if col not in chunk.columns:
+                    continue
+                counts = self.datetime_counts.setdefault(col, [0, 0])
+                try:
+                    issues, entries = count_invalid_datetimes(chunk[col], expected_format)
+                except Exception:
+                    counts[1] = None
+                    continue
+                if counts[1] is not None:
+                    counts[0] += issues
+                    counts[1] += entries
+
+    def merge(self, other):
+        """
+        Fold the profile of another file into this one, as if its rows had followed.
+
+        Columns only one of the files has count as missing in the rows of the
+        other. A column that is not numeric in one of the files is not numeric. The
+        column roles of `other` are added to these, and a role's format is kept
+        from the first file that had one.
+
+        Parameters
+        ----------
+        other : StructuredProfile
+            The profile of other rows, e.g. another file of the same dataset.
+            It shares state with this profile afterwards and should not be updated again.
+        """
+        for col in other.columns:
+            if col not in self.column_null_counts:
+                self.columns.append(col)
+                self.column_null_counts[col] = self.number_of_rows
+        for col in self.columns:
+            self.column_null_counts[col] += other.column_null_counts.get(col, other.number_of_rows)
+        self.number_of_rows += other.number_of_rows
+        self.row_missing_count += other.row_missing_count
+        self.row_hashes.merge(other.row_hashes)
+
+        self.numeric_moments.merge(other.numeric_moments)
+        self.non_numeric_columns |= other.non_numeric_columns
+        for col in self.non_numeric_columns:
+            self.numeric_moments.drop(col)
+
+        for col, sketch in other.category_sketches.items():
+            if col in self.category_sketches:
+                self.category_sketches[col].merge(sketch)
+            else:
+                self.category_sketches[col] = sketch
+        for col, (issues, entries) in other.datetime_counts.items():
+            counts = self.datetime_counts.setdefault(col, [0, 0])
+            if counts[1] is None or entries is None:
+                counts[1] = None
+            else:
+                counts[0] += issues
+                counts[1] += entries
+
+        def union(mine, theirs):
+            return list(mine) + [col for col in theirs if col not in mine]
+        self.date_columns = union(self.date_columns, other.date_columns)
+        self.timestamp_columns = union(self.timestamp_columns, other.timestamp_columns)
+        self.date_format = self.date_format or other.date_format
+        self.timestamp_format = self.timestamp_format or other.timestamp_format
+        self.categorical_columns = union(self.categorical_columns, other.categorical_columns)
+        if other.region_columns is not None:
+            self.region_columns = union(self.region_columns or [], other.region_columns)
+        if self.imputed_columns is None:
+            self.imputed_columns = other.imputed_columns
+
+    def _null_percentage(self, col):
+        return self.column_null_counts[col] / self.number_of_rows * 100 if self.number_of_rows else 0.0
+
+    def _all_null(self, col):
+        return col not in self.column_null_counts or self.column_null_counts[col] == self.number_of_rows
+
+    def column_missing(self):
+        return check_column_missing_from_counts(self.column_null_counts, self.number_of_rows, self.column_threshold)
+
+    def row_missing(self):
+        count = self.row_missing_count
+        return {"row_missing_count": count,
+                "row_missing_percentage": round(count / self.number_of_rows * 100, 1) if count > 0 else 0.0,
+                "number_of_rows": self.number_of_rows}
+
+    def row_duplicates(self):
+        count = self.row_hashes.duplicate_count
+        return {"exact_row_duplicates_count": count,
+                "exact_row_duplicates_percentage": round(count / self.number_of_rows * 100, 1) if count > 0 else 0.0}
+
+    def coverage_region(self):
+        if not self.region_columns:
+            return {"region_coverage": 'None', "region_column": "No region column found"}
+        found = [col for col in self.region_columns if col in self.columns and not self._all_null(col)]
+        overall_pct = round(sum(self._null_percentage(col) for col in found) / len(found), 1) if found else 0
+        if overall_pct == 0.0:
+            return {"region_coverage": 'None', "region_column": self.region_columns}
+        return {"region_coverage": overall_pct, "region_column": self.region_columns}
+
+    def numeric_variance(self):
+        numeric_cols = [col for col in self.columns if col in self.numeric_moments.columns]
+        if not numeric_cols:
+            return {"low_variance_numeric_columns": 'None', "percentage_low_variance_numeric_columns": 0, "number_of_numeric_columns": 0, "numeric_columns": 'None'}
+        low_variance = set(self.numeric_moments.low_variance_columns(self.cv_threshold))
+        low_variance_cols = [col for col in numeric_cols if col in low_variance]
+        return {"low_variance_numeric_columns": low_variance_cols,
+                "percentage_low_variance_numeric_columns": round(len(low_variance_cols) / len(numeric_cols) * 100, 1),
+                "number_of_numeric_columns": len(numeric_cols),
+                "numeric_columns": numeric_cols}
+
+    def categorical_variation(self):
+        categorical_cols = [col for col in self.columns if col in self.categorical_columns]
+        if not categorical_cols:
+            return {"dominant_categorical_columns": 'None', "percentage_dominant_categorical_columns": 0, "number_of_categorical_columns": 0, "categorical_columns": 'None'}
+        dominant_cols = []
+        for col in categorical_cols:
+            sketch = self.category_sketches.get(col)
+            dominated = sketch.is_dominated(self.dominance_threshold) if sketch is not None else True
+            if dominated is None:
+                # The file is gone by now, so decide on the middle of the error bound
+                lower, upper = sketch.top_share_bounds()
+                logging.warning(f"Top value share of {col} lies between {lower:.4f} and {upper:.4f}, too close to {self.dominance_threshold} to decide exactly")
+                dominated = (lower + upper) / 2 > self.dominance_threshold
+            if dominated:
+                dominant_cols.append(col)
+        return {"dominant_categorical_columns": dominant_cols,
+                "percentage_dominant_categorical_columns": round(len(dominant_cols) / len(categorical_cols) * 100, 1),
+                "number_of_categorical_columns": len(categorical_cols),
+                "categorical_columns": categorical_cols}
+
+    def date_and_timestamp_format(self):
+        if not (self.date_format and self.date_columns) and not (self.timestamp_format and self.timestamp_columns):
+            return {"date_column": "None", "timestamp_column": "None", "number_of_date_columns": 0, "number_of_timestamp_columns": 0, "datetime_issues_percentage": 'None'}
+        date_found = [col for col in self.date_columns if col in self.columns and not self._all_null(col)]
+        timestamp_found = [col for col in self.timestamp_columns if col in self.columns and not self._all_null(col)]
+        issues, total = 0, 0
+        for col in date_found + timestamp_found:
+            counts = self.datetime_counts.get(col)
+            if counts and counts[1] is not None:
+                issues += counts[0]
+                total += counts[1]
+        return {"date_column": date_found,
+                "timestamp_column": timestamp_found,
+                "number_of_date_columns": len(date_found),
+                "number_of_timestamp_columns": len(timestamp_found),
+                "datetime_issues_percentage": round(issues / total * 100, 1) if total > 0 else 0.0}
+
+    def date_or_timestamp_fields(self):
+        columns_to_validate = self.date_columns + self.timestamp_columns
+        if self.imputed_columns is None or not columns_to_validate:
+            return {"date_or_timestamp_fields_found": 'None', "date_or_timestamp_issues_percentage": 'None'}
+        found = [col for col in columns_to_validate if col in self.columns and not self._all_null(col)]
+        overall_pct = round(sum(self._null_percentage(col) for col in found) / len(found), 1) if found else 0.0
+        return {"date_or_timestamp_fields_found": found, "date_or_timestamp_issues_percentage": overall_pct}
+
+
+def profile_file_in_chunks(file_path, infer_roles=None, chunksize=STREAMING_CHUNK_ROWS):
+    """
+    Build a `StructuredProfile` for a file without loading it as a whole.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+    infer_roles : callable, optional
+        Called once with the first chunk and expected to return the imputed column roles.
+    chunksize : int, optional
+        The number of rows read at a time. Defaults to `STREAMING_CHUNK_ROWS`.
+
+    Returns
+    -------
+    StructuredProfile
+        The profile holding the accumulated metric state of the whole file.
+    """
+    profile = None
+    for chunk in iter_file_chunks(file_path, chunksize):
+        if profile is None:
+            imputed_columns = infer_roles(chunk) if infer_roles else None
+            profile = StructuredProfile(imputed_columns)
+        profile.update(chunk)
+    if profile is None:
+        profile = StructuredProfile()
+    logging.info(f"Profiled {profile.number_of_rows} rows from {file_path} in chunks of {chunksize}")
+    return profile
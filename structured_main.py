@@ -2,14 +2,23 @@ print("Starting structured main.py")
 import logging
 from dotenv import load_dotenv
 import json, os
+import functools
 import report.input_handler as input_handler
-from report.aggregate_structured import generate_raw_report, generate_final_report
+from report.aggregate_structured import generate_raw_report, generate_raw_report_from_profile, generate_final_report
+from report.streaming_profiler import profile_file_in_chunks, StructuredProfile
+from report.parallel import map_files
 import report.scoring_structured as scoring
 from report.multifile_average_score import calculate_average_readiness
+from report.dataset_profile import fold_profile, score_dataset_profile
 from report.dataset_clean_name_api import get_uuid_from_dataset_name, get_dataset_name_from_url
 from report.json_writer import write_report_outputs
 from report.pdf_writer import generate_pdf_from_json
-from structured_metrics.llm_api import infer_column_roles_openai
+from structured_metrics.role_inference import infer_column_roles, ROLE_SAMPLE_ROWS
+from structured_metrics.role_cache import cache_stats
+from report.llm_scheduler import submit_inference
+from report.profile_store import PROFILE_STORE, load_manifest, write_manifest, split_unchanged
+from report.append_profile import APPEND_PROFILING, save_profile_state, load_profile_state, is_append, profile_appended_rows
+from report.fanout import use_fanout, profile_in_ranges
 from report.post_to_cat_api import update_cat_readiness_score
 
 print("Importing modules completed in main.py")
@@ -24,6 +33,8 @@ logging.info("OpenAI API key loaded successfully.")
 elastic_id = os.getenv("ELASTIC_ID")
 elastic_pass = os.getenv("ELASTIC_PASS")
 logging.info("Elastic credentials loaded successfully.")
+# Read files in fixed-size chunks and score them from running accumulators
+streaming_profiler = os.getenv("STREAMING_PROFILER", "false").lower() == "true"
 
 
 def get_output_dir(directory):
@@ -37,58 +48,285 @@ def log_and_call(func, *args, **kwargs):
     logging.info(f"Calling function: {func.__name__}")
     return func(*args, **kwargs)
 
-def main(directory, folder_key):
+def infer_file_roles(file_path):
+    """
+    Infer the column roles of a data file from its first `ROLE_SAMPLE_ROWS` rows.
+
+    Runs on the inference stage, so the OpenAI requests of all the files are
+    in flight while the files are profiled.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+
+    Returns
+    -------
+    dict
+        The column roles, as returned by `infer_column_roles`.
+    """
+    head = input_handler.read_file_head(file_path, ROLE_SAMPLE_ROWS)
+    return infer_column_roles(head, api_key)
+
+def profile_file(file_path, imputed_columns=None, keep_state=False, file_sources=None):
+    """
+    Load one data file, infer its column roles and compute its raw report and score.
+
+    This is the CPU-heavy part of the pipeline. When files are processed in
+    parallel it runs in a worker process and only the reports are sent back, so
+    the DataFrame never leaves the worker.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the data file.
+    imputed_columns : dict, optional
+        The column roles from `infer_file_roles`. Inferred from the loaded data if not given.
+    keep_state : bool, optional
+        Also return the file's mergeable metric state, a `StructuredProfile`,
+        under "state", for the dataset profile of a folder of several files.
+    file_sources : dict, optional
+        File name -> {"bucket", "key"} of the S3 object the file was downloaded
+        from, so the ranges of a file profiled in ranges can be read from S3 by
+        Lambda workers.
+
+    Returns
+    -------
+    dict or None
+        A dictionary with the keys "init_report", "final_score", "sample_size" and
+        "sample", and "profile_state" when the state was stored for a later run,
+        or None if the file could not be processed.
+    """
+    try:
+        state = None
+        if use_fanout(file_path):
+            # Too large for one pass: profile its byte ranges or row groups in parallel and merge them
+            df, sample = None, False
+            if imputed_columns is None:
+                imputed_columns = infer_file_roles(file_path)
+            state = log_and_call(profile_in_ranges, file_path, imputed_columns, (file_sources or {}).get(os.path.basename(file_path)))
+            sample_size = state.number_of_rows
+            init_report = log_and_call(generate_raw_report_from_profile, state, os.path.dirname(file_path))
+        elif streaming_profiler:
+            # Stream the file in chunks, inferring column roles from the first one unless known
+            df, sample = None, False
+            infer_roles = (lambda chunk: imputed_columns) if imputed_columns is not None else (lambda chunk: infer_column_roles(chunk, api_key))
+            state = log_and_call(profile_file_in_chunks, file_path, infer_roles)
+            imputed_columns = state.imputed_columns
+            sample_size = state.number_of_rows
+            init_report = log_and_call(generate_raw_report_from_profile, state, os.path.dirname(file_path))
+        else:
+            parquet_footer = None
+            if file_path.endswith('.parquet') and os.path.getsize(file_path) <= input_handler.SAMPLE_THRESHOLD_BYTES:
+                # One read of the file: the footer holds the row and null counts, and its entirely null columns are not decoded
+                (df, parquet_footer), sample = log_and_call(input_handler.read_parquet_file, file_path), False
+            else:
+                df, sample = log_and_call(input_handler.load_data_file, file_path)
+                if file_path.endswith('.parquet'):
+                    # Parquet footers already hold the row and null counts of the whole file
+                    parquet_footer = log_and_call(input_handler.read_parquet_footer, file_path)
+            if imputed_columns is None:
+                # Infer column roles locally, asking OpenAI only when unsure
+                imputed_columns = log_and_call(infer_column_roles, df, api_key)
+            sample_size = len(df)
+            if keep_state:
+                # The mergeable state of the loaded rows, for the dataset profile, and the raw report from it
+                state = StructuredProfile(imputed_columns)
+                state.update(df)
+                init_report = log_and_call(generate_raw_report_from_profile, state, os.path.dirname(file_path), parquet_footer, sample)
+            else:
+                # Generate the raw readiness report
+                init_report = log_and_call(generate_raw_report, df, os.path.dirname(file_path), imputed_columns, parquet_footer, sample)
+        logging.info(f"Sample size for {file_path}: {sample_size} rows")
+        logging.info(f"Inferred column roles for {file_path}: {imputed_columns}")
+
+        # Compute the aggregate score
+        final_score = log_and_call(scoring.compute_aggregate_score, init_report, df)
+        profiled = {"init_report": init_report, "final_score": final_score, "sample_size": sample_size, "sample": sample}
+        # Store the state for the next run: rows appended to a CSV file are then profiled on their own,
+        # and the dataset profile is merged without profiling unchanged files again
+        appendable = streaming_profiler and APPEND_PROFILING and file_path.endswith('.csv')
+        if PROFILE_STORE and state is not None and (keep_state or appendable):
+            profile_state = log_and_call(save_profile_state, file_path, state)
+            if profile_state is not None:
+                profiled["profile_state"] = profile_state
+        if keep_state:
+            profiled["state"] = state
+        return profiled
+    except Exception as e:
+        logging.error(f"Error processing {file_path}: {e}")
+        return None
+
+def profile_appended_file(file_path, profile_state):
+    """
+    Profile only the rows appended to a CSV file since its accumulators were stored.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the CSV file.
+    profile_state : dict
+        The "profile_state" of the file's stored profile, see `save_profile_state`.
+
+    Returns
+    -------
+    dict or None
+        The same keys as `profile_file`, with the updated accumulators under
+        "state", or None if the stored accumulators are gone or the new rows
+        could not be read, in which case the file is profiled whole.
+    """
+    try:
+        profile = load_profile_state(profile_state)
+        if profile is None:
+            logging.info(f"No stored accumulators for {file_path}, profiling it whole")
+            return None
+        profile = log_and_call(profile_appended_rows, file_path, profile, profile_state["size"])
+        init_report = log_and_call(generate_raw_report_from_profile, profile, os.path.dirname(file_path))
+        final_score = log_and_call(scoring.compute_aggregate_score, init_report, None)
+        profiled = {"init_report": init_report, "final_score": final_score, "sample_size": profile.number_of_rows, "sample": False}
+        new_state = log_and_call(save_profile_state, file_path, profile)
+        if new_state is not None:
+            profiled["profile_state"] = new_state
+        profiled["state"] = profile
+        return profiled
+    except Exception as e:
+        logging.error(f"Error profiling the appended rows of {file_path}: {e}")
+        return None
+
+def main(directory, folder_key, file_etags=None, manifest_dir=None, file_sources=None):
     """
     Main function to run the entire data readiness report pipeline.
 
     This function will:
 
     1. Ask the user for a directory containing data files.
-    2. Load all the data files in the directory.
-    3. Make an API call to OpenAI to infer column roles.
+    2. Infer the column roles of every file from its first rows, in the background,
+       making an API call to OpenAI only when the local inference is unsure.
+    3. Load all the data files in the directory.
     4. Run the raw readiness report for each file.
     5. Compute the aggregate score for each file.
     6. Write the raw and final reports to JSON files.
     7. Generate a PDF report for each file.
-    8. If there are multiple files, generate a report with the average score across all the files.
+    8. If there are multiple files, generate a dataset report scored from the merged
+       metric states of all the files.
+
+    Steps 3 to 5 run per file in `profile_file`, across `PROFILE_WORKERS` processes
+    when it is set above 1, while the column roles of the next files are inferred.
+    CSV and Parquet files of at least `FANOUT_MIN_BYTES` are profiled in ranges
+    instead, see `report.fanout.profile_in_ranges`, so they are neither sampled
+    nor read in a single pass.
+    With `PROFILE_STORE` enabled, files whose fingerprint matches the profile
+    stored by the last run are not profiled again; their reports are rewritten
+    from the stored profile.
+
+    Parameters
+    ----------
+    directory : str
+        The directory containing the data files.
+    folder_key : str
+        The S3 folder of the dataset.
+    file_etags : dict, optional
+        File name -> S3 ETag of the data files of the folder, used as their
+        fingerprints. May name files that were not downloaded because their
+        stored profile is unchanged.
+    manifest_dir : str, optional
+        The directory holding the profiles stored by the last run. Defaults to
+        the output directory, where this run stores its profiles.
+    file_sources : dict, optional
+        File name -> {"bucket", "key"} of the S3 object of each data file, see `profile_file`.
     """
     # directory = input("Enter the directory containing data files: ")
 
     try:
-        data = log_and_call(input_handler.load_data_from_directory, directory)
+        handles = log_and_call(input_handler.list_data_file_handles, directory)
         all_scores = []
-        logging.info(f"Loaded {len(data)} files from {directory}")
-        if not data:
+        report_names = []
+        store_settings = {"streaming_profiler": streaming_profiler}
+        fingerprints, reused = {}, {}
+        if PROFILE_STORE:
+            manifest = load_manifest(manifest_dir or get_output_dir(directory), store_settings)
+            fingerprints, reused = split_unchanged([handle.path for handle in handles], directory, manifest, file_etags)
+        file_paths = [handle.path for handle in handles if handle.path not in reused]
+        # With several files, fold each file's metric state into the dataset profile as it arrives
+        keep_state = len(handles) > 1
+        dataset_profile, stateless = None, []
+
+        def fold_state(file_path, profiled):
+            nonlocal dataset_profile
+            state = profiled.pop("state", None) if profiled is not None else None
+            if profiled is None or not keep_state:
+                return
+            if state is None:
+                stateless.append(file_path)
+                return
+            try:
+                dataset_profile = fold_profile(dataset_profile, state)
+            except Exception as e:
+                logging.error(f"Could not merge the state of {file_path} into the dataset profile: {e}")
+                stateless.append(file_path)
+
+        # CSV files that only grew: profile the new rows on top of the stored accumulators
+        appended = {}
+        if PROFILE_STORE and APPEND_PROFILING and streaming_profiler:
+            for file_path in file_paths:
+                stored = (manifest.get(os.path.relpath(file_path, directory)) or {}).get("profile") or {}
+                if stored.get("profile_state") and is_append(file_path, stored["profile_state"]):
+                    appended[file_path] = stored["profile_state"]
+        if appended:
+            logging.info(f"Profiling only the appended rows of {len(appended)} files")
+            tail_paths = list(appended)
+            tails = log_and_call(map_files, profile_appended_file, tail_paths, inputs=list(appended.values()), on_result=lambda i, profiled: fold_state(tail_paths[i], profiled))
+            appended = {file_path: profiled for file_path, profiled in zip(tail_paths, tails) if profiled is not None}
+            file_paths = [file_path for file_path in file_paths if file_path not in appended]
+        if not file_paths and not reused and not appended:
             logging.error("No data files found in the specified directory.")
             return
-        for df, file_path, sample in data:
+        logging.info(f"Reusing the stored profiles of {len(reused)} unchanged files")
+        if file_paths:
+            changed = [handle for handle in handles if handle.path in file_paths]
+            formats = sorted({handle.format for handle in changed})
+            logging.info(f"Planning {len(changed)} files ({', '.join(formats)}), {sum(handle.size for handle in changed) / 1e6:.1f} MB in total, largest {max(handle.size for handle in changed) / 1e6:.1f} MB, {sum(handle.sampled for handle in changed)} to be sampled")
+        # Start inferring the column roles of every file, so the OpenAI requests overlap the profiling
+        role_futures = [submit_inference(infer_file_roles, file_path) for file_path in file_paths]
+        profiles = log_and_call(map_files, functools.partial(profile_file, keep_state=keep_state, file_sources=file_sources), file_paths, inputs=role_futures,
+                                on_result=lambda i, profiled: fold_state(file_paths[i], profiled))
+        logging.info(f"Profiled {sum(profiled is not None for profiled in profiles)} of {len(file_paths)} files from {directory}")
+        if keep_state:
+            for file_path, profiled in reused.items():
+                state = load_profile_state(profiled["profile_state"]) if profiled.get("profile_state") else None
+                if state is None:
+                    logging.warning(f"No stored metric state for the unchanged file {file_path}, the dataset report will average the file reports instead of merging their rows")
+                fold_state(file_path, {"state": state})
+        if PROFILE_STORE:
+            stored = {os.path.relpath(file_path, directory): {"fingerprint": fingerprints[file_path], "profile": profiled}
+                      for file_path, profiled in [*zip(file_paths, profiles), *appended.items(), *reused.items()] if profiled is not None}
+            log_and_call(write_manifest, get_output_dir(directory), stored, store_settings)
+        file_paths += list(appended) + list(reused)
+        profiles += list(appended.values()) + list(reused.values())
+        role_cache = cache_stats()
+        logging.info(f"Column role cache: {role_cache['hits']} hits, {role_cache['misses']} misses (LLM calls saved: {role_cache['hits']})")
+        for file_path, profiled in zip(file_paths, profiles):
+            # Get the dataset name from the file path, strip special characters
+            dataset_name = os.path.splitext(os.path.basename(file_path))[0].replace('%20', ' ').replace('%21', '!').replace('%22', '"').replace('%23', '#').replace('%24', '$').replace('%25', '%').replace('%26', '&').replace('%27', "'").replace('%28', '(').replace('%29', ')').replace('%2A', '*').replace('%2B', '+').replace('%2C', ',').replace('%2D', '-').replace('%2E', '.').replace('%2F', '/').replace('%3A', ':').replace('%3B', ';').replace('%3C', '<').replace('%3D', '=').replace('%3E', '>').replace('%3F', '?').replace('%40', '@').replace('[', '(').replace(']', ')')
+            if profiled is None:
+                logging.info(f"Skipping {dataset_name}")
+                continue
             try:
-                # Get the dataset name from the file path, strip special characters
-                dataset_name = os.path.splitext(os.path.basename(file_path))[0].replace('%20', ' ').replace('%21', '!').replace('%22', '"').replace('%23', '#').replace('%24', '$').replace('%25', '%').replace('%26', '&').replace('%27', "'").replace('%28', '(').replace('%29', ')').replace('%2A', '*').replace('%2B', '+').replace('%2C', ',').replace('%2D', '-').replace('%2E', '.').replace('%2F', '/').replace('%3A', ':').replace('%3B', ';').replace('%3C', '<').replace('%3D', '=').replace('%3E', '>').replace('%3F', '?').replace('%40', '@').replace('[', '(').replace(']', ')')
                 try:
                     true_name, uuid = log_and_call(get_dataset_name_from_url, folder_key)
                 except Exception:
                     true_name = os.path.basename(directory)
                     logging.info(f"Could not fetch true name for {file_path}, using directory name: {true_name}")
 
-                sample_size = len(df)
-                logging.info(f"Sample size for {dataset_name}: {sample_size} rows")
-
-
-                file_path = os.path.dirname(file_path)
-
-                # Use OpenAI to infer column roles
-                imputed_columns = log_and_call(infer_column_roles_openai, df, api_key)
-                logging.info(f"Inferred column roles for {uuid}: {imputed_columns}")
-
-                # Generate the raw readiness report
-                init_report = log_and_call(generate_raw_report, df, file_path, imputed_columns)
-                
-                # Compute the aggregate score
-                final_score = log_and_call(scoring.compute_aggregate_score, init_report, df)
+                init_report = profiled["init_report"]
+                final_score = profiled["final_score"]
+                sample_size = profiled["sample_size"]
+                sample = profiled["sample"]
                 final_percentage = final_score.get("total_percentage")
                 final_percentage = str(final_percentage) if final_percentage is not None else "unknown"
 
+                file_path = os.path.dirname(file_path)
+
                 # Create a directory to hold all the generated files
                 output_dir = get_output_dir(directory)
 
@@ -106,7 +344,7 @@ def main(directory, folder_key):
                 logging.info(f"PDF generated for {file_path}")
                 
                 all_scores.append(final_score)
-                report_names = [f"{output_dir}/{dataset_name}_raw_readiness_report.json" for _, file_path, _ in data]
+                report_names.append(f"{output_dir}/{dataset_name}_raw_readiness_report.json")
 
             except Exception as e:
                 logging.error(f"Error processing {file_path}: {e}")
@@ -115,7 +353,11 @@ def main(directory, folder_key):
         # If there are multiple files, generate a report with the average score across all the files
         if len(all_scores) > 1:
             output_dir = get_output_dir(directory)
-            raw_avg_report, average_percentage = log_and_call(calculate_average_readiness, report_names)
+            if dataset_profile is not None and not stateless:
+                # Score the rows of all the files at once, from their merged metric states
+                raw_avg_report, average_percentage = log_and_call(score_dataset_profile, dataset_profile, directory)
+            else:
+                raw_avg_report, average_percentage = log_and_call(calculate_average_readiness, report_names)
 
             with open(f"{output_dir}/average_score_readiness_report.json", "w") as f:
                 json.dump(raw_avg_report, f, indent=4)
@@ -0,0 +1,241 @@
+import os
+import logging
+import tempfile
+import numpy as np
+import pyarrow as pa
+from concurrent.futures.process import BrokenProcessPool
+from structured_metrics.null_profile import NullProfile
+from structured_metrics.moments import ColumnMoments
+from structured_metrics.heavy_hitters import is_dominated_column
+from report.parallel import process_pool
+
+# Processes evaluating blocks of columns of one wide table; 1 keeps the column-wise metrics in the metric threads
+COLUMN_BLOCK_WORKERS = int(os.getenv("COLUMN_BLOCK_WORKERS", 1))
+# Tables with fewer columns are not split
+COLUMN_BLOCK_MIN_COLUMNS = int(os.getenv("COLUMN_BLOCK_MIN_COLUMNS", 1000))
+# Columns per block
+COLUMN_BLOCK_SIZE = int(os.getenv("COLUMN_BLOCK_SIZE", 500))
+# The table is shared with the workers as an Arrow file in memory-backed storage where there is one
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+class ColumnBlocks:
+    """
+    Column-wise partial results of a wide table, evaluated block by block and merged.
+
+    Attributes
+    ----------
+    null_profile : structured_metrics.null_profile.NullProfile
+        The null counts of all the columns and rows, without a null mask.
+    numeric_columns : list
+        The numeric columns, in column order.
+    moments : structured_metrics.moments.ColumnMoments
+        The moments of the numeric columns.
+    categorical_columns : list
+        The imputed categorical columns present in the table, in column order.
+    dominant_categorical_columns : list
+        The categorical columns dominated by one value or all null, in column order.
+    """
+
+    def __init__(self, null_profile, numeric_columns, moments, categorical_columns, dominant_categorical_columns):
+        self.null_profile = null_profile
+        self.numeric_columns = numeric_columns
+        self.moments = moments
+        self.categorical_columns = categorical_columns
+        self.dominant_categorical_columns = dominant_categorical_columns
+
+
+def use_column_blocks(df, workers=None, min_columns=None):
+    """
+    Whether a table is wide enough to evaluate its column-wise metrics in blocks.
+
+    Column names must be unique strings, as the blocks are written to and
+    merged from an Arrow file, which addresses columns by name.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table.
+    workers : int, optional
+        The block processes. Defaults to `COLUMN_BLOCK_WORKERS`.
+    min_columns : int, optional
+        The fewest columns to split. Defaults to `COLUMN_BLOCK_MIN_COLUMNS`.
+
+    Returns
+    -------
+    bool
+        True if the table should be split into blocks.
+    """
+    workers = COLUMN_BLOCK_WORKERS if workers is None else workers
+    min_columns = COLUMN_BLOCK_MIN_COLUMNS if min_columns is None else min_columns
+    if workers <= 1 or df.shape[1] < min_columns:
+        return False
+    return df.columns.is_unique and all(isinstance(col, str) for col in df.columns)
+
+
+def column_blocks(n_columns, block_size=None):
+    """Split column positions into consecutive blocks of at most `block_size`, `COLUMN_BLOCK_SIZE` by default."""
+    block_size = max(COLUMN_BLOCK_SIZE if block_size is None else block_size, 1)
+    return [list(range(start, min(start + block_size, n_columns))) for start in range(0, n_columns, block_size)]
+
+
+def write_shared_table(df, directory=None):
+    """
+    Write a table to an Arrow IPC file the block processes can memory-map.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table.
+    directory : str, optional
+        Where to write the file. Defaults to `SHARED_MEMORY_DIR`, or the
+        temporary directory where there is no shared memory, e.g. on Lambda.
+
+    Returns
+    -------
+    str
+        The path of the file. The caller removes it.
+
+    Raises
+    ------
+    pyarrow.ArrowException
+        If a column cannot be converted to Arrow, e.g. mixed numbers and text.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fd, path = tempfile.mkstemp(prefix="column_blocks_", suffix=".arrow", dir=directory or SHARED_MEMORY_DIR)
+    os.close(fd)
+    try:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def evaluate_block(path, columns, categorical, dominance_threshold=0.99):
+    """
+    Evaluate the column-wise metrics of one block of columns of a shared table.
+
+    The file is memory-mapped, so only the buffers of the block's columns are
+    read and nothing but the column names and the results crosses the process boundary.
+
+    Parameters
+    ----------
+    path : str
+        The Arrow file written by `write_shared_table`.
+    columns : list of int
+        The positions of the block's columns.
+    categorical : list of str
+        The imputed categorical columns of the block.
+    dominance_threshold : float, optional
+        The share of the most common value above which a categorical column is dominated. Defaults to 0.99.
+
+    Returns
+    -------
+    dict
+        The block's column names, column and row null counts, numeric columns
+        and their moments, and dominated categorical columns.
+    """
+    with pa.memory_map(path, 'r') as source:
+        df = pa.ipc.open_file(source).read_all().select(columns).to_pandas()
+    null_profile = NullProfile(df)
+    numeric = df.select_dtypes(include=['number'])
+    dominant = [
+        col for col in categorical
+        if null_profile.all_null(col) or is_dominated_column(df[col], dominance_threshold)
+    ]
+    return {
+        "columns": null_profile.columns,
+        "column_null_counts": [null_profile.column_null_counts[col] for col in null_profile.columns],
+        "row_null_counts": null_profile.row_null_counts.astype(np.min_scalar_type(len(columns))),
+        "numeric_columns": numeric.columns.tolist(),
+        "moments": ColumnMoments.from_frame(numeric),
+        "dominant_categorical_columns": dominant,
+    }
+
+
+def merge_blocks(results, number_of_rows, categorical_columns):
+    """
+    Merge the results of `evaluate_block` into the results of the whole table.
+
+    Parameters
+    ----------
+    results : list of dict
+        The results of the blocks, in column order.
+    number_of_rows : int
+        The rows of the table.
+    categorical_columns : list
+        The imputed categorical columns present in the table, in column order.
+
+    Returns
+    -------
+    ColumnBlocks
+        The merged results.
+    """
+    columns, column_null_counts, numeric_columns, dominant = [], [], [], set()
+    row_null_counts = np.zeros(number_of_rows, dtype=np.int64)
+    moments = ColumnMoments()
+    for result in results:
+        columns += result["columns"]
+        column_null_counts += result["column_null_counts"]
+        row_null_counts += result["row_null_counts"]
+        numeric_columns += result["numeric_columns"]
+        moments.merge(result["moments"])
+        dominant.update(result["dominant_categorical_columns"])
+    null_profile = NullProfile.from_counts(columns, number_of_rows, column_null_counts, row_null_counts)
+    return ColumnBlocks(null_profile, numeric_columns, moments, categorical_columns,
+                        [col for col in categorical_columns if col in dominant])
+
+
+def evaluate_column_blocks(df, imputed_columns=None, workers=None, block_size=None, dominance_threshold=0.99):
+    """
+    Evaluate the column-wise metrics of a wide table in a process pool, one block of columns per task.
+
+    The table is written once to shared memory as an Arrow file, which every
+    worker memory-maps, so no DataFrame is pickled. The partial results are
+    merged into what `NullProfile`, `check_numeric_variance` and
+    `check_categorical_variation` would compute on the whole table.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table.
+    imputed_columns : dict, optional
+        The column roles, for the categorical columns.
+    workers : int, optional
+        The processes. Defaults to `COLUMN_BLOCK_WORKERS`.
+    block_size : int, optional
+        The columns per block. Defaults to `COLUMN_BLOCK_SIZE`.
+    dominance_threshold : float, optional
+        The dominance threshold of the categorical columns. Defaults to 0.99.
+
+    Returns
+    -------
+    ColumnBlocks or None
+        The merged results, or None if the table cannot be shared as Arrow,
+        in which case the metrics are computed on the DataFrame as usual.
+    """
+    workers = COLUMN_BLOCK_WORKERS if workers is None else workers
+    categorical = set((imputed_columns or {}).get("categorical") or [])
+    categorical_columns = [col for col in df.columns if col in categorical]
+    try:
+        path = write_shared_table(df)
+    except (pa.ArrowException, OSError) as e:
+        logging.warning(f"Could not share the table as Arrow, evaluating its columns without blocks: {e}")
+        return None
+
+    try:
+        blocks = column_blocks(df.shape[1], block_size)
+        tasks = [(path, block, [df.columns[i] for i in block if df.columns[i] in categorical], dominance_threshold) for block in blocks]
+        logging.info(f"Evaluating {df.shape[1]} columns in {len(blocks)} blocks with {workers} processes")
+        try:
+            with process_pool(min(workers, len(blocks))) as executor:
+                results = list(executor.map(evaluate_block, *zip(*tasks)))
+        except (BrokenProcessPool, OSError) as e:
+            # e.g. no /dev/shm semaphores on Lambda: evaluate the blocks here instead
+            logging.warning(f"Column block processes failed, evaluating the blocks in this process: {e}")
+            results = [evaluate_block(*task) for task in tasks]
+    finally:
+        os.remove(path)
+    return merge_blocks(results, df.shape[0], categorical_columns)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# (format, value) -> whether the value parses with the format, shared by every column in a run
+_PARSED_VALUES = {}
+# The cache is emptied once it holds this many values
+DATETIME_CACHE_MAX_ENTRIES = 1000000
+
+
+def clear_datetime_cache():
+    """Forget every cached parse result."""
+    _PARSED_VALUES.clear()
+
+
+def count_invalid_datetimes(series, expected_format):
+    """
+    Count the values of a column that do not parse with a datetime format.
+
+    The column is factorised and only its distinct values are parsed, each at
+    most once per run and format, so a column with millions of rows and a few
+    thousand distinct dates costs a few thousand parses. Nulls count as invalid,
+    as they do with `pd.to_datetime(..., errors="coerce")`.
+
+    Parameters
+    ----------
+    series : pandas.Series
+        The date or timestamp column.
+    expected_format : str
+        The strftime format the values should follow.
+
+    Returns
+    -------
+    tuple
+        The number of invalid values and the number of values checked.
+
+    Raises
+    ------
+    Exception
+        Whatever `pd.to_datetime` raises for the format, e.g. for an invalid format.
+    """
+    codes, uniques = pd.factorize(series)
+    # Keep the dtype of the column, pd.to_datetime treats numbers and strings differently
+    uniques = pd.Series(uniques)
+    keys = [(expected_format, value) for value in uniques.tolist()]
+    missing = np.array([key not in _PARSED_VALUES for key in keys], dtype=bool)
+    valid = np.zeros(len(uniques), dtype=bool)
+    if missing.any():
+        parsed = pd.to_datetime(uniques[missing], format=expected_format, errors="coerce")
+        valid[missing] = parsed.notna().to_numpy()
+        if len(_PARSED_VALUES) + int(missing.sum()) > DATETIME_CACHE_MAX_ENTRIES:
+            _PARSED_VALUES.clear()
+        _PARSED_VALUES.update((key, bool(ok)) for key, ok, new in zip(keys, valid, missing) if new)
+    for i in np.flatnonzero(~missing):
+        valid[i] = _PARSED_VALUES[keys[i]]
+    nulls = int((codes == -1).sum())
+    invalid_values = int((~valid[codes[codes >= 0]]).sum())
+    return nulls + invalid_values, len(series)
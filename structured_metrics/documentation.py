@@ -1,5 +1,7 @@
 import os
+from report.metric_registry import register_metric
 
+@register_metric("structured", outputs=["documentation_found"], inputs={"descriptor_path": "directory"}, order=100)
 def check_documentation_presence(descriptor_path):
     """
     Check if a documentation file exists at the given path.
@@ -0,0 +1,386 @@
+import os
+import shutil
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Memory the distinct row hashes may take before they are partitioned to disk
+DUPLICATE_MEMORY_BUDGET_BYTES = int(os.getenv("DUPLICATE_MEMORY_BUDGET_BYTES", 512 * 1024 * 1024))
+# Where spilled partitions are written; the system temporary directory (/tmp on Lambda) if unset
+DUPLICATE_SPILL_DIR = os.getenv("DUPLICATE_SPILL_DIR") or None
+# Spilled hashes are split on their top bits into 2**DUPLICATE_SPILL_BITS partitions
+DUPLICATE_SPILL_BITS = 6
+
+
+class RowHashSet:
+    """
+    Exact duplicate counter built on 64-bit row hashes.
+
+    Rows are reduced to a single hash each, so memory grows with the number of
+    distinct rows seen rather than with the width of the table. The distinct
+    hashes are kept in memory as sorted runs, each chunk's run merged with runs
+    of about its size, so every hash is sorted again only a logarithmic number
+    of times over the stream. Once the runs outgrow `memory_budget`, from
+    then on every hash is appended to one of 2**`spill_bits` partition files on
+    disk, chosen by its top bits, and the partitions are counted one at a time
+    when `duplicate_count` is read. Equal rows always land in the same
+    partition, so the count stays exact while only one partition is in memory.
+
+    A row's hash does not depend on the order of its columns, and a null
+    value hashes as if the column were absent, so the hashes of files that
+    list their columns in another order, or lack some of them, are aligned on
+    the union of their columns. Sets of several files are joined with `merge`,
+    which tells duplicates within a file from rows repeating another file's.
+
+    Two different rows share a hash with probability about n**2 / 2**65, under
+    one in ten thousand for 50 million rows.
+
+    Parameters
+    ----------
+    memory_budget : int, optional
+        Bytes of hashes to hold in memory. Defaults to `DUPLICATE_MEMORY_BUDGET_BYTES`.
+    spill_dir : str, optional
+        Directory for the partition files. Defaults to `DUPLICATE_SPILL_DIR`.
+    spill_bits : int, optional
+        Number of top hash bits that choose the partition. Defaults to `DUPLICATE_SPILL_BITS`.
+    """
+
+    def __init__(self, memory_budget=DUPLICATE_MEMORY_BUDGET_BYTES, spill_dir=DUPLICATE_SPILL_DIR, spill_bits=DUPLICATE_SPILL_BITS):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.spill_bits = spill_bits
+        self.seen = np.empty(0, dtype=np.uint64)
+        self._runs = []
+        self.rows_seen = 0
+        self._in_memory_duplicates = 0
+        self._spill_path = None
+        self._spill_files = None
+        self._owns_spill = True
+        self._spilled_duplicates = None
+        self._within_duplicates = None
+
+    @staticmethod
+    def hash_rows(chunk):
+        # Every non-null value is hashed together with its column name and the results
+        # are summed, so the hash of a row is the same whatever the order of its columns
+        # and whether its null columns exist at all. Integral numbers are hashed as integers
+        # whatever the dtype of their column, so that an integer column that turns into
+        # float64 when it picks up a NaN in a later chunk still hashes its values the same
+        # way, and large integers do not collide as they would once rounded to float64.
+        if chunk.shape[1] == 0:
+            return np.empty(0, dtype=np.uint64)  # as in pandas, rows without columns are not duplicates
+        names = pd.util.hash_array(np.array([str(col) for col in chunk.columns], dtype=object))
+        hashes = np.zeros(len(chunk), dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for i in range(chunk.shape[1]):
+                column = chunk.iloc[:, i]
+                if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+                    values = _hash_numbers(column)
+                else:
+                    values = pd.util.hash_pandas_object(column, index=False).to_numpy(dtype=np.uint64)
+                mixed = _mix(values ^ names[i])
+                mixed[column.isna().to_numpy()] = 0
+                hashes += mixed
+        return hashes
+
+    @property
+    def spilled(self):
+        return self._spill_path is not None
+
+    def update(self, chunk):
+        """
+        Count the rows of the next chunk.
+
+        Parameters
+        ----------
+        chunk : pandas.DataFrame
+            The next rows. Every chunk must share the same columns.
+        """
+        self.update_hashes(self.hash_rows(chunk))
+
+    def update_hashes(self, hashes):
+        """
+        Count rows given by their hashes, as returned by `hash_rows`.
+
+        Parameters
+        ----------
+        hashes : numpy.ndarray
+            The uint64 hash of every row.
+        """
+        self.rows_seen += len(hashes)
+        if self.spilled:
+            self._append_to_partitions(hashes)
+            self._spilled_duplicates = None
+            return
+        unique = np.unique(hashes)
+        self._in_memory_duplicates += len(hashes) - len(unique)
+        # Runs shrink by more than half from one to the next, so a run is merged
+        # into a larger one only when it has grown to about that size
+        self._runs.append(unique)
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            run = self._runs.pop()
+            self._runs[-1] = self._merge_runs(self._runs[-1], run)
+        if self._runs and len(self.seen) <= 2 * len(self._runs[0]):
+            self.seen = self._merge_runs(self.seen, self._runs.pop(0))
+        if self.seen.nbytes + sum(run.nbytes for run in self._runs) > self.memory_budget:
+            self._compact()
+            if self.seen.nbytes > self.memory_budget:
+                self._spill()
+
+    def _merge_runs(self, first, second):
+        # Union of two sorted runs of distinct hashes; hashes in both are duplicate rows
+        merged = np.concatenate([first, second])
+        merged.sort(kind='stable')  # radix sort for integers
+        keep = np.empty(len(merged), dtype=bool)
+        keep[:1] = True
+        np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+        merged = merged[keep]
+        self._in_memory_duplicates += len(first) + len(second) - len(merged)
+        return merged
+
+    def _compact(self):
+        # Merge every pending run into `seen`
+        while self._runs:
+            self.seen = self._merge_runs(self.seen, self._runs.pop())
+
+    def _spill(self):
+        self._compact()
+        self._spill_path = tempfile.mkdtemp(prefix="row_hashes_", dir=self.spill_dir)
+        self._owns_spill = True
+        logging.info(f"Row hashes outgrew {self.memory_budget} bytes, spilling {len(self.seen)} hashes to {self._spill_path}")
+        self._append_to_partitions(self.seen)
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def _partitions(self):
+        # The partition files, opened on first use after unpickling or `relocate`
+        if self._spill_files is None:
+            self._spill_files = [open(os.path.join(self._spill_path, f"{i}.bin"), 'ab') for i in range(2 ** self.spill_bits)]
+        return self._spill_files
+
+    def _append_to_partitions(self, hashes):
+        partitions = (hashes >> np.uint64(64 - self.spill_bits)).astype(np.int64)
+        order = np.argsort(partitions, kind='stable')
+        hashes, partitions = hashes[order], partitions[order]
+        bounds = np.searchsorted(partitions, np.arange(2 ** self.spill_bits + 1))
+        for i, f in enumerate(self._partitions()):
+            if bounds[i + 1] > bounds[i]:
+                hashes[bounds[i]:bounds[i + 1]].tofile(f)
+
+    @property
+    def duplicate_count(self):
+        """The number of rows that repeat an earlier row."""
+        if not self.spilled:
+            self._compact()
+            return self._in_memory_duplicates
+        if self._spilled_duplicates is None:
+            count = 0
+            for f in self._partitions():
+                f.flush()
+                partition = np.fromfile(f.name, dtype=np.uint64)
+                count += len(partition) - len(np.unique(partition))
+            self._spilled_duplicates = count
+        return self._in_memory_duplicates + self._spilled_duplicates
+
+    def _distinct_runs(self):
+        # The distinct hashes, sorted, one partition at a time when spilled
+        if not self.spilled:
+            self._compact()
+            yield self.seen
+            return
+        for f in self._partitions():
+            f.flush()
+        for f in self._spill_files:
+            yield np.unique(np.fromfile(f.name, dtype=np.uint64))
+
+    def distinct_hashes(self):
+        """
+        Return the distinct hashes seen so far, sorted.
+
+        Spilled partitions are read back one at a time, so this needs memory
+        for every distinct hash at once.
+
+        Returns
+        -------
+        numpy.ndarray
+            The uint64 hashes.
+        """
+        if not self.spilled:
+            self._compact()
+            return self.seen
+        hashes = np.concatenate(list(self._distinct_runs()))
+        hashes.sort()
+        return hashes
+
+    def merge(self, other):
+        """
+        Count the rows of another set as if they had followed the rows of this one.
+
+        Rows of `other` that repeat a row of this set count as duplicates, as
+        do the duplicates `other` found among its own rows. The distinct hashes
+        of `other` are read one spilled partition at a time, and this set
+        spills as usual once they outgrow its budget, so sets larger than
+        memory can be merged.
+
+        Parameters
+        ----------
+        other : RowHashSet
+            The hashes of other rows, e.g. of another file.
+        """
+        within = self.within_duplicate_count + other.within_duplicate_count
+        other_duplicates = other.duplicate_count
+        distinct = 0
+        for hashes in other._distinct_runs():
+            self.update_hashes(hashes)
+            distinct += len(hashes)
+        self.rows_seen += other.rows_seen - distinct
+        self._in_memory_duplicates += other_duplicates
+        self._within_duplicates = within
+
+    @property
+    def within_duplicate_count(self):
+        """The number of duplicate rows that repeat a row of their own set, before any `merge`."""
+        return self.duplicate_count if self._within_duplicates is None else self._within_duplicates
+
+    @property
+    def cross_duplicate_count(self):
+        """The number of duplicate rows that only repeat a row of another merged set."""
+        return self.duplicate_count - self.within_duplicate_count
+
+    def copy_to(self, directory):
+        """
+        Copy the set, with its spilled partitions copied into `directory`.
+
+        Parameters
+        ----------
+        directory : str
+            The directory the copy keeps its partitions in; created if missing.
+
+        Returns
+        -------
+        RowHashSet
+            The copy, which owns `directory` if this set had spilled.
+        """
+        copy = RowHashSet.__new__(RowHashSet)
+        copy.__dict__.update(self.__dict__)
+        copy._runs = list(self._runs)
+        if self.spilled:
+            for f in self._partitions():
+                f.flush()
+            shutil.copytree(self._spill_path, directory, dirs_exist_ok=True)
+            copy._spill_path = directory
+            copy._spill_files = None
+            copy._owns_spill = True
+        return copy
+
+    def unspill(self):
+        """
+        Read the spilled partitions back into memory, e.g. to pickle the set for another machine.
+
+        Needs memory for every distinct hash at once.
+        """
+        if self.spilled:
+            self._in_memory_duplicates = self.duplicate_count
+            self.seen = self.distinct_hashes()
+            self.close()
+            self._spilled_duplicates = None
+
+    def relocate(self, directory):
+        """
+        Read the spilled partitions from `directory`, where they were copied or moved to.
+
+        Parameters
+        ----------
+        directory : str
+            The directory that now holds the partition files.
+        """
+        for f in self._spill_files or []:
+            f.close()
+        self._spill_files = None
+        self._spill_path = directory
+
+    def detach(self):
+        """Close the spilled partitions and leave them on disk, e.g. for a stored copy of the set."""
+        self._owns_spill = False
+        self.close()
+
+    def __getstate__(self):
+        # Spilled partitions are pickled by their directory rather than read into memory, so
+        # pickling a set to another process on the same machine costs nothing. The unpickled
+        # set takes the partitions over and deletes them when closed; this one leaves them.
+        state = self.__dict__.copy()
+        state["_spill_files"] = None
+        if self.spilled:
+            for f in self._spill_files or []:
+                f.flush()
+            self._owns_spill = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._spill_path is not None:
+            self._owns_spill = True
+        elif self.seen.nbytes > self.memory_budget:
+            # A set larger than its budget spills again as soon as it is unpickled
+            self._spill()
+
+    def close(self):
+        """Delete the spilled partitions, if any and if this set owns them."""
+        if getattr(self, '_spill_path', None) is not None:
+            for f in self._spill_files or []:
+                f.close()
+            if self._owns_spill:
+                shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+            self._spill_files = None
+
+    def __del__(self):
+        self.close()
+
+
+def _hash_numbers(column):
+    # Hash integers as 64-bit integers, and floats that hold an integer as that integer
+    if pd.api.types.is_integer_dtype(column):
+        dtype = 'uint64' if pd.api.types.is_unsigned_integer_dtype(column) else 'int64'
+        return pd.util.hash_array(column.to_numpy(dtype=dtype, na_value=0))
+    floats = column.to_numpy(dtype='float64', na_value=np.nan)
+    values = pd.util.hash_array(floats)
+    with np.errstate(invalid='ignore'):
+        integral = np.isfinite(floats) & (floats == np.trunc(floats)) & (np.abs(floats) < 2.0 ** 63)
+    values[integral] = pd.util.hash_array(floats[integral].astype(np.int64))
+    return values
+
+
+def _mix(values):
+    # splitmix64 finaliser, so that values differing in a few bits hash far apart
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def count_duplicate_rows(chunks, memory_budget=DUPLICATE_MEMORY_BUDGET_BYTES):
+    """
+    Count the exact duplicate rows of a DataFrame or a stream of chunks in one pass.
+
+    Parameters
+    ----------
+    chunks : pandas.DataFrame or iterable of pandas.DataFrame
+        The rows to check, whole or chunk by chunk.
+    memory_budget : int, optional
+        Bytes of hashes to hold in memory before spilling to disk.
+        Defaults to `DUPLICATE_MEMORY_BUDGET_BYTES`.
+
+    Returns
+    -------
+    tuple
+        The number of duplicate rows and the total number of rows.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    hashes = RowHashSet(memory_budget)
+    try:
+        for chunk in chunks:
+            hashes.update(chunk)
+        return hashes.duplicate_count, hashes.rows_seen
+    finally:
+        hashes.close()
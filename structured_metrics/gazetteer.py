@@ -0,0 +1,61 @@
+import re
+
+# The 33 districts of Telangana, with the older and alternative spellings found in published datasets
+TELANGANA_DISTRICTS = [
+    "adilabad", "bhadradri kothagudem", "bhadradri", "kothagudem", "hanumakonda", "hanamkonda", "hyderabad",
+    "jagtial", "jagityal", "jangaon", "jangoan", "jayashankar bhupalpally", "jayashankar bhupalapally", "bhupalpally",
+    "jogulamba gadwal", "gadwal", "kamareddy", "karimnagar", "khammam", "kumuram bheem asifabad", "komaram bheem asifabad",
+    "komaram bheem", "kumuram bheem", "asifabad", "mahabubabad", "mahabubnagar", "mahbubnagar", "mancherial",
+    "medak", "medchal malkajgiri", "medchal", "malkajgiri", "mulugu", "nagarkurnool", "nalgonda", "narayanpet",
+    "nirmal", "nizamabad", "peddapalli", "peddapalle", "rajanna sircilla", "sircilla", "rangareddy", "ranga reddy",
+    "sangareddy", "siddipet", "suryapet", "vikarabad", "wanaparthy", "warangal", "warangal urban", "warangal rural",
+    "yadadri bhuvanagiri", "yadadri", "bhuvanagiri", "bhongir",
+]
+
+# Mandals and towns that commonly appear as region values, beyond the district headquarters
+TELANGANA_MANDALS = [
+    "armur", "bodhan", "banswada", "yellareddy", "bhainsa", "khanapur", "utnoor", "bellampalli", "chennur",
+    "luxettipet", "mandamarri", "ramagundam", "manthani", "sultanabad", "korutla", "metpally", "dharmapuri",
+    "vemulawada", "huzurabad", "jammikunta", "choppadandi", "manakondur", "gajwel", "dubbak", "husnabad",
+    "narsapur", "toopran", "zaheerabad", "narayankhed", "patancheru", "andole", "tandur", "parigi", "chevella",
+    "shadnagar", "ibrahimpatnam", "maheshwaram", "shamshabad", "rajendranagar", "serilingampally", "kukatpally",
+    "quthbullapur", "keesara", "ghatkesar", "uppal", "alair", "choutuppal", "ramannapet", "miryalaguda",
+    "devarakonda", "nakrekal", "kodad", "huzurnagar", "thungathurthy", "sathupalli", "madhira", "wyra",
+    "bhadrachalam", "palvancha", "yellandu", "manuguru", "dornakal", "thorrur", "narsampet", "parkal",
+    "wardhannapet", "station ghanpur", "ghanpur", "eturnagaram", "mahadevpur", "jadcherla", "kalwakurthy",
+    "achampet", "kollapur", "kothakota", "alampur", "makthal", "kosgi", "boath", "ichoda", "kagaznagar",
+    "sirpur", "jainoor", "secunderabad", "amberpet", "charminar", "golconda", "khairatabad", "marredpally",
+    "musheerabad", "saidabad", "shaikpet", "tirumalagiri", "bahadurpura", "asifnagar", "himayatnagar",
+    "nampally", "ameerpet", "bandlaguda", "kapra", "alwal", "bachupally", "dundigal", "medipally",
+    "shamirpet", "hayathnagar", "saroornagar", "balapur", "kandukur", "yacharam", "moinabad", "shankarpally",
+]
+
+TELANGANA_PLACES = frozenset(TELANGANA_DISTRICTS + TELANGANA_MANDALS + ["telangana"])
+
+_SUFFIXES = re.compile(r"\b(district|dist|mandal|mdl|urban|rural|u|r|town|city|municipality|corporation)\b")
+
+
+def normalise_place(value):
+    """
+    Normalise a place name for lookup: lower case, letters only, without
+    administrative suffixes such as "district", "mandal", "(U)" or "(R)".
+
+    Parameters
+    ----------
+    value : object
+        The place name.
+
+    Returns
+    -------
+    str
+        The normalised name.
+    """
+    text = re.sub(r"[^a-z ]+", " ", str(value).lower())
+    text = _SUFFIXES.sub(" ", text)
+    return " ".join(text.split())
+
+
+def is_known_place(value):
+    """Return True if the value names a Telangana district, mandal or the state itself."""
+    name = normalise_place(value)
+    return name in TELANGANA_PLACES or name.replace(" ", "") in TELANGANA_PLACES
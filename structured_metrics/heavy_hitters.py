@@ -0,0 +1,135 @@
+import os
+import logging
+import pandas as pd
+
+# Counters kept per categorical column; a count is off by at most 1/(k+1) of the values
+CATEGORY_SKETCH_SIZE = int(os.getenv("CATEGORY_SKETCH_SIZE", 1000))
+# Rows counted exactly at a time before they are folded into the sketch
+CATEGORY_SKETCH_BATCH_ROWS = 100000
+
+
+class TopKSketch:
+    """
+    Misra-Gries heavy-hitter sketch of the values of one column.
+
+    At most `k` counters are kept. Batches are counted exactly and folded in
+    with the mergeable-summaries update: the counts are added, and if more
+    than `k` values remain the (k+1)-th largest count is subtracted from every
+    counter and the counters that drop to zero are removed. `error` is the
+    total subtracted so far, so the true count of a value lies between its
+    counter and its counter plus `error`, and a value without a counter occurs
+    at most `error` times. `error` stays 0 while the column has at most `k`
+    distinct values, and never exceeds `total / (k + 1)`.
+
+    Parameters
+    ----------
+    k : int, optional
+        The number of counters. Defaults to `CATEGORY_SKETCH_SIZE`.
+    """
+
+    def __init__(self, k=CATEGORY_SKETCH_SIZE):
+        self.k = k
+        self.counts = pd.Series(dtype='int64')
+        self.total = 0
+        self.error = 0
+
+    def _fold(self, counts, error):
+        merged = self.counts.add(counts, fill_value=0).astype('int64')
+        self.error += error
+        if len(merged) > self.k:
+            cut = int(merged.nlargest(self.k + 1).iloc[-1])
+            merged = merged - cut
+            merged = merged[merged > 0]
+            self.error += cut
+        self.counts = merged
+
+    def update(self, values):
+        """
+        Count the non-null values of a Series.
+
+        Parameters
+        ----------
+        values : pandas.Series
+            The next values of the column.
+        """
+        for start in range(0, len(values), CATEGORY_SKETCH_BATCH_ROWS):
+            counts = values.iloc[start:start + CATEGORY_SKETCH_BATCH_ROWS].value_counts()
+            self.total += int(counts.sum())
+            self._fold(counts, 0)
+
+    def merge(self, other):
+        """
+        Combine the sketch of other rows of the same column into this one.
+
+        Parameters
+        ----------
+        other : TopKSketch
+            A sketch of the other rows.
+        """
+        self.total += other.total
+        self._fold(other.counts, other.error)
+
+    def top_share_bounds(self):
+        """
+        Bounds on the share of the most frequent value among the non-null values.
+
+        Returns
+        -------
+        tuple
+            The lower and upper bound, or None for a column without values.
+        """
+        if self.total == 0:
+            return None
+        top = int(self.counts.max()) if len(self.counts) else 0
+        return top / self.total, min((top + self.error) / self.total, 1.0)
+
+    def is_dominated(self, threshold=0.99):
+        """
+        Decide whether the most frequent value holds more than `threshold` of the values.
+
+        Returns
+        -------
+        bool or None
+            True or False when the error bound decides the test, None when the
+            top share lies too close to the threshold. A column without values
+            counts as dominated.
+        """
+        bounds = self.top_share_bounds()
+        if bounds is None:
+            return True
+        lower, upper = bounds
+        if lower > threshold:
+            return True
+        if upper <= threshold:
+            return False
+        return None
+
+
+def is_dominated_column(series, threshold=0.99, k=CATEGORY_SKETCH_SIZE):
+    """
+    Decide whether one value dominates a column, with bounded memory where possible.
+
+    The column is first summarised with a `TopKSketch`. Only when its error
+    bound cannot decide the test is the exact `value_counts` computed.
+
+    Parameters
+    ----------
+    series : pandas.Series
+        The column to check.
+    threshold : float, optional
+        The share above which the top value dominates. Defaults to 0.99.
+    k : int, optional
+        The number of counters of the sketch. Defaults to `CATEGORY_SKETCH_SIZE`.
+
+    Returns
+    -------
+    bool
+        True if the top value holds more than `threshold` of the non-null values.
+    """
+    sketch = TopKSketch(k)
+    sketch.update(series)
+    dominated = sketch.is_dominated(threshold)
+    if dominated is None:
+        logging.info(f"Top value share of {series.name} is within the sketch error of {threshold}, counting exactly")
+        dominated = bool(series.value_counts(normalize=True).iloc[0] > threshold)
+    return dominated
@@ -1,21 +1,20 @@
 import openai
 import json
+import time
+import logging
 import pandas as pd
+from report.llm_scheduler import call_llm_many
+from structured_metrics.prompt_builder import build_column_prompts, merge_column_roles, estimate_tokens
 
-def infer_column_roles_openai(df, api_key):
-    # Initialize client
-    client = openai.OpenAI(api_key=api_key)
-
-    column_names = df.columns.tolist()
-    first_rows = df.head(20).to_dict(orient="records")
+MODEL = "gpt-4.1-mini"
 
-    system_prompt = (
+SYSTEM_PROMPT = (
 "You are a data analyst helping identify key columns in a tabular dataset. "
 
-"Given the column names and a few data rows, your task is to infer and identify the following:\n\n"
+"Given the column names, their dtypes and a few distinct sample values of each, your task is to infer and identify the following:\n\n"
 
 "1. Columns that represent **geographic regions**. This includes Indian administrative divisions such as **district**, **mandal**, **taluk**, **tehsil**, **village**, **ward**, **zone**, or **locality**. "
-"Use both column names and row values to make this inference — many place names (e.g., 'Adilabad', 'Ankapoor') are Indian locations. "
+"Use both column names and sample values to make this inference — many place names (e.g., 'Adilabad', 'Ankapoor') are Indian locations. "
 "Your answer should return all relevant geographic columns in order from highest to lowest level (e.g. district to village)."
 
 "2. A column most likely representing a **date**. Also return the most likely Python datetime format string (e.g., %Y-%m-%d or %d/%m/%Y) that can be used with datetime.strptime() or pandas.to_datetime() to correctly parse the values."
@@ -24,9 +23,9 @@ def infer_column_roles_openai(df, api_key):
 
 "4. A column most likely representing a **categorical** feature. This includes columns that represent finite sets of options, such as a list of colors, a set of shapes, a list of animals, a set of occupations, a set of educational levels, etc."
 "Note that categorical features are not typically continuous, but rather take on a set of discrete values. "
-"Also, the first 5 rows of data may be used to help make this inference."
+"Also, the sample values may be used to help make this inference."
 
-"Use the first few rows of data to help make your judgment."
+"Use the sample values to help make your judgment. Only answer with the columns you are given."
 
 "Return your answer as a JSON object with this structure:\n"
 "{\n"
@@ -43,23 +42,27 @@ def infer_column_roles_openai(df, api_key):
 "}\n"
 
 "If no match is found for a category, return null.\n"
+)
 
-    )
-
-    user_prompt = (
-        f"Here are the column names:\n{column_names}\n\n"
-        f"And here are the first 20 rows of data:\n{json.dumps([{k: str(v) for k,v in row.items()} for row in first_rows], indent=2)}"
-    )
 
+def _request_column_roles(client, user_prompt):
+    """Send one prompt, log its token counts and latency, and parse the answer."""
+    started = time.perf_counter()
     response = client.chat.completions.create(
-        model="gpt-4.1-mini",
+        model=MODEL,
         messages=[
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt}
         ],
         temperature=0,
         top_p=1
     )
+    latency = time.perf_counter() - started
+    usage = response.usage
+    if usage is not None:
+        logging.info(f"OpenAI column roles request: {usage.prompt_tokens} prompt tokens, {usage.completion_tokens} completion tokens, {latency:.2f}s")
+    else:
+        logging.info(f"OpenAI column roles request: about {estimate_tokens(SYSTEM_PROMPT + user_prompt)} prompt tokens, {latency:.2f}s")
 
     message_content = response.choices[0].message.content
 
@@ -69,4 +72,34 @@ def infer_column_roles_openai(df, api_key):
         return {
             "error": "Could not parse OpenAI response",
             "raw_response": message_content
-        }
\ No newline at end of file
+        }
+
+
+def infer_column_roles_openai(df, api_key):
+    """
+    Ask OpenAI for the region, date, timestamp and categorical columns of a table.
+
+    Each column is described by its dtype and a few distinct, truncated sample
+    values. Tables too wide for one prompt are split into batches of columns
+    that are asked in parallel and whose answers are merged.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table, or its first rows.
+    api_key : str
+        The OpenAI API key.
+
+    Returns
+    -------
+    dict
+        The column roles, or a dictionary with an "error" key if an answer could not be parsed.
+    """
+    client = openai.OpenAI(api_key=api_key)
+    prompts = build_column_prompts(df)
+    logging.info(f"Asking OpenAI for the roles of {df.shape[1]} columns in {len(prompts)} requests of about {max(estimate_tokens(prompt) for prompt in prompts)} tokens at most")
+    answers = call_llm_many(_request_column_roles, [(client, prompt) for prompt in prompts])
+    for answer in answers:
+        if "error" in answer:
+            return answer
+    return answers[0] if len(answers) == 1 else merge_column_roles(answers)
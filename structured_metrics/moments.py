@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnMoments:
+    """
+    Count, mean and sum of squared deviations (M2) of numeric columns.
+
+    The moments of a batch are computed for all columns at once, and two sets
+    of moments are combined with the pairwise update of Chan et al., the batch
+    form of Welford's algorithm. The result does not depend on how the rows
+    were split, so chunks, files and worker processes can each keep their own
+    accumulator and merge them at the end.
+    """
+
+    def __init__(self):
+        self.count = pd.Series(dtype='int64')
+        self.mean = pd.Series(dtype='float64')
+        self.m2 = pd.Series(dtype='float64')
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Compute the moments of every column of a DataFrame of numeric columns.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            The numeric columns. Nulls are ignored.
+
+        Returns
+        -------
+        ColumnMoments
+            The moments of the columns of `df`.
+        """
+        moments = cls()
+        values = df.to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.nansum(values, axis=0) / np.maximum(count, 1), np.nan)
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+        moments.count = pd.Series(count, index=df.columns, dtype='int64')
+        moments.mean = pd.Series(mean, index=df.columns, dtype='float64')
+        moments.m2 = pd.Series(m2, index=df.columns, dtype='float64')
+        return moments
+
+    def update(self, df):
+        """Fold the rows of a DataFrame of numeric columns into the moments."""
+        self.merge(ColumnMoments.from_frame(df))
+
+    def merge(self, other):
+        """
+        Combine the moments of `other` into these, column by column.
+
+        Parameters
+        ----------
+        other : ColumnMoments
+            Moments of other rows of the same or other columns.
+        """
+        columns = self.count.index.append(other.count.index[~other.count.index.isin(self.count.index)])
+        count_a = self.count.reindex(columns, fill_value=0)
+        count_b = other.count.reindex(columns, fill_value=0)
+        mean_a = self.mean.reindex(columns).fillna(0.0)
+        mean_b = other.mean.reindex(columns).fillna(0.0)
+        count = count_a + count_b
+        delta = mean_b - mean_a
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = (count_b / count).where(count > 0, 0.0)
+            self.mean = (mean_a + delta * share).where(count > 0, np.nan)
+            self.m2 = self.m2.reindex(columns, fill_value=0.0) + other.m2.reindex(columns, fill_value=0.0) + delta ** 2 * count_a * share
+        self.count = count
+
+    def drop(self, col):
+        """Forget a column, e.g. one that turned out not to be numeric."""
+        self.count = self.count.drop(col, errors='ignore')
+        self.mean = self.mean.drop(col, errors='ignore')
+        self.m2 = self.m2.drop(col, errors='ignore')
+
+    @property
+    def columns(self):
+        return self.count.index.tolist()
+
+    def std(self):
+        """Sample standard deviation of each column, NaN for fewer than two values, as in pandas."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2 / (self.count - 1)).where(self.count > 1, np.nan)
+
+    def low_variance_columns(self, cv_threshold=0.1):
+        """
+        List the columns whose coefficient of variation is below `cv_threshold`.
+
+        Columns with a zero or undefined mean, or an undefined standard
+        deviation, are never reported.
+
+        Parameters
+        ----------
+        cv_threshold : float, optional
+            The threshold for the coefficient of variation. Defaults to 0.1.
+
+        Returns
+        -------
+        list
+            The low variance columns, in column order.
+        """
+        std = self.std()
+        low_variance_cols = []
+        for col in self.columns:
+            mean = self.mean[col]
+            if pd.isna(mean) or mean == 0 or pd.isna(std[col]):
+                continue
+            if std[col] / mean < cv_threshold:
+                low_variance_cols.append(col)
+        return low_variance_cols
@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class NullProfile:
+    """
+    Null bitmap of a DataFrame with its per-column and per-row null counts.
+
+    The DataFrame is scanned for nulls once and every structured metric reads
+    the counts from here instead of calling `isnull` on the same columns again.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The DataFrame to profile.
+
+    Attributes
+    ----------
+    null_mask : numpy.ndarray or None
+        Boolean array of shape (rows, columns), True where a value is null.
+        None for a profile merged from counts with `from_counts`.
+    column_null_counts : dict
+        Mapping of column name to its number of null values, in column order.
+    row_null_counts : numpy.ndarray
+        The number of null values in each row.
+    number_of_rows : int
+        The number of rows of the DataFrame.
+    """
+
+    def __init__(self, df):
+        self.columns = df.columns.tolist()
+        self.number_of_rows = df.shape[0]
+        self.null_mask = df.isnull().to_numpy(dtype=bool)
+        self.column_null_counts = dict(zip(self.columns, self.null_mask.sum(axis=0).tolist()))
+        self.row_null_counts = self.null_mask.sum(axis=1)
+
+    @classmethod
+    def from_counts(cls, columns, number_of_rows, column_null_counts, row_null_counts):
+        """
+        Build a profile from null counts computed elsewhere, e.g. per block of columns.
+
+        Parameters
+        ----------
+        columns : list
+            The column names, in order.
+        number_of_rows : int
+            The number of rows.
+        column_null_counts : list of int
+            The number of nulls of each column, in the order of `columns`.
+        row_null_counts : numpy.ndarray
+            The number of nulls in each row, over all the columns.
+
+        Returns
+        -------
+        NullProfile
+            The profile, without a null mask.
+        """
+        profile = cls.__new__(cls)
+        profile.columns = list(columns)
+        profile.number_of_rows = number_of_rows
+        profile.null_mask = None
+        profile.column_null_counts = dict(zip(profile.columns, column_null_counts))
+        profile.row_null_counts = row_null_counts
+        return profile
+
+    def null_count(self, col):
+        return self.column_null_counts[col]
+
+    def null_fraction(self, col):
+        """Proportion of null values in a column, NaN for a DataFrame without rows."""
+        return self.column_null_counts[col] / self.number_of_rows if self.number_of_rows else np.nan
+
+    def all_null(self, col):
+        """True if every value of the column is null, including when there are no rows."""
+        return self.column_null_counts[col] == self.number_of_rows
+
+    def row_null_fractions(self):
+        """Proportion of null values in each row, NaN for every row when there are no columns."""
+        if not self.columns:
+            return np.full(self.number_of_rows, np.nan)
+        return self.row_null_counts / len(self.columns)
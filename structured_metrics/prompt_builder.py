@@ -0,0 +1,187 @@
+import os
+import json
+import logging
+
+# Longest cell sent to the LLM; longer free text is cut and marked with "…"
+PROMPT_MAX_CELL_CHARS = int(os.getenv("PROMPT_MAX_CELL_CHARS", 60))
+# Distinct values sent per column
+PROMPT_SAMPLE_VALUES = int(os.getenv("PROMPT_SAMPLE_VALUES", 5))
+# Wider tables are split into batches of this many columns, asked in parallel
+PROMPT_MAX_COLUMNS = int(os.getenv("PROMPT_MAX_COLUMNS", 80))
+# Largest estimated prompt per request; batches are narrowed until they fit
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", 6000))
+# Rows the sample values are drawn from
+PROMPT_SAMPLE_ROWS = 1000
+# Rough characters per token of English text and JSON, for budgeting before a request
+CHARS_PER_TOKEN = 4
+
+
+def truncate_cell(value, max_chars=PROMPT_MAX_CELL_CHARS):
+    """
+    Return the text of a cell, cut to `max_chars` characters.
+
+    Parameters
+    ----------
+    value : object
+        The cell.
+    max_chars : int, optional
+        The longest text kept. Defaults to `PROMPT_MAX_CELL_CHARS`.
+
+    Returns
+    -------
+    str
+        The text, ending in "…" if it was cut.
+    """
+    text = " ".join(str(value).split())
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def sample_column_values(series, n=PROMPT_SAMPLE_VALUES, max_chars=PROMPT_MAX_CELL_CHARS):
+    """
+    Pick up to `n` distinct, informative values of a column.
+
+    Nulls and blank cells are skipped. The most frequent values come first,
+    followed by values spread over the rest of the distinct values, so a
+    prompt shows both what is typical and how much the column varies.
+
+    Parameters
+    ----------
+    series : pandas.Series
+        The column, or its first rows.
+    n : int, optional
+        The number of values. Defaults to `PROMPT_SAMPLE_VALUES`.
+    max_chars : int, optional
+        The longest value kept. Defaults to `PROMPT_MAX_CELL_CHARS`.
+
+    Returns
+    -------
+    list of str
+        The values, truncated.
+    """
+    if n <= 0:
+        return []
+    text = series.dropna().map(lambda value: truncate_cell(value, max_chars))
+    counts = text[text != ""].value_counts(sort=True)
+    if len(counts) <= n:
+        return counts.index.tolist()
+    frequent = counts.index[:(n + 1) // 2].tolist()
+    rest = counts.index[(n + 1) // 2:]
+    step = len(rest) / (n - len(frequent))
+    return frequent + [rest[int(i * step)] for i in range(n - len(frequent))]
+
+
+def summarise_columns(df, columns=None, n=PROMPT_SAMPLE_VALUES, max_chars=PROMPT_MAX_CELL_CHARS):
+    """
+    Describe columns of a table by their dtype and sample values, as compact JSON.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table.
+    columns : list, optional
+        The positions of the columns to describe. Defaults to all of them.
+    n : int, optional
+        The values per column. Defaults to `PROMPT_SAMPLE_VALUES`.
+    max_chars : int, optional
+        The longest value kept. Defaults to `PROMPT_MAX_CELL_CHARS`.
+
+    Returns
+    -------
+    str
+        A JSON object mapping each column name to [dtype, [values]], without whitespace.
+    """
+    sample = df.head(PROMPT_SAMPLE_ROWS)
+    positions = range(sample.shape[1]) if columns is None else columns
+    summary = {}
+    for i in positions:
+        series = sample.iloc[:, i]
+        summary[str(sample.columns[i])] = [str(series.dtype), sample_column_values(series, n, max_chars)]
+    return json.dumps(summary, ensure_ascii=False, separators=(',', ':'))
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens of a prompt from its length."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def build_column_prompts(df, max_columns=PROMPT_MAX_COLUMNS, max_tokens=PROMPT_MAX_TOKENS):
+    """
+    Build the user prompts describing a table, one per batch of columns.
+
+    Batches hold at most `max_columns` columns, fewer if a prompt would be
+    estimated at more than `max_tokens` tokens, e.g. for long column names.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table, or its first rows.
+    max_columns : int, optional
+        The columns per prompt. Defaults to `PROMPT_MAX_COLUMNS`.
+    max_tokens : int, optional
+        The estimated tokens per prompt. Defaults to `PROMPT_MAX_TOKENS`.
+
+    Returns
+    -------
+    list of str
+        The prompts, covering the columns in order.
+    """
+    n_columns = df.shape[1]
+    while True:
+        batches = [list(range(start, min(start + max_columns, n_columns))) for start in range(0, n_columns, max_columns)] or [[]]
+        prompts = [
+            "Columns, each with its dtype and up to "
+            f"{PROMPT_SAMPLE_VALUES} distinct sample values (long values are cut):\n{summarise_columns(df, batch)}"
+            for batch in batches
+        ]
+        if max_columns <= 1 or max(estimate_tokens(prompt) for prompt in prompts) <= max_tokens:
+            return prompts
+        max_columns = (max_columns + 1) // 2
+
+
+def merge_column_roles(answers):
+    """
+    Merge the column roles answered for batches of columns of one table.
+
+    Lists of columns are concatenated in batch order. The metrics check every
+    column of a date or timestamp role against a single format, so a role keeps
+    the columns of its most common format, the first batch's on a tie, and the
+    columns in other formats are left out.
+
+    Parameters
+    ----------
+    answers : list of dict
+        The parsed answers, one per batch.
+
+    Returns
+    -------
+    dict
+        The column roles in the shape of a single answer.
+    """
+    def as_list(value):
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    merged = {"region": [], "date": None, "timestamp": None, "categorical": []}
+    formats = {"date": {}, "timestamp": {}}
+    for answer in answers:
+        for role in ("region", "categorical"):
+            merged[role] += as_list(answer.get(role))
+        for role in ("date", "timestamp"):
+            info = answer.get(role)
+            if not info or not info.get("column"):
+                continue
+            for col in as_list(info.get("column")):
+                formats[role].setdefault(col, info.get("format"))
+    for role in ("date", "timestamp"):
+        if not formats[role]:
+            continue
+        found = list(formats[role].values())
+        fmt = max(found, key=found.count)
+        columns = [col for col, col_fmt in formats[role].items() if col_fmt == fmt]
+        if len(columns) < len(found):
+            logging.info(f"Leaving out {role} columns not in the format {fmt}: {[col for col in formats[role] if col not in columns]}")
+        merged[role] = {"column": columns, "format": fmt}
+    merged["region"] = merged["region"] or None
+    merged["categorical"] = merged["categorical"] or None
+    return merged
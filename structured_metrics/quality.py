@@ -1,4 +1,9 @@
-def check_column_missing(df, threshold=0.3):
+from structured_metrics.null_profile import NullProfile
+from structured_metrics.duplicates import count_duplicate_rows
+from report.metric_registry import register_metric
+
+@register_metric("structured", outputs=["column_missing", "column_missing_count", "column_missing_percentage", "number_of_columns"], inputs=["df", "null_profile"], when=lambda inputs: inputs.get("parquet_footer") is None, order=10)
+def check_column_missing(df, threshold=0.3, null_profile=None):
     """
     Check which columns have missing values above a certain threshold.
 
@@ -8,6 +13,8 @@ def check_column_missing(df, threshold=0.3):
         DataFrame to check for missing values.
     threshold : float, optional
         Minimum proportion of missing values in a column to report. Defaults to 0.3.
+    null_profile : structured_metrics.null_profile.NullProfile, optional
+        The null counts of `df`, computed here if not given.
 
     Returns
     -------
@@ -37,10 +44,12 @@ def check_column_missing(df, threshold=0.3):
             "column_missing_percentage": 100.0,
             "number_of_columns": df.shape[1]
         }
+    if null_profile is None:
+        null_profile = NullProfile(df)
     missing_report = {
-        col : round(df[col].isnull().mean() * 100, 2)
+        col : round(null_profile.null_fraction(col) * 100, 2)
         for col in df.columns
-        if df[col].isnull().mean() > threshold or (df[col].isnull().all() and not df[col].empty)
+        if null_profile.null_fraction(col) > threshold or null_profile.all_null(col)
     }
     
     # If there are no columns, return zeros (avoid division by zero)
@@ -63,7 +72,63 @@ def check_column_missing(df, threshold=0.3):
                 "column_missing_percentage": round(len(missing_report) / num_cols * 100, 1),
                 "number_of_columns": num_cols}
     
-def check_row_missing(df, threshold=0.5):
+def check_column_missing_from_counts(null_counts, number_of_rows, threshold=0.3):
+    """
+    Check which columns have missing values above a certain threshold, from precomputed null counts.
+
+    This gives the same report as `check_column_missing` when the null count of
+    every column is already known, e.g. from Parquet footer statistics or from
+    the streaming profiler, so no column has to be scanned.
+
+    Parameters
+    ----------
+    null_counts : dict
+        Mapping of column name to its number of null values, in column order.
+    number_of_rows : int
+        The number of rows the null counts were taken over.
+    threshold : float, optional
+        Minimum proportion of missing values in a column to report. Defaults to 0.3.
+
+    Returns
+    -------
+    dict
+        A dictionary with the keys "column_missing", "column_missing_count",
+        "column_missing_percentage" and "number_of_columns", as in `check_column_missing`.
+    """
+    num_cols = len(null_counts)
+    if num_cols == 0:
+        return {"column_missing": {},
+                "column_missing_count": 0,
+                "column_missing_percentage": 0.0,
+                "number_of_columns": 0}
+    if number_of_rows == 0:
+        # All columns are effectively missing
+        return {"column_missing": {col: 100.0 for col in null_counts},
+                "column_missing_count": num_cols,
+                "column_missing_percentage": 100.0,
+                "number_of_columns": num_cols}
+    missing_report = {
+        col: round(count / number_of_rows * 100, 2)
+        for col, count in null_counts.items()
+        if count / number_of_rows > threshold or count == number_of_rows
+    }
+    return {"column_missing": missing_report,
+            "column_missing_count": len(missing_report),
+            "column_missing_percentage": round(len(missing_report) / num_cols * 100, 1) if missing_report else 0.0,
+            "number_of_columns": num_cols}
+
+@register_metric("structured", outputs=["column_missing", "column_missing_count", "column_missing_percentage", "number_of_columns"], inputs=["parquet_footer"], when=lambda inputs: inputs.get("parquet_footer") is not None, order=10)
+def check_column_missing_from_footer(parquet_footer, threshold=0.3):
+    """
+    Check which columns have missing values above a threshold, from the null
+    counts of a Parquet footer read by `read_parquet_footer`.
+
+    See `check_column_missing_from_counts`.
+    """
+    return check_column_missing_from_counts(parquet_footer["column_null_counts"], parquet_footer["number_of_rows"], threshold)
+
+@register_metric("structured", outputs=["row_missing_count", "row_missing_percentage", "number_of_rows"], inputs=["df", "null_profile"], order=20)
+def check_row_missing(df, threshold=0.5, null_profile=None):
     """
     Check which rows have missing values above a certain threshold.
 
@@ -73,6 +138,8 @@ def check_row_missing(df, threshold=0.5):
         DataFrame to check for missing values.
     threshold : float, optional
         Minimum proportion of missing values in a row to report. Defaults to 0.5.
+    null_profile : structured_metrics.null_profile.NullProfile, optional
+        The null counts of `df`, computed here if not given.
 
     Returns
     -------
@@ -83,13 +150,16 @@ def check_row_missing(df, threshold=0.5):
         of rows in the DataFrame.
     """
 
-    count = df[df.isnull().mean(axis=1) >= threshold].shape[0]
+    if null_profile is None:
+        null_profile = NullProfile(df)
+    count = int((null_profile.row_null_fractions() >= threshold).sum())
     num_rows = df.shape[0]
     percentage = round(count / num_rows * 100, 1) if count > 0 else 0.0
     return {"row_missing_count": count,
             "row_missing_percentage": percentage,
             "number_of_rows": num_rows}
 
+@register_metric("structured", outputs=["exact_row_duplicates_count", "exact_row_duplicates_percentage"], inputs=["df"], order=30)
 def check_row_duplicates(df):
     """
     Check which rows are exact duplicates of each other.
@@ -105,10 +175,11 @@ def check_row_duplicates(df):
         A dictionary with two keys: "exact_row_duplicates" and
         "exact_row_duplicates_percentage". The first key maps to the number of
         rows with exact duplicates, and the second maps to the percentage of
-        rows with exact duplicates.
+        rows with exact duplicates. Both come from one pass over 64-bit row
+        hashes, see `structured_metrics.duplicates.RowHashSet`.
     """
-    count = int(df.duplicated(keep='first').sum())
-    percentage = round(df.duplicated().mean() * 100, 1) if count > 0 else 0.0
+    count, num_rows = count_duplicate_rows(df)
+    percentage = round(count / num_rows * 100, 1) if count > 0 else 0.0
     return {"exact_row_duplicates_count": count,
             "exact_row_duplicates_percentage": percentage}  
 
@@ -1,6 +1,9 @@
 import pandas as pd
+from structured_metrics.null_profile import NullProfile
+from report.metric_registry import register_metric
 
-def check_date_or_timestamp_fields(df, imputed_columns=None):
+@register_metric("structured", outputs=["date_or_timestamp_fields_found", "date_or_timestamp_issues_percentage"], inputs=["df", "imputed_columns", "null_profile"], order=90)
+def check_date_or_timestamp_fields(df, imputed_columns=None, null_profile=None):
     """
     Checks the fill rate of date and/or timestamp columns.
 
@@ -10,6 +13,8 @@ def check_date_or_timestamp_fields(df, imputed_columns=None):
         Should contain 'date' and 'timestamp' with 'column' (list of col names) and 'format' (strftime format).
     df : pandas.DataFrame
         The dataframe to validate.
+    null_profile : structured_metrics.null_profile.NullProfile, optional
+        The null counts of `df`, computed here if not given.
 
     Returns
     -------
@@ -40,15 +45,17 @@ def check_date_or_timestamp_fields(df, imputed_columns=None):
         return {"date_or_timestamp_fields_found": 'None',
             "date_or_timestamp_issues_percentage": 'None'}
     
+    if null_profile is None:
+        null_profile = NullProfile(df)
     date_or_timestamp_fields_found = []
     overall_pct = 0
     num_non_null_cols = 0
     
     for col in columns_to_validate:
-        if col not in df.columns or df[col].isnull().all():
+        if col not in df.columns or null_profile.all_null(col):
             continue
         date_or_timestamp_fields_found.append(col)
-        overall_pct += df[col].isnull().mean() * 100
+        overall_pct += null_profile.null_fraction(col) * 100
         num_non_null_cols += 1
     overall_pct = round(overall_pct / num_non_null_cols, 1) if num_non_null_cols > 0 else 0.0
     return {"date_or_timestamp_fields_found": date_or_timestamp_fields_found,
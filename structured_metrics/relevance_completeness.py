@@ -1,4 +1,8 @@
-def check_coverage_region(df, imputed_columns=None):
+from structured_metrics.null_profile import NullProfile
+from report.metric_registry import register_metric
+
+@register_metric("structured", outputs=["region_coverage", "region_column"], inputs=["df", "imputed_columns", "null_profile"], order=40)
+def check_coverage_region(df, imputed_columns=None, null_profile=None):
     """
     Check if there is a region column in the dataframe and if it is not null.
     
@@ -6,6 +10,8 @@ def check_coverage_region(df, imputed_columns=None):
     ----------
     df : pandas.DataFrame
         The dataframe to check.
+    null_profile : structured_metrics.null_profile.NullProfile, optional
+        The null counts of `df`, computed here if not given.
     
     Returns
     -------
@@ -22,14 +28,16 @@ def check_coverage_region(df, imputed_columns=None):
         return {"region_coverage": 'None', "region_column": "No region column found"}
     
 
+    if null_profile is None:
+        null_profile = NullProfile(df)
     missing_percentages = {}
     num_non_null_cols = 0
     overall_pct = 0
     for col in region_col:
-        if col not in df.columns or df[col].isnull().all():
+        if col not in df.columns or null_profile.all_null(col):
             continue
-        missing_values = df[col].isnull().sum()
-        total_values = df[col].size
+        missing_values = null_profile.null_count(col)
+        total_values = null_profile.number_of_rows
         if total_values == 0:
             missing_percentage = 0
         else:
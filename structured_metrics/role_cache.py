@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import pandas as pd
+
+# Cache the LLM column roles on disk, keyed by a fingerprint of the schema
+ROLE_CACHE = os.getenv("ROLE_CACHE", "true").lower() == "true"
+# Lambda only lets us write to /tmp, which survives between warm invocations
+ROLE_CACHE_DIR = os.getenv("ROLE_CACHE_DIR") or ("/tmp/role_cache" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else ".role_cache")
+# Entries older than this are asked again, in case the prompt or the model changed
+ROLE_CACHE_TTL_SECONDS = float(os.getenv("ROLE_CACHE_TTL_DAYS", 30)) * 86400
+# The least recently used entries are deleted beyond this many
+ROLE_CACHE_MAX_ENTRIES = int(os.getenv("ROLE_CACHE_MAX_ENTRIES", 10000))
+# Bump when the prompt or the expected answer changes
+ROLE_CACHE_VERSION = 2
+# Leading rows whose values make up the value-shape signature
+SIGNATURE_ROWS = 100
+
+# Hits and misses of this process, read by `cache_stats`
+_STATS = {"hits": 0, "misses": 0}
+
+
+def _value_shape(value):
+    """Reduce a value to its shape: letters become "a", digits "9", runs of letters collapse, punctuation stays."""
+    shape = re.sub(r"[^\W\d_]+", "a", str(value).strip())
+    shape = re.sub(r"\d{5,}", "9+", shape)
+    return re.sub(r"\d", "9", shape)
+
+
+def schema_fingerprint(df):
+    """
+    Fingerprint the schema of a table: column names, dtypes and value shapes.
+
+    The value shape of a text column is the most common shape of its leading
+    values, e.g. "99/99/9999" for dates or "a (a)" for "Gajwel (U)", so
+    monthly partitions of a dataset share a fingerprint while a column
+    switching date format does not.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table, or its first rows.
+
+    Returns
+    -------
+    str
+        The hex digest of the fingerprint.
+    """
+    head = df.head(SIGNATURE_ROWS)
+    columns = []
+    for i, col in enumerate(head.columns):
+        series = head.iloc[:, i]
+        shape = None
+        if not pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_datetime64_any_dtype(series):
+            shapes = series.dropna().map(_value_shape)
+            shape = shapes.mode().iloc[0] if not shapes.empty else None
+        columns.append([str(col), str(series.dtype), shape])
+    signature = json.dumps({"version": ROLE_CACHE_VERSION, "columns": columns})
+    return hashlib.blake2b(signature.encode(), digest_size=20).hexdigest()
+
+
+def _entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.json'):
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+    return entries
+
+
+def evict(cache_dir=ROLE_CACHE_DIR, max_entries=ROLE_CACHE_MAX_ENTRIES):
+    """
+    Delete the least recently used entries beyond `max_entries`.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        The cache directory. Defaults to `ROLE_CACHE_DIR`.
+    max_entries : int, optional
+        The number of entries to keep. Defaults to `ROLE_CACHE_MAX_ENTRIES`.
+
+    Returns
+    -------
+    int
+        The number of entries deleted.
+    """
+    entries = sorted(_entries(cache_dir))
+    removed = 0
+    for _, path in entries[:max(len(entries) - max_entries, 0)]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        logging.info(f"Evicted {removed} column role cache entries from {cache_dir}")
+    return removed
+
+
+def read_cached_roles(key, cache_dir=ROLE_CACHE_DIR, ttl=ROLE_CACHE_TTL_SECONDS):
+    """
+    Return the cached column roles of a fingerprint, or None on a miss or an expired entry.
+
+    Parameters
+    ----------
+    key : str
+        The fingerprint returned by `schema_fingerprint`.
+    cache_dir : str, optional
+        The cache directory. Defaults to `ROLE_CACHE_DIR`.
+    ttl : float, optional
+        The age in seconds after which an entry expires. Defaults to `ROLE_CACHE_TTL_SECONDS`.
+
+    Returns
+    -------
+    dict or None
+        The column roles, as returned by `infer_column_roles_openai`.
+    """
+    path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Discarding unreadable column role cache entry {path}: {e}")
+        entry = None
+    if entry is None or time.time() - entry.get("created", 0) > ttl:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    os.utime(path)  # mark as recently used
+    return entry["roles"]
+
+
+def write_cached_roles(key, roles, cache_dir=ROLE_CACHE_DIR):
+    """
+    Store the column roles of a fingerprint.
+
+    Parameters
+    ----------
+    key : str
+        The fingerprint returned by `schema_fingerprint`.
+    roles : dict
+        The column roles.
+    cache_dir : str, optional
+        The cache directory. Defaults to `ROLE_CACHE_DIR`.
+
+    Returns
+    -------
+    bool
+        True if the roles were cached.
+    """
+    path = os.path.join(cache_dir, f"{key}.json")
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({"created": time.time(), "roles": roles}, f)
+        os.replace(partial, path)  # concurrent workers never see a half written entry
+    except (OSError, TypeError, ValueError) as e:
+        logging.warning(f"Could not write column role cache entry {path}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    evict(cache_dir)
+    return True
+
+
+def cached_column_roles(df, infer, cache_dir=None):
+    """
+    Return the column roles of a table from the cache, calling `infer` only on a miss.
+
+    Answers carrying an "error" key are returned but not cached.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table, or its first rows.
+    infer : callable
+        Called without arguments on a miss; returns the column roles.
+    cache_dir : str, optional
+        The cache directory. Defaults to `ROLE_CACHE_DIR`.
+
+    Returns
+    -------
+    dict
+        The column roles.
+    """
+    cache_dir = cache_dir or ROLE_CACHE_DIR
+    key = schema_fingerprint(df)
+    roles = read_cached_roles(key, cache_dir)
+    if roles is not None:
+        _STATS["hits"] += 1
+        logging.info(f"Column role cache hit for schema {key[:12]} ({_STATS['hits']} hits, {_STATS['misses']} misses)")
+        return roles
+    _STATS["misses"] += 1
+    logging.info(f"Column role cache miss for schema {key[:12]} ({_STATS['hits']} hits, {_STATS['misses']} misses)")
+    roles = infer()
+    if isinstance(roles, dict) and "error" not in roles:
+        write_cached_roles(key, roles, cache_dir)
+    return roles
+
+
+def cache_stats():
+    """Return the column role cache hits and misses of this process so far."""
+    return dict(_STATS)
@@ -0,0 +1,253 @@
+import os
+import re
+import logging
+import warnings
+import pandas as pd
+from structured_metrics.gazetteer import is_known_place
+from structured_metrics import role_cache
+from structured_metrics.llm_api import infer_column_roles_openai
+from structured_metrics.prompt_builder import merge_column_roles
+
+# Columns inferred locally below this confidence are handed to the LLM
+ROLE_CONFIDENCE_THRESHOLD = float(os.getenv("ROLE_CONFIDENCE_THRESHOLD", 0.7))
+# "auto" asks the LLM only when the local inference is unsure, "local" never does, "llm" always does
+ROLE_INFERENCE = os.getenv("ROLE_INFERENCE", "auto").lower()
+ROLE_SAMPLE_ROWS = 1000
+ROLE_SAMPLE_VALUES = 200
+
+REGION_KEYWORDS = ['district', 'mandal', 'taluk', 'tehsil', 'village', 'ward', 'zone', 'locality', 'state', 'city',
+                   'region', 'subdistrict', 'panchayat', 'constituency', 'municipality', 'town', 'circle', 'division']
+DATE_KEYWORDS = ['date', 'dob', 'day', 'month', 'year', 'period']
+TIMESTAMP_KEYWORDS = ['timestamp', 'time', 'datetime', 'created', 'updated', 'modified']
+CATEGORICAL_KEYWORDS = ['type', 'category', 'status', 'gender', 'sex', 'class', 'grade', 'level', 'flag', 'group',
+                        'caste', 'sector', 'mode', 'season', 'crop', 'scheme', 'department']
+IDENTIFIER_KEYWORDS = ['id', 'code', 'no', 'number', 'name', 'address', 'remarks', 'description', 'phone', 'mobile', 'email']
+
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d.%m.%Y', '%d-%b-%Y', '%d %b %Y',
+                '%d-%B-%Y', '%d %B %Y', '%b %d, %Y', '%d-%m-%y', '%d/%m/%y', '%Y%m%d', '%b-%Y', '%B %Y', '%m-%Y', '%Y-%m']
+TIMESTAMP_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S.%f',
+                     '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%d %H:%M', '%d-%m-%Y %H:%M:%S',
+                     '%d/%m/%Y %H:%M:%S', '%d-%m-%Y %H:%M', '%d/%m/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%d/%m/%Y %I:%M %p']
+# Values with a run of digits next to a separator, the only ones worth probing for a datetime format
+_DATE_LIKE = re.compile(r"^\s*(\d{1,4}|[A-Za-z]{3,9})[-/. ]+(\d{1,2}|[A-Za-z]{3,9})([-/. ,]+\d{2,4})?([ T]\d{1,2}:\d{2}.*)?\s*$|^\s*\d{8}\s*$")
+
+CATEGORICAL_MAX_DISTINCT = 50
+CATEGORICAL_MAX_RATIO = 0.5
+REGION_MATCH_SHARE = 0.5
+FORMAT_MATCH_SHARE = 0.95
+
+
+def _words(col):
+    return [word for word in re.split(r"[^a-z0-9]+", re.sub(r"([a-z])([A-Z])", r"\1_\2", str(col)).lower()) if word]
+
+
+def _has_keyword(col, keywords):
+    words = _words(col)
+    joined = "".join(words)
+    return any(keyword in words or (len(keyword) > 5 and keyword in joined) for keyword in keywords)
+
+
+def probe_datetime_format(values, formats):
+    """
+    Find the format that parses the largest share of the values.
+
+    Parameters
+    ----------
+    values : pandas.Series
+        Distinct non-null values of a column, as strings.
+    formats : list of str
+        The strftime formats to try, in order of preference.
+
+    Returns
+    -------
+    tuple
+        The best format and the share of values it parses, or (None, 0.0).
+    """
+    best, best_share = None, 0.0
+    if values.empty:
+        return best, best_share
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for fmt in formats:
+            try:
+                share = pd.to_datetime(values, format=fmt, errors="coerce").notna().mean()
+            except (ValueError, TypeError):
+                continue
+            if share > best_share:
+                best, best_share = fmt, share
+            if share == 1.0:
+                break
+    return best, best_share
+
+
+def _column_role(col, series):
+    """Return (role, format, confidence) for one sampled column."""
+    values = series.dropna()
+    if values.empty:
+        return None, None, 0.9
+    distinct = pd.Series(values.astype(str).unique()[:ROLE_SAMPLE_VALUES])
+    numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    date_header = _has_keyword(col, DATE_KEYWORDS)
+    timestamp_header = _has_keyword(col, TIMESTAMP_KEYWORDS)
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Already parsed, e.g. from Parquet: the format of its string form is what the metrics see
+        has_time = (values.dt.normalize() != values).any()
+        fmt = '%Y-%m-%d %H:%M:%S' if has_time else '%Y-%m-%d'
+        return ("timestamp" if has_time else "date"), fmt, 0.95
+
+    # Datetimes: probe the formats on the distinct values that look like dates
+    if not numeric or date_header:
+        looks_like_date = distinct.str.match(_DATE_LIKE).mean()
+        if looks_like_date >= 0.8:
+            timestamp_fmt, timestamp_share = probe_datetime_format(distinct, TIMESTAMP_FORMATS)
+            date_fmt, date_share = probe_datetime_format(distinct, DATE_FORMATS)
+            if timestamp_share >= FORMAT_MATCH_SHARE and timestamp_share >= date_share:
+                return "timestamp", timestamp_fmt, 0.95 if timestamp_header or date_header else 0.85
+            if date_share >= FORMAT_MATCH_SHARE:
+                return "date", date_fmt, 0.95 if date_header else 0.85
+            if date_header or timestamp_header:
+                # Named like a date but no single format fits: leave it to the LLM
+                return None, None, 0.4
+    if (date_header or timestamp_header) and not numeric and not _has_keyword(col, IDENTIFIER_KEYWORDS):
+        return None, None, 0.6
+
+    # Regions: header keywords and the gazetteer
+    region_header = _has_keyword(col, REGION_KEYWORDS)
+    if not numeric:
+        known_share = distinct.map(is_known_place).mean()
+        if known_share >= REGION_MATCH_SHARE:
+            return "region", None, 0.95 if region_header else 0.85
+        if region_header:
+            return "region", None, 0.75
+
+    # Categorical: few distinct values relative to the rows sampled
+    n_distinct = values.nunique()
+    ratio = n_distinct / len(values)
+    categorical_header = _has_keyword(col, CATEGORICAL_KEYWORDS)
+    if pd.api.types.is_bool_dtype(series):
+        return "categorical", None, 0.9
+    if numeric:
+        if categorical_header and n_distinct <= CATEGORICAL_MAX_DISTINCT:
+            return "categorical", None, 0.75
+        return None, None, 0.9
+    if _has_keyword(col, IDENTIFIER_KEYWORDS) and not categorical_header:
+        return None, None, 0.8
+    if n_distinct <= CATEGORICAL_MAX_DISTINCT and (ratio <= CATEGORICAL_MAX_RATIO or len(values) < 20):
+        confident = categorical_header or n_distinct <= 20
+        return "categorical", None, 0.85 if confident else 0.65
+    if ratio > 0.9 or distinct.str.len().mean() > 50:
+        return None, None, 0.85  # free text or identifiers
+    return None, None, 0.65
+
+
+def _judge_columns(df, sample_rows):
+    """Return (position, column, role, format, confidence) for every column of the sampled table."""
+    sample = df.head(sample_rows)
+    return [(i, col, *_column_role(col, sample.iloc[:, i])) for i, col in enumerate(sample.columns)]
+
+
+def _assemble_roles(judged):
+    """Collect judged columns into the column roles, keeping one format per datetime role."""
+    roles = {"region": [], "date": [], "timestamp": [], "categorical": []}
+    formats = {"date": {}, "timestamp": {}}
+    for _, col, role, fmt, _ in judged:
+        if fmt is not None:
+            formats[role][col] = fmt
+        elif role is not None:
+            roles[role].append(col)
+
+    imputed = {"region": roles["region"] or None}
+    for role in ("date", "timestamp"):
+        if not formats[role]:
+            imputed[role] = None
+            continue
+        # The metrics check every column of a role against one format, so keep the columns of the most common one
+        found = list(formats[role].values())
+        fmt = max(found, key=found.count)
+        columns = [col for col, col_fmt in formats[role].items() if col_fmt == fmt]
+        if len(columns) < len(found):
+            logging.info(f"Leaving out {role} columns not in the format {fmt}: {[col for col in formats[role] if col not in columns]}")
+        imputed[role] = {"column": columns, "format": fmt}
+    imputed["categorical"] = roles["categorical"] or None
+    return imputed
+
+
+def infer_column_roles_local(df, sample_rows=ROLE_SAMPLE_ROWS):
+    """
+    Infer the region, date, timestamp and categorical columns of a table without the LLM.
+
+    Each column is judged from its header (keyword dictionaries), a Telangana
+    gazetteer of district and mandal names, datetime formats probed on its
+    distinct values, and its cardinality. Every column gets a confidence and
+    the table's confidence is the lowest of them.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table, or its first rows.
+    sample_rows : int, optional
+        The number of leading rows to look at. Defaults to `ROLE_SAMPLE_ROWS`.
+
+    Returns
+    -------
+    tuple
+        The column roles in the shape returned by `infer_column_roles_openai`,
+        with one format string per role, and the confidence between 0 and 1.
+    """
+    judged = _judge_columns(df, sample_rows)
+    confidence = min((col_confidence for *_, col_confidence in judged), default=1.0)
+    return _assemble_roles(judged), round(confidence, 2)
+
+
+def _ask_llm(df, api_key):
+    """Ask the LLM for the column roles, through the schema fingerprint cache when enabled."""
+    if role_cache.ROLE_CACHE:
+        return role_cache.cached_column_roles(df, lambda: infer_column_roles_openai(df, api_key))
+    return infer_column_roles_openai(df, api_key)
+
+
+def infer_column_roles(df, api_key=None, threshold=ROLE_CONFIDENCE_THRESHOLD, mode=ROLE_INFERENCE):
+    """
+    Infer the column roles locally and ask the LLM only about the columns the local answer is unsure of.
+
+    The LLM is given just the columns whose local confidence is below the
+    threshold, and its roles for them are merged with the local roles of the
+    other columns, so one ambiguous column neither discards the local answer
+    nor sends the whole table.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table, or its first rows.
+    api_key : str, optional
+        The OpenAI API key. Without one the local answer is always used.
+    threshold : float, optional
+        The column confidence below which the LLM is asked. Defaults to `ROLE_CONFIDENCE_THRESHOLD`.
+    mode : str, optional
+        "auto", "local" or "llm". Defaults to `ROLE_INFERENCE`.
+
+    Returns
+    -------
+    dict
+        The column roles, as returned by `infer_column_roles_openai`.
+    """
+    if mode == "llm" and api_key:
+        return _ask_llm(df, api_key)
+    judged = _judge_columns(df, ROLE_SAMPLE_ROWS)
+    roles = _assemble_roles(judged)
+    unsure = [judgement for judgement in judged if judgement[4] < threshold]
+    if mode == "local" or not unsure or not api_key:
+        logging.info(f"Inferred column roles locally, {len(unsure)} of {len(judged)} columns below confidence {threshold}")
+        return roles
+    logging.info(f"Asking the LLM about the {len(unsure)} of {len(judged)} columns below confidence {threshold}: {[col for _, col, *_ in unsure]}")
+    try:
+        llm_roles = _ask_llm(df.iloc[:, [i for i, *_ in unsure]], api_key)
+    except Exception as e:
+        logging.error(f"LLM column role inference failed, using the local roles: {e}")
+        return roles
+    if "error" in llm_roles:
+        logging.error(f"Could not parse the LLM column roles, using the local roles: {llm_roles.get('raw_response')}")
+        return roles
+    sure = _assemble_roles([judgement for judgement in judged if judgement[4] >= threshold])
+    return merge_column_roles([sure, llm_roles])
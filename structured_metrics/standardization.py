@@ -1,7 +1,11 @@
 import re
 import pandas as pd
 import os
+from structured_metrics.null_profile import NullProfile
+from structured_metrics.datetime_validation import count_invalid_datetimes
+from report.metric_registry import register_metric
 
+@register_metric("structured", outputs=["file_format"], inputs=["directory"], order=70)
 def check_file_format(directory):
     """
     Check if the given filename has a valid file format.
@@ -24,7 +28,8 @@ def check_file_format(directory):
     return {"file_format": "valid" if any(any(f.endswith(fmt) for fmt in valid_formats) for f in files) else "invalid"}
 
 
-def check_date_and_timestamp_format(df, imputed_columns=None):
+@register_metric("structured", outputs=["date_column", "timestamp_column", "number_of_date_columns", "number_of_timestamp_columns", "datetime_issues_percentage"], inputs=["df", "imputed_columns", "null_profile"], order=80)
+def check_date_and_timestamp_format(df, imputed_columns=None, null_profile=None):
     """
     Validates date columns against the expected format specified in imputed_columns.
 
@@ -34,6 +39,8 @@ def check_date_and_timestamp_format(df, imputed_columns=None):
         Should contain 'date' with 'column' (list of col names) and 'format' (strftime format).
     df : pandas.DataFrame
         The dataframe to validate.
+    null_profile : structured_metrics.null_profile.NullProfile, optional
+        The null counts of `df`, computed here if not given.
 
     Returns
     -------
@@ -61,6 +68,8 @@ def check_date_and_timestamp_format(df, imputed_columns=None):
     total_date_entries = 0
     total_timestamp_entries = 0
     
+    if null_profile is None:
+        null_profile = NullProfile(df)
     if isinstance(columns_to_validate_date, str):
         columns_to_validate_date = [columns_to_validate_date]
     if isinstance(columns_to_validate_timestamp, str):
@@ -68,23 +77,23 @@ def check_date_and_timestamp_format(df, imputed_columns=None):
 
     if columns_to_validate_date is not None:
         for date_col in columns_to_validate_date:
-            if date_col in df.columns and not df[date_col].isnull().all():
+            if date_col in df.columns and not null_profile.all_null(date_col):
                 date_fields_found.append(date_col)
                 try:
-                    parsed = pd.to_datetime(df[date_col], format=expected_date_format, errors="coerce")
-                    date_issues_count += parsed.isna().sum()
-                    total_date_entries += len(parsed)
+                    issues, entries = count_invalid_datetimes(df[date_col], expected_date_format)
+                    date_issues_count += issues
+                    total_date_entries += entries
                 except Exception:
                     continue
     
     if columns_to_validate_timestamp is not None:
         for timestamp_col in columns_to_validate_timestamp:
-            if timestamp_col in df.columns and not df[timestamp_col].isnull().all():
+            if timestamp_col in df.columns and not null_profile.all_null(timestamp_col):
                 timestamp_fields_found.append(timestamp_col)
                 try:
-                    parsed = pd.to_datetime(df[timestamp_col], format=expected_timestamp_format, errors="coerce")
-                    timestamp_issues_count += parsed.isna().sum()
-                    total_timestamp_entries += len(parsed)
+                    issues, entries = count_invalid_datetimes(df[timestamp_col], expected_timestamp_format)
+                    timestamp_issues_count += issues
+                    total_timestamp_entries += entries
                 except Exception:
                     continue
 
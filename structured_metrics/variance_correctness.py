@@ -1,5 +1,9 @@
-import pandas as pd
+from structured_metrics.null_profile import NullProfile
+from structured_metrics.moments import ColumnMoments
+from structured_metrics.heavy_hitters import is_dominated_column
+from report.metric_registry import register_metric
 
+@register_metric("structured", outputs=["low_variance_numeric_columns", "percentage_low_variance_numeric_columns", "number_of_numeric_columns", "numeric_columns"], inputs=["df"], when=lambda inputs: inputs.get("column_blocks") is None, order=50)
 def check_numeric_variance(df, cv_threshold=0.1):
 
     """
@@ -26,16 +30,9 @@ def check_numeric_variance(df, cv_threshold=0.1):
             "number_of_numeric_columns": 0,
             "numeric_columns": 'None'
         }
-    low_variance_cols = []
-    for col in numeric_cols:
-        mean = df[col].mean()
-        std = df[col].std()
-        # Check for NA in mean or std
-        if pd.isna(mean) or mean == 0 or pd.isna(std):
-            continue
-        if std / mean < cv_threshold:
-            low_variance_cols.append(col)
-    
+    # Mean and standard deviation of every numeric column in one vectorised pass
+    low_variance_cols = ColumnMoments.from_frame(numeric_cols).low_variance_columns(cv_threshold)
+
     return {
         "low_variance_numeric_columns": low_variance_cols,
         "percentage_low_variance_numeric_columns": round(len(low_variance_cols) / numeric_cols.shape[1] * 100, 1),
@@ -43,7 +40,8 @@ def check_numeric_variance(df, cv_threshold=0.1):
         "numeric_columns": numeric_cols.columns.tolist()
     }
 
-def check_categorical_variation(df, imputed_columns=None, dominance_threshold=0.99):
+@register_metric("structured", outputs=["dominant_categorical_columns", "percentage_dominant_categorical_columns", "number_of_categorical_columns", "categorical_columns"], inputs=["df", "imputed_columns", "null_profile"], when=lambda inputs: inputs.get("column_blocks") is None, order=60)
+def check_categorical_variation(df, imputed_columns=None, dominance_threshold=0.99, null_profile=None):
     """
     This function takes a DataFrame and a threshold for dominance and 
     checks which categorical columns have a single category that dominates 
@@ -55,6 +53,8 @@ def check_categorical_variation(df, imputed_columns=None, dominance_threshold=0.
         The DataFrame to check for columns with dominating categories.
     dominance_threshold : float, optional
         The threshold for dominance. Defaults to 0.99.
+    null_profile : structured_metrics.null_profile.NullProfile, optional
+        The null counts of `df`, computed here if not given.
 
     Returns
     -------
@@ -62,7 +62,6 @@ def check_categorical_variation(df, imputed_columns=None, dominance_threshold=0.
         This function returns a dictionary with two keys: 'dominant_categorical_columns' and 'percentage_dominant_categorical_columns'. The first key has a list of column names for all categorical columns that have a dominating category above the threshold, and the second key has a percentage of the total number of columns that are categorical with a dominating category above the threshold.
     """
     categorical_cols = [col for col in df.columns if imputed_columns and col in (imputed_columns.get("categorical") or [])]
-    print(f"Categorical columns: {categorical_cols}")
     if not categorical_cols:
         return {
             "dominant_categorical_columns": 'None',
@@ -71,12 +70,14 @@ def check_categorical_variation(df, imputed_columns=None, dominance_threshold=0.
             "categorical_columns": 'None'
         }
 
+    if null_profile is None:
+        null_profile = NullProfile(df)
     dominant_cols = []
     for col in categorical_cols:
-        if df[col].notnull().any():
-            if df[col].value_counts(normalize=True).iloc[0] > dominance_threshold:
+        if not null_profile.all_null(col):
+            if is_dominated_column(df[col], dominance_threshold):
                 dominant_cols.append(col)
-        elif df[col].isnull().all():  # If all values are NA, consider it as dominant
+        else:  # If all values are NA, consider it as dominant
             dominant_cols.extend([col])
                 
     num_categorical_cols = len(categorical_cols)
@@ -89,3 +90,66 @@ def check_categorical_variation(df, imputed_columns=None, dominance_threshold=0.
         "categorical_columns": categorical_cols
     }
 
+@register_metric("structured", outputs=["low_variance_numeric_columns", "percentage_low_variance_numeric_columns", "number_of_numeric_columns", "numeric_columns"], inputs=["column_blocks"], when=lambda inputs: inputs.get("column_blocks") is not None, order=50)
+def check_numeric_variance_from_blocks(column_blocks, cv_threshold=0.1):
+    """
+    `check_numeric_variance` from the merged moments of a table evaluated in column blocks.
+
+    Parameters
+    ----------
+    column_blocks : structured_metrics.column_blocks.ColumnBlocks
+        The merged results of `evaluate_column_blocks`.
+    cv_threshold : float, optional
+        The threshold for the coefficient of variation. Defaults to 0.1.
+
+    Returns
+    -------
+    dict
+        The same keys as `check_numeric_variance`.
+    """
+    numeric_cols = column_blocks.numeric_columns
+    if not numeric_cols:
+        return {
+            "low_variance_numeric_columns": 'None',
+            "percentage_low_variance_numeric_columns": 0,
+            "number_of_numeric_columns": 0,
+            "numeric_columns": 'None'
+        }
+    low_variance_cols = column_blocks.moments.low_variance_columns(cv_threshold)
+    return {
+        "low_variance_numeric_columns": low_variance_cols,
+        "percentage_low_variance_numeric_columns": round(len(low_variance_cols) / len(numeric_cols) * 100, 1),
+        "number_of_numeric_columns": len(numeric_cols),
+        "numeric_columns": numeric_cols
+    }
+
+@register_metric("structured", outputs=["dominant_categorical_columns", "percentage_dominant_categorical_columns", "number_of_categorical_columns", "categorical_columns"], inputs=["column_blocks"], when=lambda inputs: inputs.get("column_blocks") is not None, order=60)
+def check_categorical_variation_from_blocks(column_blocks):
+    """
+    `check_categorical_variation` from the dominated columns found in each column block.
+
+    Parameters
+    ----------
+    column_blocks : structured_metrics.column_blocks.ColumnBlocks
+        The merged results of `evaluate_column_blocks`.
+
+    Returns
+    -------
+    dict
+        The same keys as `check_categorical_variation`.
+    """
+    categorical_cols = column_blocks.categorical_columns
+    if not categorical_cols:
+        return {
+            "dominant_categorical_columns": 'None',
+            "percentage_dominant_categorical_columns": 0,
+            "number_of_categorical_columns": 0,
+            "categorical_columns": 'None'
+        }
+    dominant_cols = column_blocks.dominant_categorical_columns
+    return {
+        "dominant_categorical_columns": dominant_cols,
+        "percentage_dominant_categorical_columns": round(len(dominant_cols) / len(categorical_cols) * 100, 1),
+        "number_of_categorical_columns": len(categorical_cols),
+        "categorical_columns": categorical_cols
+    }
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+IMPUTED_COLUMNS = {"region": ["district"], "date": {"column": ["date"], "format": "%Y-%m-%d"}, "timestamp": None, "categorical": ["crop"]}
+
+def make_rows(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "district": rng.choice(["Adilabad", "Nirmal", None], n),
+        "date": rng.choice(["2022-01-01", "bad", None], n),
+        "crop": rng.choice(["rice", "cotton"], n, p=[0.9, 0.1]),
+        "value": rng.normal(5, 1, n).round(1),
+    })
+
+def reports(profile):
+    return [profile.number_of_rows, profile.column_missing(), profile.row_missing(), profile.row_duplicates(),
+            profile.coverage_region(), profile.numeric_variance(), profile.categorical_variation(),
+            profile.date_and_timestamp_format(), profile.date_or_timestamp_fields()]
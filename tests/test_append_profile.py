@@ -0,0 +1,133 @@
+import os
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from report.append_profile import prefix_hash, is_append, save_profile_state, load_profile_state, evict_states, profile_appended_rows, fetch_profile_states, store_profile_states
+from report.streaming_profiler import profile_file_in_chunks
+from report.input_handler import iter_csv_tail_chunks
+from tests.helpers import IMPUTED_COLUMNS, make_rows, reports
+
+def test_prefix_hash(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes(b"a\n1\n2\n")
+    assert prefix_hash(str(path), 4) == prefix_hash(str(path), 4)
+    assert prefix_hash(str(path), 4) != prefix_hash(str(path), 6)
+
+def test_is_append(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes(b"a\n1\n2\n")
+    state = {"size": 6, "content_hash": prefix_hash(str(path), 6)}
+    assert not is_append(str(path), state)  # unchanged
+    path.write_bytes(b"a\n1\n2\n3\n")
+    assert is_append(str(path), state)
+    path.write_bytes(b"a\n1\n9\n3\n")
+    assert not is_append(str(path), state)  # an old row changed
+    path.write_bytes(b"a\n1\n2")
+    assert not is_append(str(path), {"size": 5, "content_hash": prefix_hash(str(path), 5)})
+
+def test_tail_chunks_start_at_the_offset(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes(b"a,b\n1,x\n2,y\n3,z\n")
+    chunks = list(iter_csv_tail_chunks(str(path), 8, ["a", "b"], chunksize=1))
+    assert pd.concat(chunks).to_dict("list") == {"a": [2, 3], "b": ["y", "z"]}
+
+def test_appended_rows_give_the_report_of_the_whole_file(tmp_path):
+    path = tmp_path / "data.csv"
+    first = make_rows(500, 0).assign(empty=None)  # a column without values
+    first = pd.concat([first, first.head(10)])
+    first.to_csv(path, index=False)
+    profile = profile_file_in_chunks(str(path), lambda chunk: IMPUTED_COLUMNS, chunksize=200)
+    state = save_profile_state(str(path), profile, str(tmp_path / "state"))
+
+    appended = make_rows(300, 1)
+    appended["empty"] = np.nan
+    pd.concat([appended, first.head(5)]).to_csv(path, mode="a", header=False, index=False)
+    assert is_append(str(path), state)
+    stored = load_profile_state(state, str(tmp_path / "state"))
+    assert stored.number_of_rows == 510
+    updated = profile_appended_rows(str(path), stored, state["size"], chunksize=200)
+
+    whole = profile_file_in_chunks(str(path), lambda chunk: IMPUTED_COLUMNS, chunksize=200)
+    assert updated.number_of_rows == 815
+    assert reports(updated) == reports(whole)
+
+def test_missing_state(tmp_path):
+    assert load_profile_state({"size": 1, "content_hash": "0" * 40}, str(tmp_path)) is None
+
+def test_states_over_budget_drop_least_recently_used(tmp_path):
+    state_dir = str(tmp_path / "states")
+    saved = []
+    for i, seed in enumerate([1, 2]):
+        path = tmp_path / f"part{i}.csv"
+        make_rows(100, seed).to_csv(path, index=False)
+        saved.append(save_profile_state(str(path), profile_file_in_chunks(str(path), lambda chunk: IMPUTED_COLUMNS), state_dir))
+        used = time.time() - 100 + i
+        os.utime(os.path.join(state_dir, f"{saved[-1]['content_hash']}.pkl"), (used, used))
+    assert load_profile_state(saved[0], state_dir) is not None  # used again, so now the most recent
+    sizes = [os.path.getsize(os.path.join(state_dir, name)) for name in os.listdir(state_dir)]
+    assert evict_states(state_dir, max_bytes=max(sizes)) == 1
+    assert load_profile_state(saved[0], state_dir) is not None
+    assert load_profile_state(saved[1], state_dir) is None
+
+def test_spilled_row_hashes_are_stored_with_the_state(tmp_path):
+    path = tmp_path / "data.csv"
+    make_rows(600, 1).to_csv(path, index=False)
+    profile = profile_file_in_chunks(str(path), lambda chunk: IMPUTED_COLUMNS, chunksize=100)
+    profile.row_hashes.memory_budget = 64
+    profile.row_hashes.spill_dir = str(tmp_path)
+    profile.row_hashes.update_hashes(np.empty(0, dtype=np.uint64))  # spills, over its budget
+    assert profile.row_hashes.spilled
+    expected = reports(profile)
+    state_dir = str(tmp_path / "states")
+    saved = save_profile_state(str(path), profile, state_dir)
+    assert os.path.isdir(os.path.join(state_dir, f"{saved['content_hash']}.hashes"))
+    # The profile keeps growing after it was stored, the stored partitions do not
+    profile.update(make_rows(50, 2))
+    loaded = load_profile_state(saved, state_dir)
+    assert loaded.row_hashes.spilled and reports(loaded) == expected
+    loaded.row_hashes.close()
+    assert load_profile_state(saved, state_dir).number_of_rows == 600
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def get_paginator(self, name):
+        objects = self.objects
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {"Contents": [{"Key": key} for key in sorted(objects) if key.startswith(Prefix)]}
+        return Paginator()
+
+    def upload_file(self, path, bucket, key):
+        with open(path, 'rb') as f:
+            self.objects[key] = f.read()
+
+    def download_file(self, bucket, key, path):
+        with open(path, 'wb') as f:
+            f.write(self.objects[key])
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            del self.objects[obj["Key"]]
+
+def test_states_survive_an_empty_state_directory_through_s3(tmp_path):
+    path = tmp_path / "data.csv"
+    make_rows(600, 1).to_csv(path, index=False)
+    profile = profile_file_in_chunks(str(path), lambda chunk: IMPUTED_COLUMNS, chunksize=100)
+    profile.row_hashes.memory_budget = 64
+    profile.row_hashes.update_hashes(np.empty(0, dtype=np.uint64))  # spills, over its budget
+    expected = reports(profile)
+    warm, cold = str(tmp_path / "warm"), str(tmp_path / "cold")
+    saved = save_profile_state(str(path), profile, warm)
+    s3 = FakeS3()
+    s3.objects["folder/profile_states/stale.pkl"] = b""
+    assert store_profile_states(s3, "reports", "folder/profile_states", {saved["content_hash"]}, warm) == 1
+    assert "folder/profile_states/stale.pkl" not in s3.objects
+    assert store_profile_states(s3, "reports", "folder/profile_states", {saved["content_hash"]}, warm) == 0
+    shutil.rmtree(warm)  # a cold start in another container
+    assert load_profile_state(saved, cold) is None
+    assert fetch_profile_states(s3, "reports", "folder/profile_states", {saved["content_hash"]}, cold) == 1
+    loaded = load_profile_state(saved, cold)
+    assert loaded.row_hashes.spilled and reports(loaded) == expected
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from structured_metrics import column_blocks
+from structured_metrics.column_blocks import use_column_blocks, evaluate_column_blocks, write_shared_table, evaluate_block
+from structured_metrics.null_profile import NullProfile
+from report.aggregate_structured import generate_raw_report
+
+def make_wide_df(n_columns=40, n_rows=120):
+    rng = np.random.default_rng(0)
+    columns = {}
+    for i in range(n_columns):
+        if i % 4 == 0:
+            values = rng.normal(10, 0.1 if i % 8 else 5, n_rows)
+            values[rng.random(n_rows) < 0.1] = np.nan
+        elif i % 4 == 1:
+            values = pd.array(rng.integers(0, 3, n_rows), dtype="Int64")
+        elif i % 4 == 2:
+            values = rng.choice(["a", "b", None], n_rows, p=[0.995, 0.004, 0.001] if i % 3 else [0.4, 0.4, 0.2])
+        else:
+            values = [None] * n_rows
+        columns[f"c{i}"] = values
+    return pd.DataFrame(columns)
+
+def test_use_column_blocks():
+    df = make_wide_df(10)
+    assert use_column_blocks(df, workers=2, min_columns=10)
+    assert not use_column_blocks(df, workers=1, min_columns=10)
+    assert not use_column_blocks(df, workers=2, min_columns=11)
+    assert not use_column_blocks(pd.DataFrame([[1, 2]], columns=["a", "a"]), workers=2, min_columns=1)
+    assert not use_column_blocks(pd.DataFrame([[1, 2]]), workers=2, min_columns=1)
+
+def test_block_counts_match_the_whole_table(tmp_path):
+    df = make_wide_df(12)
+    path = write_shared_table(df, str(tmp_path))
+    result = evaluate_block(path, [4, 5, 6, 7], ["c6", "c7"])
+    profile = NullProfile(df[["c4", "c5", "c6", "c7"]])
+    assert result["columns"] == ["c4", "c5", "c6", "c7"]
+    assert result["column_null_counts"] == list(profile.column_null_counts.values())
+    assert result["row_null_counts"].tolist() == profile.row_null_counts.tolist()
+    assert result["numeric_columns"] == ["c4", "c5"]
+    assert "c7" in result["dominant_categorical_columns"]
+
+def test_merged_blocks():
+    df = make_wide_df()
+    blocks = evaluate_column_blocks(df, {"categorical": ["c2", "c6", "c3", "missing"]}, workers=2, block_size=7)
+    profile = NullProfile(df)
+    assert blocks.null_profile.column_null_counts == profile.column_null_counts
+    assert blocks.null_profile.row_null_counts.tolist() == profile.row_null_counts.tolist()
+    assert blocks.categorical_columns == ["c2", "c3", "c6"]
+
+def test_report_is_the_same_with_blocks(monkeypatch):
+    df = make_wide_df()
+    roles = {"region": ["c2"], "categorical": [f"c{i}" for i in range(0, 40, 3)], "date": None, "timestamp": None}
+    serial = generate_raw_report(df, "tests", roles, needed_keys=None)
+    monkeypatch.setattr(column_blocks, "COLUMN_BLOCK_WORKERS", 2)
+    monkeypatch.setattr(column_blocks, "COLUMN_BLOCK_MIN_COLUMNS", 10)
+    monkeypatch.setattr(column_blocks, "COLUMN_BLOCK_SIZE", 9)
+    blocked = generate_raw_report(df, "tests", roles, needed_keys=None)
+    assert blocked == serial
+    assert list(blocked) == list(serial)
+
+def test_tables_arrow_cannot_hold_fall_back():
+    df = make_wide_df(10)
+    df["mixed"] = [1, "a"] * 60
+    assert evaluate_column_blocks(df, workers=2) is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import report.csv_splitter as csv_splitter
+from report.csv_splitter import find_record_start, split_csv_ranges, count_quotes, verify_ranges
+from report.fanout import profile_in_ranges
+from report.streaming_profiler import profile_file_in_chunks
+
+DIALECT = {"delimiter": ",", "quotechar": '"', "escapechar": None, "doublequote": True, "has_header": True}
+
+def make_quoted_rows(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    notes = rng.choice(['plain', 'two\nlines', 'say ""hi""\nthen, "leave"', 'a,b\nc,d\ne'], n)
+    return pd.DataFrame({"id": np.arange(n), "note": notes, "value": rng.normal(5, 1, n).round(1)})
+
+def record_starts(df, path):
+    # The byte offset of every record of a file written by pandas
+    df.to_csv(path, index=False)
+    return {len(df.head(i).to_csv(index=False).encode()) for i in range(len(df) + 1)}
+
+def test_split_points_are_record_starts_despite_quoted_newlines(tmp_path):
+    df = make_quoted_rows(400)
+    path = str(tmp_path / "quoted.csv")
+    starts = record_starts(df, path)
+    ranges = split_csv_ranges(path, 500, DIALECT)
+    assert len(ranges) > 5
+    assert all(r["start"] in starts and r["end"] in starts for r in ranges)
+    whole = profile_file_in_chunks(path, chunksize=100)
+    profile = profile_in_ranges(path, range_bytes=500, workers=2)
+    assert (profile.number_of_rows, profile.row_duplicates()) == (whole.number_of_rows, whole.row_duplicates())
+
+def test_speculation_takes_the_quote_state_that_fits():
+    data = b'id,note\n1,"x\n2,y"\n3,"z"\n'
+    assert find_record_start(data, 9) == data.index(b"3,")  # inside the quoted field of record 1
+    assert find_record_start(data, 0, inside=False) == data.index(b"1,")
+
+def test_count_quotes_and_verify(tmp_path):
+    path = tmp_path / "q.csv"
+    path.write_bytes(b'"a""b"\n')
+    assert count_quotes(str(path), 0, 7) == 4
+    assert verify_ranges([2, 1, 3, 0]) == [[0], [1, 2], [3]]
+
+def test_wrong_split_points_are_merged_and_parsed_again(tmp_path, monkeypatch):
+    df = make_quoted_rows()
+    path = str(tmp_path / "quoted.csv")
+    df.to_csv(path, index=False)
+    whole = profile_file_in_chunks(path, chunksize=500)
+    # Split on any newline, as a quote-blind splitter would
+    monkeypatch.setattr(csv_splitter, "find_record_start", lambda mm, offset, *args, **kwargs: (mm.find(b"\n", offset) + 1) or None)
+    profile = profile_in_ranges(path, range_bytes=2000, workers=1)
+    assert profile.number_of_rows == whole.number_of_rows == len(df)
+    assert profile.row_duplicates() == whole.row_duplicates()
+    assert profile.numeric_variance() == whole.numeric_variance()
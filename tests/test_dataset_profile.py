@@ -0,0 +1,46 @@
+import pandas as pd
+from report.streaming_profiler import StructuredProfile
+from report.dataset_profile import merge_profiles, generate_dataset_report
+from report.scoring_structured import compute_aggregate_score
+from tests.helpers import IMPUTED_COLUMNS, make_rows, reports
+
+def profile_of(df, imputed=IMPUTED_COLUMNS):
+    profile = StructuredProfile(imputed)
+    profile.update(df)
+    return profile
+
+def test_merged_profile_is_the_profile_of_all_rows():
+    big, small = make_rows(1000, 0), make_rows(10, 1)
+    small = pd.concat([small, big.head(5)])  # rows repeated across files
+    merged = merge_profiles([profile_of(big), profile_of(small)])
+    assert merged.number_of_rows == 1015
+    assert merged.row_duplicates()["exact_row_duplicates_count"] == int(pd.concat([big, small]).duplicated().sum())
+    assert reports(merged) == reports(profile_of(pd.concat([big, small], ignore_index=True)))
+
+def test_columns_of_one_file_count_as_missing_in_the_other():
+    first = pd.DataFrame({"a": [1.0, 2.0]})
+    second = pd.DataFrame({"a": [3.0, None], "b": ["x", "y"]})
+    merged = merge_profiles([profile_of(first, None), profile_of(second, None)])
+    assert merged.column_null_counts == {"a": 1, "b": 2}
+    assert merged.numeric_variance()["numeric_columns"] == ["a"]
+
+def test_dataset_report_weighs_rows_not_files():
+    big, small = make_rows(1000, 0), make_rows(10, 1)
+    small["district"] = None
+    report, percentage = generate_dataset_report([profile_of(big), profile_of(small)], "tests")
+    whole = profile_of(pd.concat([big, small], ignore_index=True))
+    assert report["number_of_rows"] == 1010
+    assert report["column_missing"] == whole.column_missing()["column_missing"]
+    assert percentage == report["total_percentage"] == compute_aggregate_score({k: v for k, v in report.items() if k not in ("total_score", "total_weights", "total_percentage", "detailed_scores")})["total_percentage"]
+
+def test_no_profiles():
+    assert merge_profiles([]) is None
+
+def test_dataset_report_counts_duplicates_across_files_with_reordered_columns():
+    january = make_rows(200, 2)
+    february = pd.concat([make_rows(50, 3), january.tail(20)])[["value", "crop", "date", "district"]]
+    report, _ = generate_dataset_report([profile_of(january), profile_of(february)], "tests")
+    within = int(january.duplicated().sum()) + int(february.duplicated().sum())
+    assert report["exact_row_duplicates_count"] == int(pd.concat([january, february]).duplicated().sum())
+    assert report["within_file_duplicates_count"] == within
+    assert report["cross_file_duplicates_count"] == report["exact_row_duplicates_count"] - within > 0
@@ -0,0 +1,18 @@
+import pandas as pd
+from structured_metrics import datetime_validation
+from structured_metrics.datetime_validation import count_invalid_datetimes, clear_datetime_cache
+
+def test_counts_match_to_datetime():
+    values = pd.Series(["2022-01-01", "2022-13-01", None, "x", "2022-01-01"] * 100)
+    parsed = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+    assert count_invalid_datetimes(values, "%Y-%m-%d") == (int(parsed.isna().sum()), len(values))
+
+def test_numbers_keep_their_dtype():
+    assert count_invalid_datetimes(pd.Series([2020, 2021, None]), "%Y") == (1, 3)
+
+def test_distinct_values_are_parsed_once_per_format():
+    clear_datetime_cache()
+    count_invalid_datetimes(pd.Series(["2022-01-01", "2022-01-02"] * 1000), "%Y-%m-%d")
+    assert len(datetime_validation._PARSED_VALUES) == 2
+    assert count_invalid_datetimes(pd.Series(["2022-01-01"]), "%d/%m/%Y") == (1, 1)
+    assert len(datetime_validation._PARSED_VALUES) == 3
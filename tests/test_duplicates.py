@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+from structured_metrics.duplicates import RowHashSet, count_duplicate_rows
+
+def make_chunks(rows=20000, chunksize=3000):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"a": rng.integers(0, 50, rows), "b": rng.choice(["x", "y", None], rows)})
+    return df, [df.iloc[start:start + chunksize] for start in range(0, rows, chunksize)]
+
+def test_in_memory_count_matches_pandas():
+    df, chunks = make_chunks()
+    assert count_duplicate_rows(chunks) == (int(df.duplicated().sum()), len(df))
+
+def test_runs_stay_few_and_count_exactly():
+    rng = np.random.default_rng(2)
+    hashes, chunks = RowHashSet(), [rng.integers(0, 5000, 100).astype(np.uint64) for _ in range(300)]
+    for chunk in chunks:
+        hashes.update_hashes(chunk)
+        assert len(hashes._runs) <= 12
+    everything = np.concatenate(chunks)
+    assert hashes.duplicate_count == len(everything) - len(np.unique(everything))
+    assert np.array_equal(hashes.distinct_hashes(), np.unique(everything))
+
+def test_spilled_count_stays_exact(tmp_path):
+    df, chunks = make_chunks()
+    hashes = RowHashSet(memory_budget=256, spill_dir=str(tmp_path))
+    for chunk in chunks:
+        hashes.update(chunk)
+    assert hashes.spilled and len(hashes.seen) == 0
+    assert hashes.duplicate_count == int(df.duplicated().sum())
+    hashes.close()
+    assert os.listdir(tmp_path) == []
+
+def test_integer_and_float_chunks_hash_alike():
+    assert count_duplicate_rows([pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": [1.0, np.nan]})]) == (1, 4)
+
+def test_large_integers_are_not_rounded_into_duplicates():
+    ids = pd.DataFrame({"id": [9007199254740993, 9007199254740992, 123456789012345678, 123456789012345677]})
+    assert count_duplicate_rows(ids) == (0, 4)
+    assert count_duplicate_rows(ids.astype("int64[pyarrow]")) == (0, 4)
+
+def test_rows_without_columns_are_not_duplicates():
+    assert count_duplicate_rows(pd.DataFrame(index=range(3))) == (0, 0)
+
+def test_pickled_set_keeps_counting_after_a_spill(tmp_path):
+    import pickle
+    df, chunks = make_chunks()
+    hashes = RowHashSet(memory_budget=256, spill_dir=str(tmp_path))
+    for chunk in chunks[:-1]:
+        hashes.update(chunk)
+    restored = pickle.loads(pickle.dumps(hashes))
+    hashes.close()
+    # The partitions are pickled by reference and handed over to the unpickled set
+    assert restored.spilled and len(restored.seen) == 0 and len(os.listdir(tmp_path)) == 1
+    assert restored.duplicate_count == int(df.iloc[:len(df) - len(chunks[-1])].duplicated().sum())
+    restored.update(chunks[-1])
+    assert restored.duplicate_count == int(df.duplicated().sum())
+    restored.close()
+    assert os.listdir(tmp_path) == []
+
+def test_copied_set_counts_on_its_own(tmp_path):
+    df, chunks = make_chunks()
+    (tmp_path / "spill").mkdir()
+    hashes = RowHashSet(memory_budget=256, spill_dir=str(tmp_path / "spill"))
+    for chunk in chunks[:-1]:
+        hashes.update(chunk)
+    copy = hashes.copy_to(str(tmp_path / "copy"))
+    hashes.update(chunks[-1])
+    assert hashes.duplicate_count == int(df.duplicated().sum())
+    assert copy.duplicate_count == int(df.iloc[:len(df) - len(chunks[-1])].duplicated().sum())
+    copy.unspill()
+    assert not copy.spilled and not os.path.exists(tmp_path / "copy")
+    assert copy.duplicate_count == int(df.iloc[:len(df) - len(chunks[-1])].duplicated().sum())
+    hashes.close()
+
+def test_merged_sets_count_duplicates_across_them(tmp_path):
+    df, chunks = make_chunks()
+    first, second = RowHashSet(), RowHashSet(memory_budget=256, spill_dir=str(tmp_path))
+    for chunk in chunks[:3]:
+        first.update(chunk)
+    for chunk in chunks[3:]:
+        second.update(chunk)
+    first.merge(second)
+    second.close()
+    assert (first.duplicate_count, first.rows_seen) == (int(df.duplicated().sum()), len(df))
+
+def test_rows_hash_alike_whatever_the_column_order_or_null_columns():
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", None]})
+    reordered = df[["b", "a"]]
+    wider = df.assign(c=[None, None])
+    assert (RowHashSet.hash_rows(df) == RowHashSet.hash_rows(reordered)).all()
+    assert (RowHashSet.hash_rows(df) == RowHashSet.hash_rows(wider)).all()
+    assert RowHashSet.hash_rows(df)[0] != RowHashSet.hash_rows(df.rename(columns={"a": "z"}))[0]
+
+def test_merge_splits_duplicates_within_and_across_sets(tmp_path):
+    first, second = RowHashSet(), RowHashSet(memory_budget=8, spill_dir=str(tmp_path))
+    first.update(pd.DataFrame({"a": [1, 1, 2]}))
+    second.update(pd.DataFrame({"a": [2, 3, 3, 3]}))
+    first.merge(second)
+    second.close()
+    assert (first.duplicate_count, first.within_duplicate_count, first.cross_duplicate_count) == (4, 3, 1)
@@ -0,0 +1,48 @@
+import importlib
+import numpy as np
+import pytest
+import report.fanout as fanout
+from report.fanout import plan_ranges, profile_in_ranges, use_fanout
+from report.streaming_profiler import profile_file_in_chunks
+from tests.helpers import IMPUTED_COLUMNS, make_rows, reports
+
+def make_ranged_rows():
+    df = make_rows()
+    df.loc[1000:2500, "value"] = np.nan  # whole ranges where a numeric column is empty
+    return df
+
+def test_csv_ranges_cover_the_rows_and_end_on_newlines(tmp_path):
+    path = tmp_path / "data.csv"
+    make_ranged_rows().to_csv(path, index=False)
+    data = path.read_bytes()
+    ranges = plan_ranges(str(path), range_bytes=4000)
+    assert ranges[0]["start"] == data.index(b"\n") + 1 and ranges[-1]["end"] == len(data)
+    assert all(a["end"] == b["start"] for a, b in zip(ranges, ranges[1:]))
+    assert all(data[r["end"] - 1:r["end"]] == b"\n" for r in ranges)
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_merged_ranges_profile_like_the_whole_file(tmp_path, extension, workers):
+    path = str(tmp_path / f"data{extension}")
+    df = make_ranged_rows()
+    df.to_csv(path, index=False) if extension == ".csv" else df.to_parquet(path, row_group_size=700)
+    whole = profile_file_in_chunks(path, lambda chunk: IMPUTED_COLUMNS, chunksize=1000)
+    assert len(plan_ranges(path, range_bytes=8000)) > 1
+    assert reports(profile_in_ranges(path, IMPUTED_COLUMNS, range_bytes=8000, workers=workers)) == reports(whole)
+
+def test_only_large_csv_and_parquet_files_fan_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(fanout, "FANOUT_PROFILING", True)
+    for name in ("data.csv", "data.json"):
+        (tmp_path / name).write_text("a\n1\n")
+    assert use_fanout(str(tmp_path / "data.csv"), min_bytes=1)
+    assert not use_fanout(str(tmp_path / "data.csv"), min_bytes=10**6)
+    assert not use_fanout(str(tmp_path / "data.json"), min_bytes=1)
+
+def test_fanout_is_off_by_default_without_a_worker_function(tmp_path, monkeypatch):
+    monkeypatch.delenv("FANOUT_PROFILING", raising=False)
+    monkeypatch.delenv("FANOUT_FUNCTION_NAME", raising=False)
+    assert not importlib.reload(fanout).FANOUT_PROFILING
+    monkeypatch.setenv("FANOUT_FUNCTION_NAME", "profile-range")
+    assert importlib.reload(fanout).FANOUT_PROFILING
+    monkeypatch.delenv("FANOUT_FUNCTION_NAME")
+    importlib.reload(fanout)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from structured_metrics.heavy_hitters import TopKSketch, is_dominated_column
+
+def test_few_distinct_values_are_counted_exactly():
+    sketch = TopKSketch(k=10)
+    sketch.update(pd.Series(["a"] * 995 + ["b"] * 5 + [None] * 50))
+    assert sketch.error == 0 and sketch.total == 1000
+    assert sketch.top_share_bounds() == (0.995, 0.995)
+    assert sketch.is_dominated(0.99) is True
+
+def test_high_cardinality_column_keeps_k_counters():
+    values = pd.Series(np.arange(100000).astype(str))
+    sketch = TopKSketch(k=50)
+    sketch.update(values)
+    assert len(sketch.counts) <= 50
+    assert sketch.error <= len(values) / 51
+    assert sketch.is_dominated(0.99) is False
+
+def test_merged_sketches_bound_the_true_share():
+    rng = np.random.default_rng(3)
+    values = pd.Series(np.where(rng.random(20000) < 0.7, "top", rng.integers(0, 5000, 20000).astype(str)))
+    merged = TopKSketch(k=20)
+    for start in range(0, len(values), 3000):
+        part = TopKSketch(k=20)
+        part.update(values.iloc[start:start + 3000])
+        merged.merge(part)
+    lower, upper = merged.top_share_bounds()
+    true_share = values.value_counts(normalize=True).iloc[0]
+    assert lower <= true_share <= upper
+
+def test_undecided_sketch_falls_back_to_exact_counts():
+    values = pd.Series(["a"] * 991 + [str(i) for i in range(9)])
+    sketch = TopKSketch(k=2)
+    sketch.update(values)
+    assert sketch.top_share_bounds() == (0.99, 0.991)
+    assert sketch.is_dominated(0.99) is None
+    assert is_dominated_column(values, 0.99, k=2) is True
@@ -0,0 +1,82 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from report.input_handler import sniff_csv_dialect, read_csv_file, iter_csv_chunks, read_parquet_footer, read_parquet_file, list_data_file_handles, iter_data_from_directory, read_file_head
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_sniff_semicolon_dialect(tmp_path):
+    path = write(tmp_path, "semi.csv", "a;b\n1;x\n2;y\n")
+    dialect = sniff_csv_dialect(path)
+    assert dialect["delimiter"] == ";"
+    assert dialect["has_header"] is True
+
+def test_sniff_headerless_file(tmp_path):
+    path = write(tmp_path, "nohead.csv", "1,2,3\n4,5,6\n")
+    df = read_csv_file(path)
+    assert sniff_csv_dialect(path)["has_header"] is False
+    assert df.columns.tolist() == ["column_1", "column_2", "column_3"]
+
+def test_quoted_newlines_and_dates_stay_text(tmp_path):
+    path = write(tmp_path, "quoted.csv", 'a,b,c\n1,"x\ny",2022-01-01\n2,"say ""hi""",\n')
+    df = read_csv_file(path)
+    assert df["b"].tolist() == ["x\ny", 'say "hi"']
+    assert df["c"].iloc[0] == "2022-01-01"
+    assert df["c"].isnull().iloc[1]
+
+def test_iso_timestamps_keep_their_text(tmp_path):
+    path = write(tmp_path, "times.csv", "local,offset\n2024-01-01T10:00,2024-01-01T10:00:00+05:30\n2024-01-02T11:30,2024-01-02T10:00:00+05:30\n")
+    expected = [["2024-01-01T10:00", "2024-01-01T10:00:00+05:30"], ["2024-01-02T11:30", "2024-01-02T10:00:00+05:30"]]
+    assert read_csv_file(path).values.tolist() == expected
+    assert next(iter_csv_chunks(path)).values.tolist() == expected
+
+def test_ragged_file_falls_back_to_python_engine(tmp_path):
+    path = write(tmp_path, "ragged.csv", "a,b,c\n1,2,3\n4,5\n")
+    df = read_csv_file(path)
+    assert df.shape == (2, 3)
+    assert pd.isna(df["c"].iloc[1])
+
+def test_chunks_cover_file_after_fallback(tmp_path):
+    path = write(tmp_path, "ragged.csv", "a,b,c\n1,2,3\n4,5\n7,8,9\n")
+    chunks = list(iter_csv_chunks(path, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert pd.concat(chunks)["a"].tolist() == [1, 4, 7]
+
+def test_parquet_footer_null_counts(tmp_path):
+    table = pa.table({"a": [1, None, 3], "b": [[1], None, [2, None]], "c": ["x", None, None]})
+    with_stats = str(tmp_path / "stats.parquet")
+    without_stats = str(tmp_path / "nostats.parquet")
+    pq.write_table(table, with_stats, row_group_size=2)
+    pq.write_table(table, without_stats, write_statistics=False)
+    expected = {"number_of_rows": 3, "number_of_columns": 3, "column_null_counts": {"a": 1, "b": 1, "c": 2}}
+    assert read_parquet_footer(with_stats) == expected
+    assert read_parquet_footer(without_stats) == expected
+
+def test_parquet_file_matches_a_full_read(tmp_path):
+    table = pa.table({"a": [1.5, None, 3.0], "b": pa.nulls(3, pa.int64()), "c": ["x", None, "z"]})
+    path = str(tmp_path / "data.parquet")
+    pq.write_table(table, path)
+    df, footer = read_parquet_file(path)
+    pd.testing.assert_frame_equal(df, pq.read_table(path).to_pandas(types_mapper=pd.ArrowDtype))
+    assert footer == {"number_of_rows": 3, "number_of_columns": 3, "column_null_counts": {"a": 1, "b": 3, "c": 1}}
+
+def test_directory_handles_and_lazy_iteration(tmp_path):
+    write(tmp_path, "a.csv", "x\n1\n2\n")
+    write(tmp_path, "broken.json", "{not json")
+    write(tmp_path, "dataset_metadata.csv", "x\n1\n")
+    handles = list_data_file_handles(str(tmp_path))
+    assert sorted((os.path.basename(h.path), h.format) for h in handles) == [("a.csv", "csv"), ("broken.json", "json")]
+    assert not any(h.sampled for h in handles)
+    loaded = iter_data_from_directory(str(tmp_path))
+    df, file_path, sample = next(loaded)
+    assert file_path.endswith("a.csv") and len(df) == 2 and sample is False
+    assert list(loaded) == []
+
+def test_read_file_head(tmp_path):
+    path = write(tmp_path, "a.csv", "x,y\n" + "".join(f"{i},{i * 2}\n" for i in range(50)))
+    assert read_file_head(path, 5)["x"].tolist() == [0, 1, 2, 3, 4]
+    assert read_file_head(write(tmp_path, "empty.json", "[]"), 5).empty
@@ -0,0 +1,45 @@
+import json
+import pandas as pd
+from report.json_reader import detect_json_layout, iter_json_chunks, read_json_file
+
+RECORDS = [{"id": 1, "place": {"district": "Hyderabad"}}, {"id": 2, "place": {"district": "Warangal"}}, {"id": 3, "extra": "x"}]
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_layouts_read_the_same_records(tmp_path):
+    paths = {
+        "array": write(tmp_path, "array.json", json.dumps(RECORDS, indent=2)),
+        "lines": write(tmp_path, "lines.json", "\n".join(json.dumps(r) for r in RECORDS) + "\n"),
+        "object": write(tmp_path, "wrapped.json", json.dumps({"meta": {"count": 3}, "result": {"data": RECORDS}})),
+    }
+    for layout, path in paths.items():
+        assert detect_json_layout(path) == layout
+        df = read_json_file(path)
+        assert df.columns.tolist() == ["id", "place.district", "extra"]
+        assert df["id"].tolist() == [1, 2, 3]
+
+def test_chunks_keep_columns_seen_before(tmp_path):
+    path = write(tmp_path, "array.json", json.dumps(RECORDS))
+    chunks = list(iter_json_chunks(path, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[1].columns.tolist() == ["id", "place.district", "extra"]
+    assert pd.isna(chunks[1]["place.district"].iloc[0])
+
+def test_reading_stops_at_max_rows(tmp_path):
+    path = write(tmp_path, "lines.json", "\n".join(json.dumps({"id": i}) for i in range(100)) + "\n")
+    assert sum(len(chunk) for chunk in iter_json_chunks(path, chunksize=7, max_rows=10)) == 10
+
+def test_object_without_records_is_one_row(tmp_path):
+    path = write(tmp_path, "single.json", '﻿{"name": "x", "values": [1, 2]}')
+    df = read_json_file(path)
+    assert df.shape == (1, 2) and df["name"].iloc[0] == "x"
+
+def test_pandas_column_oriented_json_is_read_like_read_json(tmp_path):
+    path = str(tmp_path / "frame.json")
+    pd.DataFrame({"a": [1, 2, 3], "b": ["x", None, "z"]}).to_json(path)
+    df = read_json_file(path)
+    pd.testing.assert_frame_equal(df, pd.read_json(path).reset_index(drop=True), check_dtype=False)
+    assert df.shape == (3, 2)
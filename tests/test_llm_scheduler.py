@@ -0,0 +1,65 @@
+import time
+import asyncio
+import threading
+import httpx
+import openai
+import pytest
+from report.llm_scheduler import InferenceStage, TokenBucket, backoff_delay
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+def test_backoff_is_jittered_and_capped():
+    delays = [backoff_delay(attempt, base=1, cap=5) for attempt in range(8) for _ in range(20)]
+    assert all(0 <= delay <= 5 for delay in delays)
+    assert len(set(delays)) > 1
+
+def test_token_bucket_spaces_requests():
+    async def take(n):
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - started
+    assert asyncio.run(take(6)) >= 5 / 50 * 0.9
+
+def test_concurrency_limit_and_overlap():
+    stage = InferenceStage(concurrency=2, requests_per_minute=0)
+    lock, state = threading.Lock(), {"now": 0, "peak": 0}
+    def request(i):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.05)
+        with lock:
+            state["now"] -= 1
+        return i
+    try:
+        futures = [stage.submit(stage.call, request, i) for i in range(6)]
+        assert [future.result(timeout=5) for future in futures] == list(range(6))
+        assert state["peak"] == 2
+    finally:
+        stage.close()
+
+def test_transient_errors_are_retried():
+    stage = InferenceStage(max_retries=2, backoff=0.01, requests_per_minute=0)
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise connection_error()
+        return "ok"
+    def down():
+        raise connection_error()
+    def broken():
+        raise ValueError("bad prompt")
+    try:
+        assert stage.call(flaky) == "ok"
+        assert stage.stats["retries"] == 2
+        with pytest.raises(openai.APIConnectionError):
+            stage.call(down)
+        with pytest.raises(ValueError):
+            stage.call(broken)
+        assert stage.stats["failures"] == 1
+    finally:
+        stage.close()
@@ -0,0 +1,38 @@
+import time
+import report.aggregate_structured
+import report.scoring_structured as scoring
+from report.metric_registry import register_metric, registered_metrics, run_metrics
+
+@register_metric("test_pipeline", outputs=["slow_b"], inputs=["df"], order=20)
+def slow_b(df):
+    time.sleep(0.2)
+    return {"slow_b": len(df)}
+
+@register_metric("test_pipeline", outputs=["slow_a"], inputs={"counts": "profile"}, order=10)
+def slow_a(counts):
+    time.sleep(0.2)
+    return {"slow_a": counts}
+
+@register_metric("test_pipeline", outputs=["only_with_flag"], when=lambda inputs: inputs.get("flag"), order=30)
+def only_with_flag(df):
+    return {"only_with_flag": True}
+
+def test_metrics_run_concurrently_in_order_with_timings():
+    calls = []
+    started = time.perf_counter()
+    report, timings = run_metrics("test_pipeline", {"df": [1, 2], "profile": lambda: calls.append(1) or "counted"}, workers=4)
+    assert time.perf_counter() - started < 0.35
+    assert list(report.items()) == [("slow_a", "counted"), ("slow_b", 2)]
+    assert set(timings) == {"slow_a", "slow_b"} and all(seconds >= 0.2 for seconds in timings.values())
+    assert calls == [1]
+
+def test_unneeded_metrics_and_their_inputs_are_skipped():
+    calls = []
+    report, timings = run_metrics("test_pipeline", {"df": [1], "profile": lambda: calls.append(1), "flag": True}, needed_keys={"slow_b", "only_with_flag"})
+    assert report == {"slow_b": 1, "only_with_flag": True}
+    assert calls == []
+
+def test_structured_metrics_cover_the_scored_keys():
+    produced = {key for metric in registered_metrics("structured") for key in metric.outputs}
+    assert scoring.REPORT_KEYS <= produced
+    assert [metric.name for metric in registered_metrics("structured")][:3] == ["check_column_missing", "check_column_missing_from_footer", "check_row_missing"]
@@ -0,0 +1,40 @@
+import pickle
+import numpy as np
+import pandas as pd
+from structured_metrics.moments import ColumnMoments
+from structured_metrics.variance_correctness import check_numeric_variance
+
+def make_df():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"wide": rng.normal(100, 50, 1000), "narrow": rng.normal(1e6, 10, 1000), "sparse": [1.0, None] * 500})
+    df.loc[rng.random(1000) < 0.2, "wide"] = np.nan
+    return df
+
+def test_moments_match_pandas():
+    df = make_df()
+    moments = ColumnMoments.from_frame(df)
+    assert moments.count.tolist() == df.count().tolist()
+    np.testing.assert_allclose(moments.mean, df.mean())
+    np.testing.assert_allclose(moments.std(), df.std(), rtol=1e-9)
+
+def test_merged_chunks_equal_whole_frame():
+    df = make_df()
+    merged = ColumnMoments()
+    for start in range(0, len(df), 137):
+        part = pickle.loads(pickle.dumps(ColumnMoments.from_frame(df.iloc[start:start + 137])))
+        merged.merge(part)
+    whole = ColumnMoments.from_frame(df)
+    np.testing.assert_allclose(merged.mean, whole.mean)
+    np.testing.assert_allclose(merged.m2, whole.m2, rtol=1e-9)
+
+def test_merge_adds_new_columns_and_keeps_single_values_undefined():
+    moments = ColumnMoments.from_frame(pd.DataFrame({"a": [1.0, 3.0]}))
+    moments.merge(ColumnMoments.from_frame(pd.DataFrame({"b": [5.0]})))
+    assert moments.columns == ["a", "b"]
+    assert moments.mean.tolist() == [2.0, 5.0]
+    assert np.isnan(moments.std()["b"])
+
+def test_check_numeric_variance_flags_low_cv():
+    result = check_numeric_variance(make_df())
+    assert result["low_variance_numeric_columns"] == ["narrow", "sparse"]
+    assert result["number_of_numeric_columns"] == 3
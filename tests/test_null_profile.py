@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from structured_metrics.null_profile import NullProfile
+from structured_metrics.quality import check_column_missing, check_row_missing
+from structured_metrics.relevance_completeness import check_coverage_region
+from structured_metrics.regular_refresh import check_date_or_timestamp_fields
+
+def make_df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"district": rng.choice(["a", "b", None], 200), "value": rng.random(200), "date": ["2022-01-01"] * 200, "empty": [None] * 200})
+    df.loc[rng.random(200) < 0.4, "value"] = np.nan
+    return df
+
+def test_counts():
+    profile = NullProfile(pd.DataFrame({"a": [1, None, 3], "b": [None, None, None]}))
+    assert profile.column_null_counts == {"a": 1, "b": 3}
+    assert profile.row_null_counts.tolist() == [1, 2, 1]
+    assert profile.all_null("b") and not profile.all_null("a")
+
+def test_metrics_give_the_same_report_with_a_shared_profile():
+    df = make_df()
+    profile = NullProfile(df)
+    imputed = {"region": ["district"], "date": {"column": ["date", "empty"], "format": "%Y-%m-%d"}}
+    assert check_column_missing(df, null_profile=profile) == check_column_missing(df)
+    assert check_row_missing(df, null_profile=profile) == check_row_missing(df)
+    assert check_coverage_region(df, imputed, null_profile=profile) == check_coverage_region(df, imputed)
+    assert check_date_or_timestamp_fields(df, imputed, null_profile=profile) == check_date_or_timestamp_fields(df, imputed)
+
+def test_row_missing_without_columns():
+    assert check_row_missing(pd.DataFrame(index=range(3)))["row_missing_count"] == 0
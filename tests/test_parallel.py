@@ -0,0 +1,57 @@
+import os
+from report.parallel import map_files, estimate_file_memory, process_pool
+
+def read_size(file_path):
+    return os.path.getsize(file_path)
+
+def make_files(tmp_path, sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        path = tmp_path / f"part_{i}.csv"
+        path.write_text("a\n" + "1\n" * size)
+        paths.append(str(path))
+    return paths
+
+def test_results_keep_file_order(tmp_path):
+    paths = make_files(tmp_path, [50, 5, 500, 1, 20])
+    assert map_files(read_size, paths, workers=3) == [os.path.getsize(path) for path in paths]
+
+def test_tight_memory_budget_still_processes_every_file(tmp_path):
+    paths = make_files(tmp_path, [500, 400, 300])
+    budget = estimate_file_memory(paths[0])
+    assert map_files(read_size, paths, workers=3, memory_budget=budget) == [os.path.getsize(path) for path in paths]
+
+def test_single_worker_runs_sequentially(tmp_path):
+    paths = make_files(tmp_path, [3, 4])
+    assert map_files(read_size, paths, workers=1) == [os.path.getsize(path) for path in paths]
+
+def size_plus(file_path, extra):
+    return os.path.getsize(file_path) + (extra or 0)
+
+def test_inputs_are_passed_once_resolved(tmp_path):
+    from concurrent.futures import Future
+    paths = make_files(tmp_path, [3, 4, 5])
+    inputs = [Future() for _ in paths]
+    inputs[0].set_result(100)
+    inputs[1].set_exception(ValueError("no roles"))
+    inputs[2].set_result(1)
+    expected = [os.path.getsize(paths[0]) + 100, os.path.getsize(paths[1]), os.path.getsize(paths[2]) + 1]
+    assert map_files(size_plus, paths, workers=1, inputs=inputs) == expected
+    assert map_files(size_plus, paths, workers=2, inputs=inputs) == expected
+
+def test_plain_inputs_are_passed_as_they_are(tmp_path):
+    paths = make_files(tmp_path, [3, 4])
+    assert map_files(size_plus, paths, workers=1, inputs=[10, None]) == [os.path.getsize(paths[0]) + 10, os.path.getsize(paths[1])]
+
+def test_workers_are_not_forked_from_the_threaded_parent():
+    import threading
+    started = threading.Event()
+    thread = threading.Thread(target=started.wait)
+    thread.start()
+    try:
+        with process_pool(1) as executor:
+            assert executor._mp_context.get_start_method() != "fork"
+            assert executor.submit(os.getpid).result() != os.getpid()
+    finally:
+        started.set()
+        thread.join()
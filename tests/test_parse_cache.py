@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+from report.parse_cache import cache_key, cached_load, read_cached, write_cached, evict
+
+def write_csv(tmp_path, name="data.csv", text="a,b\n1,x\n2,y\n"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_key_follows_content_and_options(tmp_path):
+    first = write_csv(tmp_path, "first.csv")
+    copy = write_csv(tmp_path, "copy.csv")
+    other = write_csv(tmp_path, "other.csv", "a,b\n1,x\n")
+    assert cache_key(first) == cache_key(copy)
+    assert cache_key(first) != cache_key(other)
+    assert cache_key(first) != cache_key(first, {"sample_max_rows": 10})
+
+def test_second_load_is_served_from_cache(tmp_path):
+    path = write_csv(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    calls = []
+    def loader():
+        calls.append(1)
+        return pd.read_csv(path), {"sampling_method": "csv_reservoir", "sampling_fraction": 0.5}
+    df, sample = cached_load(path, loader, cache_dir=cache_dir)
+    cached_df, cached_sample = cached_load(path, loader, cache_dir=cache_dir)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(df, cached_df)
+    assert cached_sample == sample
+
+def test_mixed_object_column_is_not_cached(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert write_cached("key", pd.DataFrame({"m": [1, "a"]}), cache_dir=cache_dir) is False
+    assert read_cached("key", cache_dir) is None
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    df = pd.DataFrame({"a": range(1000)})
+    for i, key in enumerate(["old", "new"]):
+        write_cached(key, df, cache_dir=cache_dir)
+        os.utime(os.path.join(cache_dir, f"{key}.arrow"), (i, i))
+    evict(cache_dir, max_bytes=os.path.getsize(os.path.join(cache_dir, "new.arrow")))
+    assert sorted(os.listdir(cache_dir)) == ["new.arrow"]
@@ -0,0 +1,49 @@
+from report import profile_store
+from report.profile_store import file_fingerprint, load_manifest, write_manifest, stored_profile, split_unchanged, PROFILE_MANIFEST_NAME
+
+def test_fingerprint_prefers_the_etag(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("x\n1\n")
+    assert file_fingerprint(str(path), '"abc"') == "etag:abc"
+    assert file_fingerprint(str(path)).startswith("blake2b:")
+    assert file_fingerprint(str(path)) == file_fingerprint(str(path))
+    before = file_fingerprint(str(path))
+    path.write_text("x\n2\n")
+    assert file_fingerprint(str(path)) != before
+
+def test_manifest_round_trip(tmp_path):
+    files = {"a.csv": {"fingerprint": "etag:1", "profile": {"init_report": {"number_of_rows": 3}, "sample": False}}}
+    assert write_manifest(str(tmp_path), files, {"streaming_profiler": False})
+    manifest = load_manifest(str(tmp_path), {"streaming_profiler": False})
+    assert stored_profile(manifest, "a.csv", "etag:1") == files["a.csv"]["profile"]
+    assert stored_profile(manifest, "a.csv", "etag:2") is None
+    assert stored_profile(manifest, "b.csv", "etag:1") is None
+
+def test_manifest_of_other_settings_or_version_is_ignored(tmp_path, monkeypatch):
+    write_manifest(str(tmp_path), {"a.csv": {"fingerprint": "etag:1", "profile": {}}}, {"streaming_profiler": False})
+    assert load_manifest(str(tmp_path), {"streaming_profiler": True}) == {}
+    monkeypatch.setattr(profile_store, "PROFILE_STORE_VERSION", profile_store.PROFILE_STORE_VERSION + 1)
+    assert load_manifest(str(tmp_path), {"streaming_profiler": False}) == {}
+
+def test_unreadable_manifest(tmp_path):
+    (tmp_path / PROFILE_MANIFEST_NAME).write_text("{not json")
+    assert load_manifest(str(tmp_path)) == {}
+    assert load_manifest(str(tmp_path / "missing")) == {}
+
+def test_split_unchanged(tmp_path):
+    old, new = tmp_path / "old.csv", tmp_path / "new.csv"
+    old.write_text("x\n1\n")
+    new.write_text("x\n2\n")
+    files = {"old.csv": {"fingerprint": file_fingerprint(str(old)), "profile": {"sample_size": 1}},
+             "new.csv": {"fingerprint": "blake2b:stale", "profile": {"sample_size": 9}},
+             "remote.csv": {"fingerprint": "etag:r1", "profile": {"sample_size": 5}}}
+    write_manifest(str(tmp_path / "out"), files)
+    manifest = load_manifest(str(tmp_path / "out"))
+
+    fingerprints, reused = split_unchanged([str(old), str(new)], str(tmp_path), manifest, {"remote.csv": '"r1"'})
+    assert reused == {str(old): {"sample_size": 1}, str(tmp_path / "remote.csv"): {"sample_size": 5}}
+    assert set(fingerprints) == {str(old), str(new), str(tmp_path / "remote.csv")}
+
+    # A changed ETag means the file has to be profiled again
+    _, reused = split_unchanged([], str(tmp_path), manifest, {"remote.csv": '"r2"'})
+    assert reused == {}
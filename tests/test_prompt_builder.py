@@ -0,0 +1,51 @@
+import json
+from types import SimpleNamespace
+import pandas as pd
+import structured_metrics.llm_api as llm_api
+from structured_metrics.prompt_builder import truncate_cell, sample_column_values, build_column_prompts, merge_column_roles
+
+def test_truncate_cell():
+    assert truncate_cell("  a\n b ") == "a b"
+    assert truncate_cell("x" * 100, 10) == "x" * 9 + "…"
+
+def test_sample_values_are_distinct_frequent_first_and_spread():
+    series = pd.Series(["a"] * 10 + ["b"] * 5 + [f"v{i:02d}" for i in range(40)] + [None, " "])
+    values = sample_column_values(series, 5)
+    assert values[:3] == ["a", "b", "v00"] and len(set(values)) == 5 and values[-1] >= "v20"
+    assert sample_column_values(pd.Series(["x", "x", None]), 5) == ["x"]
+
+def test_prompts_are_compact_and_sharded():
+    df = pd.DataFrame({f"col_{i}": ["long text " * 50, "short"] for i in range(10)})
+    prompts = build_column_prompts(df, max_columns=4)
+    assert len(prompts) == 3
+    assert "\n " not in prompts[0] and "long text long text" in prompts[0] and "long text " * 10 not in prompts[0]
+    assert len(build_column_prompts(df, max_columns=10, max_tokens=200)) > 1
+
+def test_merge_column_roles():
+    merged = merge_column_roles([
+        {"region": ["district"], "date": {"column": ["date"], "format": "%d/%m/%Y"}, "timestamp": None, "categorical": None},
+        {"region": None, "date": {"column": "month", "format": "%m-%Y"}, "timestamp": None, "categorical": ["crop"]},
+        {"region": None, "date": {"column": ["sown", "harvested"], "format": "%d/%m/%Y"}, "timestamp": None, "categorical": None},
+    ])
+    # "month" is in another format than the other date columns, so it is left out
+    assert merged == {"region": ["district"], "date": {"column": ["date", "sown", "harvested"], "format": "%d/%m/%Y"}, "timestamp": None, "categorical": ["crop"]}
+    merged = merge_column_roles([
+        {"date": {"column": ["date"], "format": "%d/%m/%Y"}},
+        {"date": {"column": ["month", "year_month"], "format": "%m-%Y"}},
+    ])
+    assert merged["date"] == {"column": ["month", "year_month"], "format": "%m-%Y"}
+
+def test_wide_table_is_asked_in_batches(monkeypatch):
+    prompts = []
+    def create(model, messages, **kwargs):
+        prompt = messages[1]["content"]
+        prompts.append(prompt)
+        columns = list(json.loads(prompt.split("\n", 1)[1]))
+        answer = {"region": None, "date": None, "timestamp": None, "categorical": [columns[0]]}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(answer)))], usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm_api.openai, "OpenAI", lambda api_key: client)
+    monkeypatch.setattr(llm_api, "build_column_prompts", lambda df: build_column_prompts(df, max_columns=2))
+    df = pd.DataFrame({f"c{i}": [1, 2] for i in range(5)})
+    assert llm_api.infer_column_roles_openai(df, "key")["categorical"] == ["c0", "c2", "c4"]
+    assert len(prompts) == 3
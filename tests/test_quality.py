@@ -1,5 +1,5 @@
 import pandas as pd
-from structured_metrics.quality import check_column_missing, check_row_missing, check_row_duplicates
+from structured_metrics.quality import check_column_missing, check_column_missing_from_counts, check_row_missing, check_row_duplicates
 
 def test_check_column_missing():
     # Create a sample DataFrame
@@ -118,3 +118,10 @@ def test_check_row_duplicates():
         "exact_row_duplicates_percentage": 20.0
     }
     assert result == expected
+
+def test_check_column_missing_from_counts_matches_dataframe():
+    data = {'A': [1, 2, None, 4], 'B': [None, None, None, None], 'C': [1, None, None, 4]}
+    df = pd.DataFrame(data)
+    result = check_column_missing_from_counts(df.isnull().sum().to_dict(), len(df))
+    assert result == check_column_missing(df)
+    assert result["column_missing"] == {'B': 100.0, 'C': 50.0}
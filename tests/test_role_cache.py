@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+import structured_metrics.role_cache as role_cache
+import structured_metrics.role_inference as role_inference
+from structured_metrics.role_cache import schema_fingerprint, cached_column_roles, read_cached_roles, evict
+
+def partition(month):
+    return pd.DataFrame({
+        "district": ["Adilabad", "Nizamabad", "Medak"],
+        "date": [f"0{day}/{month:02d}/2023" for day in (1, 2, 3)],
+        "count": [month, month + 1, month + 2],
+    })
+
+def test_fingerprint_ignores_values_but_not_shapes():
+    assert schema_fingerprint(partition(1)) == schema_fingerprint(partition(2))
+    other_format = partition(1).assign(date=["2023-01-01", "2023-01-02", "2023-01-03"])
+    assert schema_fingerprint(partition(1)) != schema_fingerprint(other_format)
+    assert schema_fingerprint(partition(1)) != schema_fingerprint(partition(1).astype({"count": "float64"}))
+
+def test_hit_skips_infer_and_errors_are_not_cached(tmp_path):
+    calls = []
+    infer = lambda: calls.append(1) or {"region": ["district"]}
+    before = role_cache.cache_stats()
+    assert cached_column_roles(partition(1), infer, str(tmp_path)) == {"region": ["district"]}
+    assert cached_column_roles(partition(2), infer, str(tmp_path)) == {"region": ["district"]}
+    assert len(calls) == 1
+    after = role_cache.cache_stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+
+    error = lambda: calls.append(1) or {"error": "Could not parse OpenAI response"}
+    other = partition(1).rename(columns={"count": "total"})
+    cached_column_roles(other, error, str(tmp_path))
+    cached_column_roles(other, error, str(tmp_path))
+    assert len(calls) == 3
+
+def test_expired_and_evicted_entries(tmp_path):
+    cached_column_roles(partition(1), lambda: {"region": None}, str(tmp_path))
+    key = schema_fingerprint(partition(1))
+    assert read_cached_roles(key, str(tmp_path), ttl=0) is None
+    assert not os.path.exists(tmp_path / f"{key}.json")
+
+    for i, name in enumerate(["a", "b", "c"]):
+        path = tmp_path / f"{name}.json"
+        path.write_text('{"created": 0, "roles": {}}')
+        os.utime(path, (i, i))
+    assert evict(str(tmp_path), max_entries=2) == 1
+    assert sorted(os.listdir(tmp_path)) == ["b.json", "c.json"]
+
+def test_role_inference_goes_through_the_cache(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(role_cache, "ROLE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(role_inference, "infer_column_roles_openai", lambda df, api_key: calls.append(1) or {"region": ["district"]})
+    for month in (1, 2, 3):
+        assert role_inference.infer_column_roles(partition(month), "key", mode="llm") == {"region": ["district"]}
+    assert len(calls) == 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import structured_metrics.role_inference as role_inference
+from structured_metrics.role_inference import infer_column_roles_local, infer_column_roles, probe_datetime_format
+from structured_metrics.gazetteer import is_known_place
+
+def make_df(rows=200):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "District_Name": rng.choice(["Adilabad", "Nizamabad", "Warangal Urban", "Ranga Reddy"], rows),
+        "mandal": rng.choice(["Armur", "Bodhan", "Gajwel (U)"], rows),
+        "Date": pd.Series(pd.date_range("2022-01-01", periods=rows)).dt.strftime("%d/%m/%Y"),
+        "updated_at": pd.Series(pd.date_range("2022-01-01", periods=rows, freq="h")).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "crop_type": rng.choice(["Paddy", "Cotton", "Maize"], rows),
+        "yield": rng.random(rows),
+        "farmer_name": [f"farmer {i}" for i in range(rows)],
+    })
+
+def test_gazetteer_normalises_suffixes():
+    assert is_known_place("Warangal (Urban)") and is_known_place("RANGAREDDY District") and is_known_place("Gajwel (U)")
+    assert not is_known_place("Paddy")
+
+def test_probe_picks_matching_format():
+    assert probe_datetime_format(pd.Series(["31/01/2022", "01/02/2022"]), ["%m/%d/%Y", "%d/%m/%Y"]) == ("%d/%m/%Y", 1.0)
+
+def test_local_roles_and_confidence():
+    roles, confidence = infer_column_roles_local(make_df())
+    assert roles == {
+        "region": ["District_Name", "mandal"],
+        "date": {"column": ["Date"], "format": "%d/%m/%Y"},
+        "timestamp": {"column": ["updated_at"], "format": "%Y-%m-%d %H:%M:%S"},
+        "categorical": ["crop_type"],
+    }
+    assert confidence >= role_inference.ROLE_CONFIDENCE_THRESHOLD
+
+def test_llm_is_asked_only_below_threshold(monkeypatch):
+    calls = []
+    monkeypatch.setattr(role_inference.role_cache, "ROLE_CACHE", False)
+    monkeypatch.setattr(role_inference, "infer_column_roles_openai", lambda df, api_key: calls.append(1) or {"region": ["x"]})
+    infer_column_roles(make_df(), "key")
+    assert calls == []
+    ambiguous = pd.DataFrame({"date_of_visit": ["soon", "later", "never"]})
+    assert infer_column_roles(ambiguous, "key")["region"] == ["x"]
+    assert infer_column_roles(ambiguous, None)["date"] is None
+
+def test_llm_is_asked_only_about_unsure_columns(monkeypatch):
+    asked = []
+    def answer(df, api_key):
+        asked.append(list(df.columns))
+        return {"region": None, "date": {"column": ["date_of_visit"], "format": "%d/%m/%Y"}, "timestamp": None, "categorical": None}
+    monkeypatch.setattr(role_inference.role_cache, "ROLE_CACHE", False)
+    monkeypatch.setattr(role_inference, "infer_column_roles_openai", answer)
+    df = make_df(30).assign(date_of_visit="soon")
+    roles = infer_column_roles(df, "key")
+    assert asked == [["date_of_visit"]]
+    local, _ = infer_column_roles_local(make_df(30))
+    assert roles == {**local, "date": {"column": ["Date", "date_of_visit"], "format": "%d/%m/%Y"}}
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from report.sampling import sample_csv_reservoir, sample_csv_seek, sample_parquet_row_groups, sample_json, describe_sampling, BottomKSample
+
+def write_csv(tmp_path, rows=5000):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"row": range(rows), "value": ["x" * 10] * rows}).to_csv(path, index=False)
+    return path
+
+def test_bottom_k_sample_is_bounded_and_ordered():
+    reservoir = BottomKSample(10)
+    for start in range(0, 1000, 100):
+        reservoir.update(pd.DataFrame({"row": range(start, start + 100)}))
+    sample = reservoir.result()
+    assert len(sample) == 10
+    assert sample["row"].is_monotonic_increasing
+    assert reservoir.rows_seen == 1000
+
+def test_bottom_k_sample_keeps_the_smallest_keys_of_all_rows():
+    reservoir = BottomKSample(25, seed=7)
+    for start in range(0, 1000, 100):
+        reservoir.update(pd.DataFrame({"row": range(start, start + 100)}))
+    keys = np.random.default_rng(7).random(1000)
+    assert reservoir.result()["row"].tolist() == sorted(np.argsort(keys)[:25].tolist())
+
+def test_reservoir_covers_whole_csv(tmp_path):
+    df, sampling = sample_csv_reservoir(write_csv(tmp_path), max_rows=500)
+    assert len(df) == 500
+    assert df["row"].max() > 4000
+    assert sampling == {"sampling_method": "csv_reservoir", "sampling_fraction": 0.1, "sampled_rows": 500, "total_rows": 5000}
+
+def test_byte_budget_lowers_row_budget(tmp_path):
+    df, _ = sample_csv_reservoir(write_csv(tmp_path), max_rows=500, max_bytes=1700)
+    assert len(df) < 500
+
+def test_seek_sample_spreads_over_file(tmp_path):
+    df, sampling = sample_csv_seek(write_csv(tmp_path), max_rows=400, blocks=20)
+    assert 0 < len(df) <= 400
+    assert df["row"].is_unique
+    assert df["row"].max() > 4000
+    assert sampling["sampling_method"] == "csv_byte_seek"
+
+def test_parquet_row_groups(tmp_path):
+    path = str(tmp_path / "data.parquet")
+    pq.write_table(pa.table({"row": list(range(1000))}), path, row_group_size=100)
+    df, sampling = sample_parquet_row_groups(path, max_rows=300)
+    assert len(df) == 300
+    assert sampling["sampling_fraction"] == 0.3
+    assert sampling["total_rows"] == 1000
+
+def test_describe_sampling_for_full_read():
+    assert describe_sampling(False) == {"sampling_method": "none", "sampling_fraction": 1.0}
+
+def test_json_sample_streams_records(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("\n".join('{"row": %d, "nested": {"value": "x"}}' % i for i in range(5000)) + "\n")
+    df, sampling = sample_json(str(path), max_rows=500)
+    assert len(df) == 500 and df["row"].max() > 4000
+    assert df.columns.tolist() == ["row", "nested.value"]
+    assert sampling["sampling_method"] == "json_reservoir" and sampling["total_rows"] == 5000
+    head, sampling = sample_json(str(path), max_rows=500, method="head")
+    assert head["row"].tolist() == list(range(500))
+    assert sampling["sampling_method"] == "json_head" and sampling["total_rows"] >= 500
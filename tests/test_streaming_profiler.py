@@ -0,0 +1,68 @@
+import pandas as pd
+from report.streaming_profiler import StructuredProfile
+from structured_metrics.quality import check_column_missing, check_row_missing, check_row_duplicates
+from structured_metrics.relevance_completeness import check_coverage_region
+from structured_metrics.variance_correctness import check_numeric_variance, check_categorical_variation
+from structured_metrics.standardization import check_date_and_timestamp_format
+from structured_metrics.regular_refresh import check_date_or_timestamp_fields
+
+IMPUTED_COLUMNS = {
+    "region": ["district"],
+    "date": {"column": ["date"], "format": "%Y-%m-%d"},
+    "timestamp": None,
+    "categorical": ["crop"],
+}
+
+def sample_df():
+    return pd.DataFrame({
+        "district": ["Adilabad", None, "Nalgonda", "Adilabad", None, "Warangal", "Adilabad", "Adilabad"],
+        "date": ["2022-01-01", "bad", None, "2022-01-01", "2022-01-05", "2022-01-06", "2022-01-01", "2022-01-01"],
+        "crop": ["rice", "rice", "rice", "rice", "rice", "cotton", "rice", "rice"],
+        "yield": [10.0, 10.1, 10.0, 10.0, None, 9.9, 10.0, 10.0],
+        "area": [1, 5, 9, 1, 3, 20, 1, 1],
+        "notes": [None, None, None, None, None, None, None, "x"],
+    })
+
+def profile_in_chunks(df, chunksize):
+    profile = StructuredProfile(IMPUTED_COLUMNS)
+    for start in range(0, len(df), chunksize):
+        profile.update(df.iloc[start:start + chunksize])
+    return profile
+
+def test_streamed_metrics_match_dataframe_metrics():
+    df = sample_df()
+    profile = profile_in_chunks(df, 3)
+    assert profile.column_missing() == check_column_missing(df)
+    assert profile.row_missing() == check_row_missing(df)
+    assert profile.row_duplicates() == check_row_duplicates(df)
+    assert profile.coverage_region() == check_coverage_region(df, IMPUTED_COLUMNS)
+    assert profile.numeric_variance() == check_numeric_variance(df)
+    assert profile.categorical_variation() == check_categorical_variation(df, IMPUTED_COLUMNS)
+    assert profile.date_and_timestamp_format() == check_date_and_timestamp_format(df, IMPUTED_COLUMNS)
+    assert profile.date_or_timestamp_fields() == check_date_or_timestamp_fields(df, IMPUTED_COLUMNS)
+
+def test_duplicates_across_chunks():
+    df = pd.DataFrame({"A": [1, 2, 1, 2, 3], "B": ["x", "y", "x", "y", "z"]})
+    profile = profile_in_chunks(df, 2)
+    assert profile.row_duplicates() == {"exact_row_duplicates_count": 2, "exact_row_duplicates_percentage": 40.0}
+
+def test_numeric_column_becomes_non_numeric_in_later_chunk():
+    df = pd.DataFrame({"A": [1, 2, 3, 4]})
+    profile = StructuredProfile()
+    profile.update(df.iloc[:2])
+    profile.update(pd.DataFrame({"A": ["x", "y"]}))
+    assert profile.numeric_variance()["number_of_numeric_columns"] == 0
+
+def test_column_added_in_later_chunk_counts_as_missing_before():
+    profile = StructuredProfile()
+    profile.update(pd.DataFrame({"a": [1, 2]}))
+    profile.update(pd.DataFrame({"a": [3, 4], "b": ["x", None]}))
+    assert profile.columns == ["a", "b"]
+    assert profile.column_null_counts == {"a": 0, "b": 3}
+
+def test_column_missing_from_a_later_chunk_counts_as_missing_there():
+    profile = StructuredProfile()
+    profile.update(pd.DataFrame({"a": [1.0, 2.0], "b": [1, 2]}))
+    profile.update(pd.DataFrame({"b": [3, 4]}))
+    assert profile.column_null_counts == {"a": 2, "b": 0}
+    assert profile.numeric_variance()["number_of_numeric_columns"] == 2
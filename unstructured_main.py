@@ -10,6 +10,7 @@ from report.dataset_clean_name_api import get_dataset_name_from_url
 from report.json_writer import write_report_outputs
 from report.pdf_writer import generate_pdf_from_json
 from unstructured_metrics.llm_api import infer_metadata_roles_openai
+from report.llm_scheduler import call_llm, submit_inference
 from report.post_to_cat_api import update_cat_readiness_score
 
 print("Importing modules completed in main.py")
@@ -55,12 +56,20 @@ def main(directory, folder_key):
         else:
             dataset_paths = [directory]
 
+        # 1. Extract metadata for up to 10 files in each dataset folder, and start
+        # inferring its roles with OpenAI while the next folders are read
+        metadata_by_path = {}
+        role_futures = {}
         for dataset_path in dataset_paths:
-            logging.info(f"Processing dataset folder: {dataset_path}")
-
-            # 1. Extract metadata for up to 10 files in this dataset folder
             metadata = log_and_call(metadata_parser.process_folder_to_metadata_json, dataset_path)
             logging.info(f"Extracted metadata for {len(metadata)} files in {dataset_path}")
+            metadata_by_path[dataset_path] = metadata
+            if metadata:
+                role_futures[dataset_path] = submit_inference(call_llm, infer_metadata_roles_openai, metadata, api_key)
+
+        for dataset_path in dataset_paths:
+            logging.info(f"Processing dataset folder: {dataset_path}")
+            metadata = metadata_by_path[dataset_path]
             print(type(metadata))
             if not metadata:
                 logging.error(f"No metadata files found in {dataset_path}")
@@ -74,8 +83,8 @@ def main(directory, folder_key):
                 uuid = None
                 logging.info(f"Could not fetch true name for {dataset_path}, using directory name: {true_name}")
 
-            # 2. Use OpenAI to infer roles 
-            imputed_roles = log_and_call(infer_metadata_roles_openai, metadata, api_key)
+            # 2. Collect the roles inferred by OpenAI
+            imputed_roles = role_futures[dataset_path].result()
             logging.info(f"Inferred roles for {uuid}: {imputed_roles}")
 
             # 3. Generate the raw readiness report (based on metadata)
@@ -1,3 +1,6 @@
+from report.metric_registry import register_metric
+
+@register_metric("unstructured", outputs=["region_coverage"], inputs=["imputed_roles"], order=60)
 def region_coverage(imputed_roles):
     """
     Check if there are attributes associated with the 'region' key.
@@ -1,5 +1,7 @@
 import os
+from report.metric_registry import register_metric
 
+@register_metric("unstructured", outputs=["file_count", "file_duplicates_found", "duplicate_count", "duplicate_percentage"], inputs=["directory"], order=10)
 def check_file_duplicates(directory):
     """
     Check if there are any duplicate file names in a given directory.
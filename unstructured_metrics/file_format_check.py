@@ -1,5 +1,7 @@
 import os
+from report.metric_registry import register_metric
 
+@register_metric("unstructured", outputs=["valid_format_count", "invalid_format_count", "valid_format_percentage", "invalid_format_percentage"], inputs=["directory"], order=70)
 def check_file_format(directory):
     """
     Check if all the files in a given directory are in a standard format.
@@ -5,7 +5,9 @@ import pydicom
 from PyPDF2 import PdfReader
 from mutagen.mp3 import MP3
 from PIL import Image
+from report.metric_registry import register_metric
 
+@register_metric("unstructured", outputs=["file_openable_count", "file_openable_percentage", "file_not_openable_count", "file_not_openable_percentage", "openable_files", "not_openable_files"], inputs=["directory"], order=30)
 def check_file_openability(directory):
     """
     Check if files in a directory are openable by their type-specific library.
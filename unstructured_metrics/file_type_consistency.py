@@ -1,4 +1,6 @@
 import os
+from report.metric_registry import register_metric
+@register_metric("unstructured", outputs=["consistency"], inputs=["directory"], order=20)
 def check_type_uniformity(directory):
     """
     Check whether all files in a given directory are of the same file type.
@@ -1,5 +1,7 @@
 import os
+from report.metric_registry import register_metric
 
+@register_metric("unstructured", outputs=["annotation_presence"], inputs={"file_path": "directory"}, order=40)
 def check_label_presence(file_path):
     """
     Check if a file exists in the given path with a name containing any of the following words:
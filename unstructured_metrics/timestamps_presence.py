@@ -1,3 +1,6 @@
+from report.metric_registry import register_metric
+
+@register_metric("unstructured", outputs=["timestamps_presence"], inputs=["imputed_roles"], order=50)
 def check_timestamp_presence(imputed_roles):
     """
     Check if there are any values mapped to the 'timestamp' key in the metadata.